@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Backtesting
+- Moving Average Cross strategy (long while the short MA is above the long
+  MA) evaluated for a whole grid of short/long windows at once
+- The MAs of all windows come from one cumulative sum of the prices
+- Bars without a price keep the last price; returns are annualised with
+  the number of bars per year of the interval
+- Total and annual return, hit rate, maximum drawdown per window pair,
+  optionally for many tickers with a process pool
+
+@author: Sabine Kopplin
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# default grid: 50 short x 50 long windows (in bars)
+DEFAULT_SHORT = tuple(range(5, 105, 2))
+DEFAULT_LONG = tuple(range(50, 300, 5))
+
+# trading days per year and trading time per day, for the annual return
+TRADING_DAYS = 252
+TRADING_HOURS = pd.Timedelta(hours=6, minutes=30)
+
+def bars_per_year(interval="1d"):
+    """ number of bars per year of an interval, e.g. 252 days or 98280 minutes """
+    from intervals import bar_length
+    length = bar_length(interval)
+    if length >= pd.Timedelta(days=1):
+        return TRADING_DAYS
+    # the last bar of a day may be shorter (e.g. 7 hourly bars from 9:30)
+    return TRADING_DAYS * int(np.ceil(TRADING_HOURS / length))
+
+def _close(prices):
+    """ closing prices as float64 array from an array, Series or get_data frame """
+    if isinstance(prices, pd.DataFrame):
+        prices = prices["Close"]
+    return np.asarray(prices, dtype=np.float64)
+
+def moving_averages(prices, windows):
+    """ simple moving averages of all windows from one cumulative sum,
+        array windows x days (NaN before a window is complete and for
+        windows with a missing price) """
+    prices = _close(prices)
+    windows = np.asarray(windows, dtype=np.int64)
+    missing = np.isnan(prices)
+    # prices minus their mean keep the cumulative sum small and precise,
+    # missing prices add nothing and are counted instead
+    offset = prices[~missing].mean() if (~missing).any() else 0.0
+    csum = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, prices - offset))))
+    gaps = np.concatenate(([0], np.cumsum(missing)))
+    days = np.arange(len(prices))
+    start = days[None, :] + 1 - windows[:, None]
+    first = np.maximum(start, 0)
+    with np.errstate(invalid="ignore"):
+        averages = (csum[days + 1][None, :] - csum[first]) / windows[:, None]
+    averages[(start < 0) | (gaps[days + 1][None, :] > gaps[first])] = np.nan
+    return averages + offset
+
+def _evaluate(signal, log_returns, cost, bars_per_year=TRADING_DAYS):
+    """ metrics of positions (days x pairs, True = long for the next bar);
+        days run along the first axis, so the cumulative operations add
+        whole rows of pairs at a time """
+    pos = signal[:-1]
+    held = pos * log_returns[:, None]
+    previous = np.zeros_like(pos)
+    previous[1:] = pos[:-1]
+    entries = pos & ~previous
+    if cost:
+        # proportional cost of every buy and sell
+        held += (entries | (~pos & previous)) * np.log1p(-cost)
+    equity = np.cumsum(held, axis=0)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0), axis=0)
+    drawdown = -np.expm1(np.min(equity - peak, axis=0))
+
+    # a trade wins if the equity after its last bar exceeds the equity before its entry
+    following = np.zeros_like(pos)
+    following[:-1] = pos[1:]
+    last_bars = pos & ~following
+    before = (equity - held)[entries]
+    after = equity[last_bars]
+    # nonzero runs row by row, so sort both by pair to pair entries with exits
+    entry_pairs = np.nonzero(entries)[1]
+    order = np.argsort(entry_pairs, kind="stable")
+    exit_order = np.argsort(np.nonzero(last_bars)[1], kind="stable")
+    num_pairs = pos.shape[1]
+    wins = np.bincount(entry_pairs[order], weights=after[exit_order] > before[order],
+                       minlength=num_pairs)
+    trades = entries.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hit_rate = wins / trades
+    num_days = pos.shape[0]
+    total = equity[-1] if num_days else np.zeros(num_pairs)
+    return {"Total Return": np.expm1(total),
+            "Annual Return": np.expm1(total * bars_per_year / max(num_days, 1)),
+            "Hit Rate": hit_rate,
+            "Max Drawdown": drawdown,
+            "Trades": trades,
+            "Exposure": pos.mean(axis=0)}
+
+def sweep(prices, short_windows=DEFAULT_SHORT, long_windows=DEFAULT_LONG, cost=0.0,
+          interval="1d"):
+    """ backtest the MA cross strategy for all pairs short < long,
+        return dataframe indexed by (Short, Long)
+        cost: proportional cost per buy or sell, e.g. 0.001
+        interval: bar length of the prices, for the annual return """
+    # a bar without a price keeps the last one (no trade, no return)
+    prices = pd.Series(_close(prices)).ffill().to_numpy()
+    short_windows = np.asarray(short_windows, dtype=np.int64)
+    long_windows = np.asarray(long_windows, dtype=np.int64)
+    windows, position = np.unique(np.concatenate((short_windows, long_windows)),
+                                  return_inverse=True)
+    averages = moving_averages(prices, windows)
+    short_ma = averages[position[:len(short_windows)]]
+    # days x long windows, see _evaluate
+    long_ma = np.ascontiguousarray(averages[position[len(short_windows):]].T)
+    # no returns before the first price
+    log_returns = np.nan_to_num(np.diff(np.log(prices)))
+
+    results = []
+    # one short window at a time keeps the arrays at longs x days
+    for i, short in enumerate(short_windows):
+        longer = long_windows > short
+        if not longer.any():
+            continue
+        with np.errstate(invalid="ignore"):
+            signal = short_ma[i][:, None] > long_ma[:, longer]
+        metrics = _evaluate(signal, log_returns, cost, bars_per_year(interval))
+        metrics["Short"] = np.full(longer.sum(), short)
+        metrics["Long"] = long_windows[longer]
+        results.append(pd.DataFrame(metrics))
+    columns = ["Short", "Long", "Total Return", "Annual Return", "Hit Rate",
+               "Max Drawdown", "Trades", "Exposure"]
+    if not results:
+        return pd.DataFrame(columns=columns).set_index(["Short", "Long"])
+    return pd.concat(results, ignore_index=True)[columns].set_index(["Short", "Long"])
+
+def best_pair(result, metric="Total Return"):
+    """ (short, long) window pair with the best value of a metric
+        (the smallest for Max Drawdown) """
+    values = result[metric]
+    return values.idxmin() if metric == "Max Drawdown" else values.idxmax()
+
+def _sweep_job(job):
+    """ sweep of one ticker (runs in a worker), returns (result, error) """
+    prices, short_windows, long_windows, cost, interval = job
+    try:
+        return sweep(prices, short_windows, long_windows, cost, interval), None
+    except Exception as error:
+        return None, error
+
+def sweep_many(prices, short_windows=DEFAULT_SHORT, long_windows=DEFAULT_LONG, cost=0.0,
+               max_workers=1, interval="1d"):
+    """ sweep every ticker of a dict ticker -> prices or of a dataframe with one
+        column per ticker (e.g. data.close_prices), with a process pool if
+        max_workers > 1 (None = all cores); return (dataframe indexed by
+        (Ticker, Short, Long), dict ticker -> error) """
+    if isinstance(prices, pd.DataFrame):
+        prices = {ticker_str: prices[ticker_str].dropna() for ticker_str in prices}
+    jobs = [(_close(values), tuple(short_windows), tuple(long_windows), cost, interval)
+            for values in prices.values()]
+    if max_workers == 1:
+        outcomes = map(_sweep_job, jobs)
+    else:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        outcomes = executor.map(_sweep_job, jobs, chunksize=max(
+            1, len(jobs) // (4 * (max_workers or os.cpu_count() or 1))))
+    results = {}
+    errors = {}
+    try:
+        for ticker_str, (result, error) in zip(prices, outcomes):
+            if error is None:
+                results[ticker_str] = result
+            else:
+                errors[ticker_str] = error
+    finally:
+        if max_workers != 1:
+            executor.shutdown()
+    if not results:
+        return pd.DataFrame(), errors
+    return pd.concat(results, names=["Ticker"]), errors
+
+def benchmark(num_days=20 * TRADING_DAYS, repeat=3):
+    """ time the default 50 x 50 grid over 20 years of synthetic daily prices """
+    from synthetic import synthetic_prices
+    prices = synthetic_prices(1, num_days)[0]
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = sweep(prices)
+        best = min(best, time.perf_counter() - start)
+    print("{} pairs x {} days: {:.3f} s".format(len(result), num_days, best))
+    return best
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Performance Benchmarks
+- Times every hot path on deterministic synthetic data (no network)
+- Reports throughput and peak memory, stores baselines and fails on regressions
+
+Usage:
+    python benchmarks.py --sizes 1000 100000 --tickers 100 --save
+    python benchmarks.py --sizes 1000 100000 --tickers 100 --check --threshold 0.25
+
+Baselines depend on the machine, save them on the machine that checks them.
+
+@author: Sabine Kopplin
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import contextlib
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "benchmarks_baseline.json")
+
+# hot paths (name prefix) -> most rows they are run with, larger sizes are
+# skipped: the sweep holds windows x rows moving averages (GBs at 10M rows),
+# rendering takes minutes and the universe holds tickers x rows prices
+ROW_LIMITS = {"backtest.sweep": 1_000_000, "Graphs.": 1_000_000, "[universe]": 20_000_000}
+
+# hot paths of a whole universe of tickers
+UNIVERSE_CASES = ("summarize_close", "batch_forecast", "screen", "correlation")
+
+def _skip_reason(name, rows):
+    """ reason to skip a hot path for the number of rows (all tickers), or None """
+    for key, limit in ROW_LIMITS.items():
+        if (name.startswith(key) or name.endswith(key)) and rows > limit:
+            return "more than {:,} rows".format(limit)
+    return None
+
+def _single_ticker_cases(num_rows):
+    """ (name, function) of the hot paths of one ticker with n rows """
+    from data import get_data, calc_descriptive
+    from backtest import sweep
+    from indicators import compute_indicators, rolling_stats
+    from prediction import linear_reg, predict_series, rolling_linear_reg
+    from synthetic import synthetic_ohlcv
+
+    bars = synthetic_ohlcv(num_rows)
+
+    class FrameTicker:
+        """ serves the prepared bars like Ticker.history """
+        def history(self, *args, **kwargs):
+            return bars.copy()
+
+    stock_data = get_data(FrameTicker(), "SYN", None, None)
+    num_data_points, lr, trendline, rmse = linear_reg(stock_data)
+
+    def descriptive():
+        with contextlib.redirect_stdout(io.StringIO()):
+            calc_descriptive(stock_data)
+
+    cases = [
+        ("get_data", lambda: get_data(FrameTicker(), "SYN", None, None)),
+        ("compute_indicators", lambda: compute_indicators(bars["Close"].to_numpy())),
+        # one trading day of minute bars
+        ("rolling_stats", lambda: compute_indicators(bars["Close"].to_numpy(),
+                                                     rolling_stats(390))),
+        ("linear_reg", lambda: linear_reg(stock_data)),
+        ("predict_series", lambda: predict_series(lr, num_data_points, 20)),
+        ("rolling_linear_reg", lambda: rolling_linear_reg(stock_data, min(250, num_rows))),
+        ("calc_descriptive", descriptive),
+        ("backtest.sweep", lambda: sweep(stock_data)),
+    ]
+    cases.extend(_graph_cases(stock_data, trendline))
+    return cases
+
+def _graph_cases(stock_data, trendline):
+    """ (name, function) rendering every Graphs chart with the Agg backend """
+    from export import use_agg_backend
+    use_agg_backend()
+    from plots import Graphs
+
+    graph = Graphs(stock_data, "SYN", "Synthetic Inc.", interactive=False)
+
+    def render(chart):
+        def run():
+            fig = graph.timeseries_trend(trendline) if chart == "timeseries_trend" \
+                else getattr(graph, chart)()
+            fig.canvas.draw()
+        return run
+
+    return [("Graphs." + chart, render(chart)) for chart in
+            ("timeseries", "timeseries_trend", "ma_compare", "wma_vs_close", "macd")]
+
+def _universe_cases(num_rows, num_tickers):
+    """ (name, function) of the hot paths of a whole universe of tickers """
+    import pandas as pd
+    from data import summarize_close
+    from prediction import batch_forecast
+    from screener import screen
+    from correlation import aligned_returns, correlation
+    from synthetic import synthetic_prices
+
+    if _skip_reason("[universe]", num_rows * num_tickers) is not None:
+        # the prices are not even generated
+        return [(name + "[universe]", None) for name in UNIVERSE_CASES]
+    prices = synthetic_prices(num_tickers, num_rows)
+    close = pd.DataFrame(prices.T)
+    functions = {
+        "summarize_close": lambda: summarize_close(close),
+        "batch_forecast": lambda: batch_forecast(prices, 20),
+        "screen": lambda: screen(prices),
+        "correlation": lambda: correlation(aligned_returns(prices)),
+    }
+    return [(name + "[universe]", functions[name]) for name in UNIVERSE_CASES]
+
+def measure(function, repeat=3):
+    """ best wall-clock time of n runs and peak traced memory of one run (MB) """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / 1024**2
+
+def run(sizes=(1_000, 100_000), num_tickers=100, repeat=3, charts=True):
+    """ time all hot paths for every size, return dict "name@rows" -> result """
+    results = {}
+    row = "| {:28} | {:>9} | {:>10} | {:>14} | {:>10} |"
+    print(row.format("Hot path", "Rows", "Time [s]", "Rows/s", "Peak [MB]"))
+    for num_rows in sizes:
+        cases = _single_ticker_cases(num_rows)
+        if not charts:
+            cases = [case for case in cases if not case[0].startswith("Graphs.")]
+        cases += _universe_cases(num_rows, num_tickers) if num_tickers > 1 else []
+        for name, function in cases:
+            rows = num_rows * (num_tickers if name.endswith("[universe]") else 1)
+            reason = _skip_reason(name, rows)
+            if reason is not None:
+                results["{}@{}".format(name, num_rows)] = {"skipped": reason}
+                print(row.format(name, num_rows, "skipped", reason, ""))
+                continue
+            seconds, peak = measure(function, repeat)
+            results["{}@{}".format(name, num_rows)] = {"seconds": seconds, "peak_mb": peak,
+                                                       "rows_per_s": rows / seconds}
+            print(row.format(name, num_rows, round(seconds, 5),
+                             int(rows / seconds), round(peak, 1)))
+    return results
+
+def compare(results, baseline, threshold=0.25):
+    """ list of (key, baseline seconds, seconds) that are slower than the
+        baseline by more than the threshold (0.25 = 25 %) """
+    regressions = []
+    for key, result in results.items():
+        # skipped hot paths have no time
+        if "seconds" not in result or "seconds" not in baseline.get(key, {}):
+            continue
+        if result["seconds"] > baseline[key]["seconds"] * (1 + threshold):
+            regressions.append((key, baseline[key]["seconds"], result["seconds"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stock Analyser benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000],
+                        help="rows per ticker (1k to 10M, the sweep and the charts "
+                             "are skipped above 1M)")
+    parser.add_argument("--tickers", type=int, default=100, help="tickers of the universe cases")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per hot path (best counts)")
+    parser.add_argument("--no-charts", action="store_true", help="skip the Graphs rendering")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file (JSON)")
+    parser.add_argument("--save", action="store_true", help="store results as new baseline")
+    parser.add_argument("--check", action="store_true", help="fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown against the baseline (default 0.25)")
+    args = parser.parse_args(argv)
+
+    if args.check and not os.path.exists(args.baseline):
+        print("No baseline {}, store one with --save first".format(args.baseline),
+              file=sys.stderr)
+        return 2
+    results = run(args.sizes, args.tickers, args.repeat, charts=not args.no_charts)
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=1, sort_keys=True)
+        print("Baseline saved to {}".format(args.baseline))
+    if args.check:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for key, before, now in regressions:
+            print("REGRESSION {}: {:.5f} s -> {:.5f} s".format(key, before, now), file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions beyond {:.0%}".format(args.threshold))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+OHLCV Cache
+- On-disk columnar cache of price bars keyed by ticker and interval
+- Only missing date sub-ranges are requested and merged into the cache
+
+Every cache entry is a directory with one .npy file per column (memory-mapped
+when read), the bar timestamps in UTC and a meta.json with the covered date
+ranges, so a request only downloads the gaps between already covered ranges.
+
+@author: Sabine Kopplin
+"""
+
+import os
+import json
+import time
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".stock_analyser", "ohlcv")
+
+# columns of an entry that has never stored any bars
+OHLCV_COLUMNS = ("Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits")
+
+def _empty_frame(columns, tz=None):
+    """ frame without bars, with the given columns and a DatetimeIndex """
+    index = pd.DatetimeIndex([], tz=tz, name="Date").as_unit("ns")
+    return pd.DataFrame({name: np.array([], dtype=np.float64) for name in columns},
+                        index=index)
+
+def _to_ns(date):
+    """ convert a date (str, date, datetime, Timestamp) to naive nanoseconds """
+    date = pd.Timestamp(date)
+    if date.tzinfo is not None:
+        date = date.tz_localize(None)
+    return date.value
+
+def missing_ranges(start, end, covered):
+    """ return the sub-ranges of [start, end) not contained in the
+        sorted list of covered [start, end) ranges """
+    gaps = []
+    cursor = start
+    for cov_start, cov_end in covered:
+        if cov_end <= cursor:
+            continue
+        if cov_start >= end:
+            break
+        if cov_start > cursor:
+            gaps.append((cursor, cov_start))
+        cursor = max(cursor, cov_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+def merge_ranges(ranges):
+    """ merge overlapping or touching [start, end) ranges """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+class OHLCVCache:
+    """ class for the local cache of price bars in front of Ticker.history """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=2 * 1024**3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._stats = {"hits": 0, "partial_hits": 0, "misses": 0,
+                       "evictions": 0, "fetches": 0}
+        # key -> [bytes, last access] of all entries, read from disk once
+        self._index = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def history(self, ticker_str, start_date, end_date, interval, fetch):
+        """ return bars of ticker in [start_date, end_date), calling
+            fetch(start, end) only for the ranges not cached yet """
+        key = "{}_{}".format(ticker_str.upper(), interval)
+        start = _to_ns(start_date)
+        end = _to_ns(end_date)
+        with self._key_lock(key):
+            meta = self._load_meta(key)
+            gaps = missing_ranges(start, end, meta["covered"])
+            # memory-map the columns only if the entry is not rewritten below
+            frame = self._load_frame(key, meta, mmap_mode=None if gaps else "r")
+            # the bar of the current day is still forming, never mark it covered
+            today = pd.Timestamp.now().normalize().value
+            for gap_start, gap_end in gaps:
+                fetched = fetch(pd.Timestamp(gap_start), pd.Timestamp(gap_end))
+                self._count("fetches")
+                frame = self._merge(frame, fetched)
+                if min(gap_end, today) > gap_start:
+                    meta["covered"].append([gap_start, min(gap_end, today)])
+            if not gaps:
+                self._count("hits")
+            elif gaps == [(start, end)]:
+                self._count("misses")
+            else:
+                self._count("partial_hits")
+            meta["covered"] = merge_ranges(meta["covered"])
+            meta["last_access"] = time.time()
+            if gaps:
+                self._save(key, frame, meta)
+            else:
+                self._write_meta(key, meta)
+            # copied while the memory-mapped entry cannot be evicted
+            bars = self._slice(frame, start, end, meta["columns"], meta["tz"])
+        self._evict(keep=key)
+        return bars
+
+    def covers(self, ticker_str, start_date, end_date, interval):
+        """ True if all bars of ticker in [start_date, end_date) are cached """
+        key = "{}_{}".format(ticker_str.upper(), interval)
+        with self._key_lock(key):
+            meta = self._load_meta(key)
+        return not missing_ranges(_to_ns(start_date), _to_ns(end_date), meta["covered"])
+
+    def stats(self):
+        """ return counters for hits, partial hits, misses and evictions
+            together with the current size of the cache """
+        with self._lock:
+            stats = dict(self._stats)
+            entries = self._entries()
+        stats["entries"] = len(entries)
+        stats["bytes"] = sum(size for _, size, _ in entries)
+        return stats
+
+    def clear(self):
+        """ remove all cached bars """
+        with self._lock:
+            for key, _, _ in self._entries():
+                shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            self._index = {}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _entries(self):
+        """ list of (key, bytes, last access) of all cache entries
+            (call with self._lock held) """
+        if self._index is None:
+            # the directory is only scanned once, _record keeps the index current
+            self._index = {}
+            for key in os.listdir(self.directory):
+                meta_path = os.path.join(self.directory, key, "meta.json")
+                try:
+                    with open(meta_path) as file:
+                        meta = json.load(file)
+                except (OSError, ValueError):
+                    continue
+                self._index[key] = [meta.get("bytes", 0), meta.get("last_access", 0)]
+        return [(key, size, access) for key, (size, access) in self._index.items()]
+
+    def _record(self, key, meta):
+        """ update the size and last access of an entry in the index """
+        with self._lock:
+            self._entries()
+            self._index[key] = [meta.get("bytes", 0), meta.get("last_access", 0)]
+
+    def _load_meta(self, key):
+        """ load meta data of a cache entry (empty if missing) """
+        try:
+            with open(os.path.join(self.directory, key, "meta.json")) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"columns": [], "tz": None, "covered": []}
+
+    def _load_frame(self, key, meta, mmap_mode="r"):
+        """ load the bars of a cache entry (None if missing) """
+        if not meta["covered"]:
+            return None
+        path = os.path.join(self.directory, key)
+        index = pd.to_datetime(np.load(os.path.join(path, "index.npy")), utc=True)
+        if meta["tz"]:
+            index = index.tz_convert(meta["tz"])
+        else:
+            index = index.tz_localize(None)
+        index.name = meta.get("index_name")
+        columns = {name: np.load(os.path.join(path, "col{}.npy".format(i)), mmap_mode=mmap_mode)
+                   for i, name in enumerate(meta["columns"])}
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    def _save(self, key, frame, meta):
+        """ write frame columns and meta data of a cache entry """
+        path = os.path.join(self.directory, key)
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        if frame is None or len(frame) == 0:
+            # no bars in the covered ranges (e.g. weekends, holidays), the
+            # columns are kept for empty results of later requests
+            columns = meta["columns"] if frame is None or len(frame.columns) == 0 \
+                else list(frame.columns)
+            tz = getattr(getattr(frame, "index", None), "tz", None)
+            frame = _empty_frame(columns or OHLCV_COLUMNS, tz)
+        index = frame.index
+        meta["tz"] = str(index.tz) if index.tz is not None else None
+        meta["index_name"] = index.name
+        utc = (index.tz_convert("UTC") if index.tz is not None else index).as_unit("ns")
+        np.save(os.path.join(tmp_path, "index.npy"), utc.asi8)
+        meta["columns"] = list(frame.columns)
+        size = utc.asi8.nbytes
+        for i, name in enumerate(frame.columns):
+            values = frame[name].to_numpy()
+            if values.dtype == object:
+                values = values.astype(np.float64)
+            np.save(os.path.join(tmp_path, "col{}.npy".format(i)), values)
+            size += values.nbytes
+        meta["bytes"] = size
+        with open(os.path.join(tmp_path, "meta.json"), "w") as file:
+            json.dump(meta, file)
+        # swap in the new entry
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        self._record(key, meta)
+
+    def _write_meta(self, key, meta):
+        with open(os.path.join(self.directory, key, "meta.json"), "w") as file:
+            json.dump(meta, file)
+        self._record(key, meta)
+
+    def _evict(self, keep=None):
+        """ remove least recently used entries until the size cap is met,
+            entries in use by another thread are skipped """
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            for key, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                # never wait for a key lock here: its holder may wait for self._lock
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+                if not key_lock.acquire(blocking=False):
+                    continue
+                try:
+                    shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+                finally:
+                    key_lock.release()
+                del self._index[key]
+                self._stats["evictions"] += 1
+                total -= size
+
+    def _merge(self, frame, fetched):
+        """ merge newly fetched bars into the cached ones """
+        if fetched is None or len(fetched) == 0:
+            return frame if frame is not None else fetched
+        if frame is None or len(frame) == 0:
+            return fetched.sort_index()
+        if frame.index.tz is not None and fetched.index.tz is not None:
+            fetched = fetched.tz_convert(frame.index.tz)
+        merged = pd.concat([frame, fetched])
+        merged = merged[~merged.index.duplicated(keep="last")]
+        return merged.sort_index()
+
+    def _slice(self, frame, start, end, columns=None, tz=None):
+        """ return a writable copy of the bars in [start, end), an empty
+            frame with the cached columns if there are none """
+        if frame is None or len(frame) == 0:
+            if frame is None or len(frame.columns) == 0:
+                return _empty_frame(columns or OHLCV_COLUMNS, tz)
+            return frame.copy()
+        index = frame.index
+        # compare in exchange wall-clock time like the requested dates
+        local = index.tz_localize(None) if index.tz is not None else index
+        local = local.as_unit("ns")
+        mask = (local.asi8 >= start) & (local.asi8 < end)
+        return frame[mask].copy()
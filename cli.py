@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Command Line Interface
+- Non-interactive batch mode without Tk for descriptive statistics,
+  linear regression and forecasts of a list of tickers
+
+Usage:
+    python stock_analyser_sk.py all AAPL MSFT --start 2019-01-01 --end 2020-01-01
+                                    --horizon 10 --out results
+    python stock_analyser_sk.py charts AAPL MSFT --start 2019-01-01 --format png svg
+
+Heavy modules (pandas, scipy, yfinance) are only imported once a
+subcommand needs them, so that short jobs do not pay their import time.
+
+@author: Sabine Kopplin
+"""
+
+import os
+import sys
+import argparse
+import datetime
+
+def build_parser():
+    """ create parser with one subcommand per analysis """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("tickers", nargs="+", help="stock tickers, e.g. AAPL MSFT")
+    common.add_argument("--start", required=True, help="start date (YYYY-MM-DD)")
+    common.add_argument("--end", default=datetime.date.today().isoformat(),
+                        help="end date (YYYY-MM-DD), default today")
+    common.add_argument("--horizon", type=int, default=10,
+                        help="number of business days to forecast (default 10)")
+    common.add_argument("--out", default="output", help="output directory")
+    common.add_argument("--workers", type=int, default=8,
+                        help="number of concurrent downloads (default 8)")
+    common.add_argument("--no-cache", action="store_true",
+                        help="always download instead of using the local price cache")
+    common.add_argument("--interval", default="1d",
+                        choices=("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d"),
+                        help="bar length (default 1d), horizon and windows count bars")
+    common.add_argument("--compact", action="store_true",
+                        help="keep prices as float32 and drop unused columns (less memory)")
+    common.add_argument("--rolling-stats", metavar="WINDOW", default=None,
+                        help="add rolling quartiles, std, COV and range over a window "
+                             "in bars (e.g. 20) or time (e.g. 1d) to the data table")
+    common.add_argument("--trace", metavar="PREFIX", default=None,
+                        help="time fetch, indicators, regression and charts, write "
+                             "PREFIX.json and the Chrome trace PREFIX.trace.json")
+    common.add_argument("--provider", choices=("yfinance", "local", "replay"),
+                        default="yfinance",
+                        help="data source: yfinance (default), local CSV/Parquet files "
+                             "or replay of recorded yfinance responses")
+    common.add_argument("--data-dir", default=None,
+                        help="directory of the local or replay provider")
+
+    parser = argparse.ArgumentParser(prog="stock_analyser",
+                                     description="Stock Analyser batch mode")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", parents=[common],
+                          help="descriptive statistics of the closing price")
+    subparsers.add_parser("regress", parents=[common],
+                          help="linear regression of the closing price")
+    subparsers.add_parser("forecast", parents=[common],
+                          help="forecast of the closing price for n days")
+    subparsers.add_parser("all", parents=[common],
+                          help="statistics, regression and forecast")
+    charts = subparsers.add_parser("charts", parents=[common],
+                                   help="export charts as image files (process pool)")
+    charts.add_argument("--charts", nargs="+", default=None,
+                        help="chart types (default all): timeseries timeseries_trend "
+                             "ma_compare wma_vs_close macd")
+    charts.add_argument("--format", nargs="+", default=["png"], dest="formats",
+                        help="image formats, e.g. png svg (default png)")
+    screen = subparsers.add_parser("screen", parents=[common],
+                                   help="rank recent Moving Average and MACD crossings")
+    screen.add_argument("--lookback", type=int, default=20,
+                        help="number of recent bars to report crossings for (default 20)")
+    backtest = subparsers.add_parser("backtest", parents=[common],
+                                     help="MA cross backtest over a grid of window pairs")
+    backtest.add_argument("--cost", type=float, default=0.0,
+                          help="proportional cost per buy or sell, e.g. 0.001")
+    correlate = subparsers.add_parser("correlate", parents=[common],
+                                      help="correlation and covariance matrices of the tickers")
+    correlate.add_argument("--top", type=int, default=5,
+                           help="number of most correlated tickers listed per ticker")
+    live = subparsers.add_parser("live", help="live charts of several symbols side by side")
+    live.add_argument("tickers", nargs="+", help="stock tickers, e.g. AAPL MSFT")
+    live.add_argument("--interval", default="1m", help="bar length (default 1m)")
+    live.add_argument("--poll", type=float, default=1.0,
+                      help="seconds between two polls of the provider (default 1)")
+    live.add_argument("--window", type=int, default=300, help="number of bars shown")
+    live.add_argument("--simulate", action="store_true",
+                      help="use a simulated feed of synthetic bars instead of yfinance")
+    live.add_argument("--trace", metavar="PREFIX", default=None,
+                      help="write PREFIX.json and the Chrome trace PREFIX.trace.json")
+    return parser
+
+def run_live(args):
+    """ show live charts until the window is closed, return exit code """
+    from live import live, SimulatedFeed
+
+    provider = SimulatedFeed(interval=args.interval) if args.simulate else None
+    live(args.tickers, provider, args.interval, args.poll, args.window)
+    return 0
+
+def run_backtest(stock_data, args):
+    """ sweep all window pairs of every ticker, store the grid, print the best pairs """
+    from backtest import sweep_many, best_pair
+
+    frames = {ticker_str: frame for ticker_str, frame in stock_data.items() if len(frame)}
+    result, errors = sweep_many(frames, cost=args.cost, max_workers=args.workers,
+                                interval=args.interval)
+    if len(result):
+        result.to_csv(os.path.join(args.out, "backtest.csv"))
+        best = [(ticker_str,) + best_pair(result.loc[ticker_str])
+                for ticker_str in result.index.get_level_values(0).unique()]
+        print(result.loc[best].to_string())
+    return errors
+
+def run_correlate(stock_data, args):
+    """ store the correlation and covariance matrices of the daily returns of
+        all loaded tickers and the most correlated tickers of each """
+    from correlation import aligned_returns, correlation, covariance, top_correlated
+
+    frames = {ticker_str: frame for ticker_str, frame in stock_data.items() if len(frame)}
+    if len(frames) < 2:
+        print("Correlations need at least 2 tickers with data.", file=sys.stderr)
+        return
+    returns = aligned_returns(frames)
+    correlation(returns).to_csv(os.path.join(args.out, "correlation.csv"))
+    covariance(returns).to_csv(os.path.join(args.out, "covariance.csv"))
+    table = top_correlated(returns, args.top)
+    table.to_csv(os.path.join(args.out, "top_correlated.csv"), index=False)
+    print(table.to_string(index=False))
+
+def run_screen(stock_data, args):
+    """ screen all loaded tickers for crossings and store the ranked events """
+    from data import close_prices
+    from screener import screen
+
+    frames = {ticker_str: frame for ticker_str, frame in stock_data.items() if len(frame)}
+    if not frames:
+        return
+    table = screen(close_prices(frames), lookback=args.lookback)
+    table.to_csv(os.path.join(args.out, "screen.csv"))
+    print(table.to_string())
+
+def run_charts(args):
+    """ export the chart pack of all tickers, return exit code """
+    from export import export_universe, CHART_TYPES
+    from providers import make_provider
+
+    cache_dir = None
+    # only downloads are cached, local files and recordings are read from disk anyway
+    if not args.no_cache and args.provider == "yfinance":
+        from cache import DEFAULT_CACHE_DIR
+        cache_dir = DEFAULT_CACHE_DIR
+    exported, errors = export_universe([ticker.upper() for ticker in args.tickers],
+                                       args.start, args.end, args.out,
+                                       charts=args.charts or CHART_TYPES,
+                                       formats=args.formats, max_workers=args.workers,
+                                       cache_dir=cache_dir,
+                                       ticker_factory=make_provider(args.provider,
+                                                                    args.data_dir).ticker)
+    for ticker_str, paths in exported.items():
+        print("{}: {} file(s) exported".format(ticker_str, len(paths)))
+    for ticker_str, error in errors.items():
+        print("{}: {}".format(ticker_str, error), file=sys.stderr)
+    return 1 if errors else 0
+
+def load_data(args):
+    """ get data for all tickers, return (dict ticker -> dataframe, errors) """
+    from data import get_data_many
+    from indicators import DEFAULT_INDICATORS, rolling_stats
+    from providers import make_provider
+
+    indicators = DEFAULT_INDICATORS
+    if args.rolling_stats:
+        window = args.rolling_stats
+        indicators += rolling_stats(int(window) if window.isdigit() else window)
+    cache = None
+    if not args.no_cache and args.provider == "yfinance":
+        from cache import OHLCVCache
+        cache = OHLCVCache()
+    return get_data_many([ticker.upper() for ticker in args.tickers], args.start,
+                         args.end, max_workers=args.workers, cache=cache,
+                         provider=make_provider(args.provider, args.data_dir),
+                         compact=args.compact, interval=args.interval,
+                         indicators=indicators)
+
+def run_stats(ticker_str, stock_data, args):
+    """ print descriptive statistics and store them with the data table """
+    from data import descriptive_stats, format_descriptive
+
+    table = format_descriptive(descriptive_stats(stock_data))
+    with open(os.path.join(args.out, "{}_stats.txt".format(ticker_str)), "w",
+              encoding="utf-8") as file:
+        file.write(table + "\n")
+    print("{:=^35}".format(" " + ticker_str + " "))
+    print(table + "\n")
+    stock_data.to_csv(os.path.join(args.out, "{}_data.csv".format(ticker_str)))
+
+def run_regress(ticker_str, stock_data, args):
+    """ fit linear trend and return one summary row """
+    from prediction import linear_reg
+
+    num_data_points, lr, trendline, rmse = linear_reg(stock_data)
+    return {"Ticker": ticker_str, "Data Points": num_data_points,
+            "Slope": lr.slope, "Intercept": lr.intercept,
+            "R-Squared": round(lr.rvalue**2,5), "RMSE": rmse}
+
+def run_forecast(ticker_str, stock_data, args):
+    """ predict closing prices for the next n business days and store them """
+    import pandas as pd
+    from prediction import linear_reg, predict_series
+
+    num_data_points, lr, trendline, rmse = linear_reg(stock_data)
+    pred_list = predict_series(lr, num_data_points, args.horizon)
+    # bank holidays not considered, only weekends
+    dates = pd.bdate_range(pd.Timestamp(args.end) + pd.offsets.BDay(1), periods=args.horizon)
+    if args.interval != "1d":
+        from intervals import bar_length
+        # intraday: the next bars after the last one (trading hours not considered)
+        step = bar_length(args.interval)
+        dates = pd.date_range(stock_data.index[-1] + step, periods=args.horizon, freq=step)
+    forecast = pd.DataFrame({"Day": range(1, args.horizon + 1),
+                             "Predicted Close": pred_list},
+                            index=dates.date if args.interval == "1d" else dates)
+    forecast.index.name = "Date"
+    forecast.to_csv(os.path.join(args.out, "{}_forecast.csv".format(ticker_str)))
+    print("{} forecast for {} day(s): {}".format(ticker_str, args.horizon,
+                                                  [float(value) for value in pred_list]))
+
+def main(argv=None):
+    """ run a subcommand for all tickers, return exit code """
+    args = build_parser().parse_args(argv)
+    if args.trace is None:
+        return run(args)
+    from tracing import tracer, enable
+    enable()
+    try:
+        return run(args)
+    finally:
+        for path in tracer.export(args.trace):
+            print("Trace written to {}".format(path), file=sys.stderr)
+
+def run(args):
+    """ run the subcommand of parsed arguments, return exit code """
+    if args.command == "live":
+        return run_live(args)
+    if args.horizon < 0:
+        print("Please enter a horizon of 0 or more days.", file=sys.stderr)
+        return 2
+    if args.provider != "yfinance" and args.data_dir is None:
+        print("The {} provider needs --data-dir.".format(args.provider), file=sys.stderr)
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+    if args.command == "charts":
+        return run_charts(args)
+    stock_data, errors = load_data(args)
+    if args.command == "screen":
+        run_screen(stock_data, args)
+    if args.command == "correlate":
+        run_correlate(stock_data, args)
+    if args.command == "backtest":
+        errors.update(run_backtest(stock_data, args))
+
+    regressions = []
+    for ticker_str, frame in stock_data.items():
+        if len(frame) == 0:
+            errors[ticker_str] = ValueError("no data in selected time range")
+            continue
+        try:
+            if args.command in ("stats", "all"):
+                run_stats(ticker_str, frame, args)
+            if args.command in ("regress", "all"):
+                regressions.append(run_regress(ticker_str, frame, args))
+            if args.command in ("forecast", "all"):
+                run_forecast(ticker_str, frame, args)
+        except Exception as error:
+            errors[ticker_str] = error
+    if regressions:
+        import pandas as pd
+        summary = pd.DataFrame(regressions).set_index("Ticker")
+        summary.to_csv(os.path.join(args.out, "regression.csv"))
+        print(summary.to_string())
+
+    # report failing tickers without stopping the others
+    for ticker_str, error in errors.items():
+        print("{}: {}".format(ticker_str, error), file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Correlation
+- Returns of many tickers aligned on a common calendar
+- Correlation and covariance matrices of a whole universe, computed in
+  tiles of tickers so that memory stays bounded (optionally written to a
+  memory-mapped .npy file instead of RAM)
+- Rolling correlations of ticker pairs and the k most correlated tickers
+  of every ticker without building the full matrix
+
+Missing returns (before a listing, holidays of one exchange) are left out
+pairwise, like DataFrame.corr: every pair uses the days where both tickers
+have a return.
+
+@author: Sabine Kopplin
+"""
+
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+
+def aligned_returns(prices, log=True, fill_limit=5):
+    """ dataframe days x tickers of returns on the union of all trading days
+        prices: get_data_many panel, dict of get_data frames, dataframe with
+            one column per ticker (e.g. data.close_prices) or array tickers x days
+        fill_limit: number of missing days a return may span (e.g. holidays);
+            days without a price of a ticker get no return """
+    if isinstance(prices, np.ndarray):
+        prices = pd.DataFrame(np.atleast_2d(prices).T)
+    else:
+        from data import close_prices
+        prices = close_prices(prices)
+    prices = prices.sort_index().astype(np.float64)
+    # the return of a day runs from the last earlier price of the same ticker
+    last = prices.ffill(limit=fill_limit)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = prices / last.shift(1)
+        returns = np.log(ratio) if log else ratio - 1
+    return returns.where(prices.notna()).iloc[1:].dropna(how="all")
+
+class _Returns:
+    """ returns prepared once for all tiles: values centred on their mean,
+        zero where missing, and the mask of present values """
+
+    def __init__(self, returns):
+        if isinstance(returns, pd.DataFrame):
+            self.tickers = list(returns.columns)
+            returns = returns.to_numpy(dtype=np.float64)
+        else:
+            returns = np.asarray(returns, dtype=np.float64)
+            self.tickers = list(range(returns.shape[1]))
+        present = ~np.isnan(returns)
+        # centring keeps the sums of products small and precise
+        with np.errstate(invalid="ignore"):
+            mean = np.nanmean(np.where(present.any(axis=0), returns, 0.0), axis=0)
+        self.complete = bool(present.all())
+        self.values = np.where(present, returns - mean, 0.0)
+        self.mask = None if self.complete else present.astype(np.float64)
+        self.squares = None if self.complete else self.values ** 2
+
+    def tile(self, rows, cols, kind, ddof, min_periods):
+        """ correlation or covariance of the tickers rows x cols """
+        x, y = self.values[:, rows], self.values[:, cols]
+        products = x.T @ y
+        if self.complete:
+            n = np.full(products.shape, float(len(self.values)))
+            sum_x = sum_y = 0.0
+            sum_xx = (x ** 2).sum(axis=0)[:, None]
+            sum_yy = (y ** 2).sum(axis=0)[None, :]
+        else:
+            mask_x, mask_y = self.mask[:, rows], self.mask[:, cols]
+            n = mask_x.T @ mask_y
+            sum_x = x.T @ mask_y
+            sum_y = mask_x.T @ y
+            sum_xx = self.squares[:, rows].T @ mask_y
+            sum_yy = mask_x.T @ self.squares[:, cols]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            co_moment = products - sum_x * sum_y / n
+            if kind == "cov":
+                result = co_moment / (n - ddof)
+            else:
+                result = co_moment / np.sqrt((sum_xx - sum_x ** 2 / n)
+                                             * (sum_yy - sum_y ** 2 / n))
+                np.clip(result, -1.0, 1.0, out=result)
+        result[n < max(min_periods, ddof + 1)] = np.nan
+        return result
+
+def _matrix(returns, kind, block, min_periods, ddof, path, dtype):
+    data = _Returns(returns)
+    num = len(data.tickers)
+    if path is None:
+        out = np.empty((num, num), dtype=dtype)
+    else:
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(num, num))
+    # the matrix is symmetric, so only tiles on and above the diagonal are computed
+    for first in range(0, num, block):
+        rows = slice(first, min(first + block, num))
+        for second in range(first, num, block):
+            cols = slice(second, min(second + block, num))
+            values = data.tile(rows, cols, kind, ddof, min_periods)
+            out[rows, cols] = values
+            out[cols, rows] = values.T
+    if kind == "corr":
+        # a ticker is fully correlated with itself wherever it has enough returns
+        diagonal = np.diagonal(out)
+        out[np.arange(num), np.arange(num)] = np.where(np.isnan(diagonal), np.nan, 1.0)
+    if path is not None:
+        out.flush()
+        with open(_tickers_path(path), "w") as file:
+            json.dump([str(ticker_str) for ticker_str in data.tickers], file)
+    return pd.DataFrame(out, index=data.tickers, columns=data.tickers, copy=False)
+
+def correlation(returns, block=1000, min_periods=20, path=None, dtype=np.float64):
+    """ correlation matrix of all tickers (dataframe tickers x tickers)
+        returns: dataframe days x tickers (e.g. aligned_returns) or array
+        block: number of tickers per tile, memory is about 6 tiles of
+            days x block plus the result
+        path: .npy file for the result, which is then memory-mapped
+            (float32 halves its size) """
+    return _matrix(returns, "corr", block, min_periods, 1, path, dtype)
+
+def covariance(returns, block=1000, min_periods=20, ddof=1, path=None, dtype=np.float64):
+    """ covariance matrix of all tickers, see correlation """
+    return _matrix(returns, "cov", block, min_periods, ddof, path, dtype)
+
+def _tickers_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+def open_matrix(path):
+    """ read-only, memory-mapped dataframe of a matrix stored by correlation
+        or covariance """
+    with open(_tickers_path(path)) as file:
+        tickers = json.load(file)
+    values = np.load(path, mmap_mode="r")
+    return pd.DataFrame(np.asarray(values), index=tickers, columns=tickers, copy=False)
+
+def rolling_matrices(returns, window, step=None, kind="corr", block=1000, min_periods=None):
+    """ iterate over (last day, matrix) of the windows of n days ending every
+        step days (default: non-overlapping windows) up to the last day """
+    step = step or window
+    min_periods = window // 2 if min_periods is None else min_periods
+    for end in range(len(returns), window - 1, -step)[::-1]:
+        part = returns.iloc[end - window:end]
+        yield part.index[-1], _matrix(part, kind, block, min_periods, 1, None, np.float64)
+
+def rolling_correlation(returns, window, pairs=None, min_periods=None):
+    """ rolling correlations of ticker pairs (dataframe days x pairs)
+        pairs: list of (ticker, ticker), default all pairs; every window is
+            computed from running sums, so the cost does not grow with window """
+    tickers = list(returns.columns)
+    if pairs is None:
+        pairs = [(a, b) for i, a in enumerate(tickers) for b in tickers[i + 1:]]
+    min_periods = window // 2 if min_periods is None else min_periods
+    position = {ticker_str: i for i, ticker_str in enumerate(tickers)}
+    first = np.array([position[a] for a, _ in pairs], dtype=np.intp)
+    second = np.array([position[b] for _, b in pairs], dtype=np.intp)
+    values = returns.to_numpy(dtype=np.float64)
+    values = values - np.nanmean(values, axis=0)
+    x, y = values[:, first], values[:, second]
+    # a day counts for a pair only if both tickers have a return
+    both = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(both, x, 0.0)
+    y = np.where(both, y, 0.0)
+
+    def moving_sum(terms):
+        total = np.cumsum(terms, axis=0)
+        total[window:] = total[window:] - total[:-window]
+        return total
+
+    n = moving_sum(both.astype(np.float64))
+    sum_x, sum_y = moving_sum(x), moving_sum(y)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        co_moment = moving_sum(x * y) - sum_x * sum_y / n
+        var_x = moving_sum(x * x) - sum_x ** 2 / n
+        var_y = moving_sum(y * y) - sum_y ** 2 / n
+        result = np.clip(co_moment / np.sqrt(var_x * var_y), -1.0, 1.0)
+    result[n < max(min_periods, 2)] = np.nan
+    columns = pd.MultiIndex.from_tuples(pairs, names=["Ticker", "Other"])
+    return pd.DataFrame(result, index=returns.index, columns=columns)
+
+def top_correlated(returns, k=10, block=1000, min_periods=20, absolute=False):
+    """ k most correlated other tickers of every ticker, as dataframe with the
+        columns Ticker, Rank, Other, Correlation; computed one block of rows
+        at a time, so the full matrix is never held in memory
+        absolute: rank by the size of the correlation (strong negative too) """
+    data = _Returns(returns)
+    num = len(data.tickers)
+    k = min(k, num - 1)
+    tickers = np.asarray(data.tickers, dtype=object)
+    rows = []
+    for first in range(0, num, block):
+        block_rows = slice(first, min(first + block, num))
+        values = np.concatenate([data.tile(block_rows, slice(second, second + block), "corr",
+                                           1, min_periods)
+                                 for second in range(0, num, block)], axis=1)
+        own = np.arange(block_rows.stop - first)
+        values[own, first + own] = np.nan
+        score = np.abs(values) if absolute else values
+        score = np.where(np.isnan(score), -np.inf, score)
+        best = np.argpartition(-score, k - 1, axis=1)[:, :k] if k > 0 else \
+            np.empty((len(own), 0), dtype=np.intp)
+        order = np.argsort(-np.take_along_axis(score, best, axis=1), axis=1, kind="stable")
+        best = np.take_along_axis(best, order, axis=1)
+        found = np.take_along_axis(values, best, axis=1)
+        rows.append(pd.DataFrame({
+            "Ticker": np.repeat(tickers[block_rows], k),
+            "Rank": np.tile(np.arange(1, k + 1), len(own)),
+            "Other": tickers[best.ravel()],
+            "Correlation": found.ravel()}))
+    table = pd.concat(rows, ignore_index=True)
+    # pairs without enough common days are no result
+    return table[table["Correlation"].notna()].reset_index(drop=True)
+
+def benchmark(num_tickers=5000, num_days=2520, k=10):
+    """ time the correlation matrix and the top-k lookup of a synthetic universe
+        (default 5000 tickers x 10 years, 5% of the returns missing) """
+    from synthetic import synthetic_prices
+    rng = np.random.default_rng(0)
+    # a common market factor, so that the tickers are correlated
+    market = np.cumsum(rng.normal(0, 0.01, num_days))
+    prices = synthetic_prices(num_tickers, num_days) * np.exp(
+        market * rng.uniform(0, 1.5, (num_tickers, 1)))
+    prices[rng.random(prices.shape) < 0.05] = np.nan
+    returns = aligned_returns(prices)
+    seconds = {}
+    for name, function in (("correlation", lambda: correlation(returns, dtype=np.float32)),
+                           ("top_correlated", lambda: top_correlated(returns, k))):
+        start = time.perf_counter()
+        function()
+        seconds[name] = time.perf_counter() - start
+        print("{}: {} tickers x {} days: {:.2f} s".format(name, num_tickers, num_days,
+                                                         seconds[name]))
+    return seconds
+
+if __name__ == "__main__":
+    benchmark()
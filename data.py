@@ -10,47 +10,142 @@ Data Gathering
 
 import pandas as pd
 import numpy as np
-import yfinance as yf
-from scipy import stats
-from sklearn.metrics import mean_squared_error as mse
-import tkinter.messagebox as msg
+from concurrent.futures import ThreadPoolExecutor
+from indicators import compute_indicators, DEFAULT_INDICATORS
+from metadata import default_info_cache
+from providers import Provider
+from intervals import fetch_chunked, cached_bars, resolve_windows
+from tracing import tracer, span, count
 
-def get_data(ticker, ticker_str, start_date, end_date):
+# columns of Ticker.history that no analysis uses, dropped in compact mode
+UNUSED_COLUMNS = ("Dividends", "Stock Splits", "Capital Gains")
+# largest relative error of prices and indicators in compact mode (float32
+# keeps 24 bits, i.e. about 6e-8, the rest is headroom)
+COMPACT_TOLERANCE = 1e-6
+
+def get_data(ticker, ticker_str, start_date, end_date, indicators=DEFAULT_INDICATORS,
+             cache=None, compact=False, interval="1d", max_workers=4):
     """ get data from user input in GUI and return dateframe with
-        all stock data necessary for further analysis """
+        all stock data necessary for further analysis
+        ticker: yf.Ticker-like object or a data provider
+        compact: return the smaller frame of compact_frame
+        interval: bar length, e.g. "1m", "15m", "1h" or "1d"; long intraday
+        ranges are fetched in chunks by up to max_workers threads """
+    if isinstance(ticker, Provider):
+        ticker = ticker.ticker(ticker_str)
     # https://towardsdatascience.com/a-comprehensive-guide-to-downloading-stock-prices-in-python-2cd93ff821d4
     # get stock data from yfinance via API and store in dateframe
-    stock_data = ticker.history(ticker_str, start= start_date,
-                                end=end_date, interval="1d")
+    def request(start, end):
+        # one provider request (a chunk of a range or a gap of the cache)
+        with span("fetch.request", ticker=ticker_str, start=start, end=end):
+            bars = ticker.history(ticker_str, start=start, end=end, interval=interval)
+        if tracer.enabled:
+            count("rows.fetched", len(bars))
+            count("bytes.fetched", int(bars.memory_usage(index=True).sum()))
+        return bars
+
+    def fetch(start, end):
+        return fetch_chunked(request, start, end, interval, max_workers)
+
+    with span("fetch", ticker=ticker_str, interval=interval) as fetch_span:
+        if cache is None:
+            stock_data = fetch(start_date, end_date)
+        else:
+            # only download the date ranges not stored in the local cache yet,
+            # or resample finer cached bars instead of downloading this interval
+            stock_data = cached_bars(cache, ticker_str, start_date, end_date, interval, fetch)
+        fetch_span.set(rows=len(stock_data))
+    # add indicator columns (by default: MA 50d/200d, weighted MA 10d,
+    # MACD 12/26 and MACD Signal 9) computed as whole-array kernels
     # https://towardsdatascience.com/moving-average-technical-analysis-with-python-2e77633929cb
-    # add new columns in stock_data df for simple moving averages
-    # short term: 50 days | long term: 200 days
-    stock_data["Short Term MA (50d)"] = stock_data["Close"].rolling(50).mean()
-    stock_data["Long Term MA (200d)"] = stock_data["Close"].rolling(200).mean()
     # https://towardsdatascience.com/trading-toolbox-02-wma-ema-62c22205e2a9
-    # create array of weights for simple weighted moving average
-    weights = np.arange(1,11)
-    # add new column in stock_data df for weighted moving average of 10 days
-    stock_data["Weighted MA (10d)"] = stock_data["Close"].rolling(10).apply(lambda prices: np.dot(prices, weights)/weights.sum(), raw=True)
-    # calculate exponential moving average for 12 and 26 days
-    ema12 = round(stock_data["Close"].ewm(span=12).mean(),3)
-    ema26 = round(stock_data["Close"].ewm(span=26).mean(),3)
-    # add new column in stock_data df for MACD
-    stock_data["MACD"] = ema12 - ema26
-    # add new column in stock_data df for MACD Signal
-    stock_data["MACD Signal"] = round(stock_data["MACD"].ewm(span=9).mean(),3)
+    # windows may be given in time (e.g. "50d"), they are converted to bars here,
+    # on intraday bars the day windows of the default MAs span trading days
+    with span("indicators", ticker=ticker_str, rows=len(stock_data)):
+        columns = compute_indicators(stock_data["Close"].to_numpy(),
+                                     resolve_windows(indicators, stock_data.index, interval))
+    if tracer.enabled:
+        count("rows.indicators", len(stock_data))
+    for name, values in columns.items():
+        stock_data[name] = values
+    # indicators are computed in float64 first, so compact mode only rounds once
+    if compact:
+        stock_data = compact_frame(stock_data)
+
+    return stock_data
 
+def compact_frame(stock_data):
+    """ return copy of a stock data frame without unused columns, prices and
+        indicators as float32 (within COMPACT_TOLERANCE) and volume as the
+        smallest sufficient integer type """
+    stock_data = stock_data.drop(columns=[column for column in UNUSED_COLUMNS
+                                          if column in stock_data])
+    for column in stock_data.columns:
+        values = stock_data[column]
+        if column == "Volume" and values.notna().all() and (values % 1 == 0).all():
+            stock_data[column] = pd.to_numeric(values.astype(np.int64), downcast="unsigned"
+                                               if (values >= 0).all() else "integer")
+        elif pd.api.types.is_float_dtype(values) or column == "Volume":
+            stock_data[column] = values.astype(np.float32)
     return stock_data
 
-def descriptive_stats(stock_data, ticker_str, ticker):
-    """ print all descriptive data and stats on command line """
+def frame_memory(stock_data):
+    """ memory of a frame in bytes (index included),
+        or dict ticker -> bytes for a dict of frames """
+    if isinstance(stock_data, dict):
+        return {ticker_str: frame_memory(frame) for ticker_str, frame in stock_data.items()}
+    return int(stock_data.memory_usage(index=True, deep=True).sum())
+
+def get_data_many(tickers, start_date, end_date, max_workers=8, panel=False,
+                  indicators=DEFAULT_INDICATORS, cache=None, ticker_factory=None,
+                  provider=None, compact=False, interval="1d"):
+    """ get data for many tickers concurrently and return
+        (dict ticker -> dateframe or one panel, dict ticker -> error)
+        provider: data provider (default yfinance), ticker_factory: or a
+        yf.Ticker-like factory instead """
+    if ticker_factory is None:
+        from providers import YFinanceProvider
+        ticker_factory = (provider or YFinanceProvider()).ticker
+
+    def load(ticker_str):
+        return get_data(ticker_factory(ticker_str), ticker_str, start_date,
+                        end_date, indicators=indicators, cache=cache, compact=compact,
+                        interval=interval)
+
+    stock_data = {}
+    errors = {}
+    # downloads wait on the network, so a bounded thread pool overlaps them
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {ticker_str: executor.submit(load, ticker_str) for ticker_str in tickers}
+        for ticker_str, future in futures.items():
+            # a failing ticker is reported, but does not abort the batch
+            try:
+                stock_data[ticker_str] = future.result()
+            except Exception as error:
+                errors[ticker_str] = error
+    if panel:
+        # one frame with columns (ticker, field) on the union of all dates
+        if stock_data:
+            stock_data = pd.concat(stock_data, axis=1)
+        else:
+            stock_data = pd.DataFrame()
+    return stock_data, errors
+
+def descriptive_stats(stock_data, ticker_str, ticker, info_cache=default_info_cache,
+                      summary=None):
+    """ print all descriptive data and stats on command line
+        summary: result of summarize_close computed before (e.g. memoized) """
+    # imported here so that data.py can be used without a display
+    import tkinter.messagebox as msg
 
     msg.showinfo("Notice", "The data will be printed on the command line.")
+    # fetch the ticker metadata once (or reuse the cached one)
+    info = info_cache.get(ticker_str, ticker)
     # print Stock Data Overview
     print("")
     print("*"*100)
     print("")
-    print("{} DATA SUMMARY".format(ticker.info["shortName"].upper()))
+    print("{} DATA SUMMARY".format(info["shortName"].upper()))
     print("")
     print("-"*100)
     # print first 5 rows of data table
@@ -63,45 +158,106 @@ def descriptive_stats(stock_data, ticker_str, ticker):
     print("-"*100)
     print("")
     # print descriptive statistics based on user input
-    calc_descriptive(stock_data)
+    calc_descriptive(stock_data, summary)
     print("")
     # create table for pretty output and print on command line
     row = "| {:16} | {:12} |"
     print("{:=^35}".format(" " + ticker_str + " Overview "))
     # print general stock information based on yfinance data
-    print(row.format("52-week Low", ticker.info["fiftyTwoWeekLow"]))
-    print(row.format("52-week High:", ticker.info["fiftyTwoWeekHigh"]))
-    print(row.format("52-week Avg.", round(ticker.info["fiftyDayAverage"],2)))
-    print(row.format("PREVIOUS CLOSE:", ticker.info["previousClose"]))
-    print(row.format("Trailing PE:", round(ticker.info["trailingPE"],2)))
+    print(row.format("52-week Low", info["fiftyTwoWeekLow"]))
+    print(row.format("52-week High:", info["fiftyTwoWeekHigh"]))
+    print(row.format("52-week Avg.", round(info["fiftyDayAverage"],2)))
+    print(row.format("PREVIOUS CLOSE:", info["previousClose"]))
+    print(row.format("Trailing PE:", round(info["trailingPE"],2)))
     print("=" * 35)
     print("")
     print("*"*100)
 
-def calc_descriptive(stock_data):
-    """calculate descriptive data based on
-        closing price and time range as per user input """
+def close_prices(stock_data):
+    """ closing prices as dataframe with one column per ticker from a get_data
+        dateframe, a get_data_many panel, a dict of dataframes or a Series """
+    if isinstance(stock_data, dict):
+        return pd.DataFrame({ticker_str: frame["Close"] for ticker_str, frame in stock_data.items()})
+    if isinstance(stock_data, pd.Series):
+        return stock_data.to_frame(stock_data.name or "Close")
+    if isinstance(stock_data.columns, pd.MultiIndex):
+        return stock_data.xs("Close", axis=1, level=1)
+    if "Close" in stock_data:
+        return stock_data[["Close"]]
+    return stock_data
+
+def summarize_close(stock_data):
+    """ descriptive statistics of the closing price of one or many tickers,
+        returns dataframe with one row per ticker (unrounded) """
+    close = close_prices(stock_data)
+    # one sort per ticker gives min, max and all quantiles (NaN sorts last)
+    values = np.sort(close.to_numpy(dtype=np.float64), axis=0)
+    if len(values) == 0:
+        # no rows: one missing price per ticker gives the NaN statistics below
+        values = np.full((1, values.shape[1]), np.nan)
+    count = (~np.isnan(values)).sum(axis=0)
+    last = np.maximum(count - 1, 0)
+
+    def order_stat(position):
+        lower = np.floor(position).astype(int)
+        upper = np.ceil(position).astype(int)
+        low = np.take_along_axis(values, lower[None, :], axis=0)[0]
+        high = np.take_along_axis(values, upper[None, :], axis=0)[0]
+        return low + (high - low) * (position - lower)
+
+    # moments from sums of prices shifted by the first one (numerically stable)
+    shift = np.where(count > 0, values[0], 0.0)
+    shifted = values - shift
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sum_1 = np.nansum(shifted, axis=0)
+        sum_2 = np.nansum(shifted**2, axis=0)
+        mean = sum_1 / count + shift
+        std = np.sqrt(np.maximum(sum_2 - sum_1**2 / count, 0.0) / (count - 1))
+        summary = pd.DataFrame({"Mean": mean, "Std": std, "COV": std / mean * 100,
+                                "Min": order_stat(np.zeros(len(count))),
+                                "Q1 (25%)": order_stat(0.25 * last),
+                                "Q2 (50%)": order_stat(0.5 * last),
+                                "Q3 (75%)": order_stat(0.75 * last),
+                                "Max": order_stat(last.astype(np.float64)),
+                                "Count": count}, index=close.columns)
+    summary["Range"] = summary["Max"] - summary["Min"]
+    # tickers without any price have no statistics
+    summary.loc[count == 0, summary.columns != "Count"] = np.nan
+    summary.loc[count < 2, "Std"] = np.nan
+    return summary
+
+def descriptive_stats(stock_data, summary=None):
+    """ rounded descriptive statistics of the closing price as dict
+        label -> value (from the given summary of summarize_close, if any) """
    # calculate various descriptive statistics
-    mean = round(stock_data["Close"].mean(),2)
-    std = round(stock_data["Close"].std(),2)
-    max_val = round(stock_data["Close"].max(),2)
-    min_val = round(stock_data["Close"].min(),2)
+    if summary is None:
+        summary = summarize_close(stock_data["Close"]).iloc[0]
+    mean = round(summary["Mean"],2)
+    std = round(summary["Std"],2)
+    max_val = round(summary["Max"],2)
+    min_val = round(summary["Min"],2)
     range_max_min = round(max_val - min_val,2)
     cov = round((std/mean),2)*100
-    q1 = round(stock_data["Close"].quantile(0.25),2)
-    q2 = round(stock_data["Close"].quantile(0.5),2)
-    q3 = round(stock_data["Close"].quantile(0.75),2)
+    q1 = round(summary["Q1 (25%)"],2)
+    q2 = round(summary["Q2 (50%)"],2)
+    q3 = round(summary["Q3 (75%)"],2)
+    return {"\u03BC (mean)": mean, "\u03C3 (std)": std, "COV": cov, "Min": min_val,
+            "Q1 (25%)": q1, "Q2 (50%)": q2, "Q3 (75%)": q3, "Max": max_val,
+            "Range": range_max_min}
 
-    # create table for pretty output and print on command line
+def format_descriptive(stats):
+    """ table of descriptive_stats for pretty output on the command line """
     row = "| {:16} | {:12} |"
-    print("{:=^35}".format(" Closing Price Summary "))
-    print(row.format("\u03BC (mean)", mean))
-    print(row.format("\u03C3 (std)", std))
-    print(row.format("COV", cov))
-    print(row.format("Min", min_val))
-    print(row.format("Q1 (25%)", q1))
-    print(row.format("Q2 (50%)", q2))
-    print(row.format("Q3 (75%)", q3))
-    print(row.format("Max", max_val))
-    print(row.format("Range", range_max_min))
-    print("=" * 35)
+    lines = ["{:=^35}".format(" Closing Price Summary ")]
+    lines.extend(row.format(label, value) for label, value in stats.items())
+    lines.append("=" * 35)
+    return "\n".join(lines)
+
+def calc_descriptive(stock_data, summary=None):
+    """calculate descriptive data based on
+        closing price and time range as per user input
+        (or print the given summary of summarize_close) """
+    if summary is None:
+        summary = summarize_close(stock_data["Close"]).iloc[0]
+    print(format_descriptive(descriptive_stats(stock_data, summary)))
+    return summary
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Downsampling for plots
+- Shape-preserving reduction of long series before they are drawn
+  (min and max per pixel bucket)
+- Lines and volume areas that re-sample the visible range on zoom/pan
+- Benchmark of render time versus number of rows
+
+@author: Sabine Kopplin
+"""
+
+import time
+import functools
+import numpy as np
+
+def _bucket_edges(num_points, num_buckets):
+    """ start index of each bucket plus the end, buckets of (almost) equal size """
+    return np.linspace(0, num_points, num_buckets + 1).astype(int)
+
+def minmax_downsample(y, num_buckets):
+    """ indices of the min and max of y in every bucket (in order), so that
+        every peak and trough of the drawn line is kept """
+    y = np.asarray(y, dtype=np.float64)
+    num_points = len(y)
+    if num_points <= 2 * num_buckets:
+        return np.arange(num_points)
+    edges = _bucket_edges(num_points, num_buckets)
+    sizes = np.diff(edges)
+    # lay the buckets out as rows of a matrix, padded and missing values never win
+    rows = np.repeat(np.arange(num_buckets), sizes)
+    columns = np.arange(num_points) - np.repeat(edges[:-1], sizes)
+    low = np.full((num_buckets, sizes.max()), np.inf)
+    high = np.full((num_buckets, sizes.max()), -np.inf)
+    low[rows, columns] = np.where(np.isnan(y), np.inf, y)
+    high[rows, columns] = np.where(np.isnan(y), -np.inf, y)
+    indices = np.concatenate((edges[:-1] + np.argmin(low, axis=1),
+                              edges[:-1] + np.argmax(high, axis=1), [0, num_points - 1]))
+    indices = np.unique(indices)
+    return indices[~np.isnan(y[indices])]
+
+def aggregate_max(values, num_buckets):
+    """ bucket edges (as indices) and maximum of values per bucket """
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    num_points = len(values)
+    if num_points <= num_buckets:
+        return np.arange(num_points + 1), values
+    edges = _bucket_edges(num_points, num_buckets)
+    return edges, np.maximum.reduceat(values, edges[:-1])
+
+def _visible(x, ax):
+    """ slice of the sorted x values inside the current x limits (plus one point) """
+    left, right = sorted(ax.get_xlim())
+    start = max(np.searchsorted(x, left) - 1, 0)
+    end = min(np.searchsorted(x, right) + 1, len(x))
+    return slice(start, end)
+
+def _num_buckets(ax):
+    """ one bucket per horizontal pixel of the axes (at least 1000, as the
+        window may still be enlarged after plotting) """
+    return max(int(ax.bbox.width), 1000)
+
+def _autoscaling(ax, event):
+    """ True for limit changes of the autoscaling itself (not a zoom or pan),
+        the initial downsampling then already covers the visible range """
+    return event is ax and ax.get_autoscalex_on()
+
+def _on_resize(fig, event):
+    """ re-sample the downsampled artists of all current axes of a figure """
+    for ax in fig.axes:
+        for downsampled in getattr(ax, "_downsampled", ()):
+            if downsampled.attached():
+                downsampled.update(event)
+
+def _connect(downsampled):
+    """ re-sample the visible range when the user zooms, pans or resizes """
+    ax = downsampled.ax
+    # the callback registries only keep weak references, so the axes owns its
+    # downsampled artists; those of a cleared axes are dropped
+    owned = [other for other in getattr(ax, "_downsampled", ()) if other.attached()]
+    ax._downsampled = owned + [downsampled]
+    ax.callbacks.connect("xlim_changed", downsampled.update)
+    # one resize callback per figure, which outlives cleared or removed axes
+    fig = ax.figure
+    if getattr(fig, "_downsample_cid", None) is None:
+        fig._downsample_cid = fig.canvas.mpl_connect("resize_event",
+                                                     functools.partial(_on_resize, fig))
+
+class DownsampledLine:
+    """ class for a line that only draws the min/max per pixel of its data """
+
+    def __init__(self, ax, x, y, **kwargs):
+        self.ax = ax
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        indices = minmax_downsample(self.y, _num_buckets(ax))
+        (self.line,) = ax.plot(self.x[indices], self.y[indices], **kwargs)
+        _connect(self)
+
+    def attached(self):
+        """ False once the axes was cleared """
+        return self.line.axes is self.ax
+
+    def update(self, event=None):
+        # nothing to re-sample without points
+        if _autoscaling(self.ax, event) or len(self.x) == 0:
+            return
+        visible = _visible(self.x, self.ax)
+        indices = minmax_downsample(self.y[visible], _num_buckets(self.ax)) + visible.start
+        self.line.set_data(self.x[indices], self.y[indices])
+
+class DownsampledArea:
+    """ class for a filled step area of bucket maxima (e.g. trading volume) """
+
+    def __init__(self, ax, x, y, **kwargs):
+        self.ax = ax
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.kwargs = kwargs
+        self.area = None
+        self.update()
+        _connect(self)
+
+    def attached(self):
+        """ False once the axes was cleared """
+        return self.area is None or self.area.axes is self.ax
+
+    def update(self, event=None):
+        # nothing to re-sample without points
+        if _autoscaling(self.ax, event) or len(self.x) == 0:
+            return
+        visible = _visible(self.x, self.ax) if self.area is not None else slice(0, len(self.x))
+        x = self.x[visible]
+        edges, heights = aggregate_max(self.y[visible], _num_buckets(self.ax))
+        # step area from the first to the last day of every bucket
+        edge_x = np.append(x, x[-1] + (x[-1] - x[-2] if len(x) > 1 else 1))[edges]
+        if self.area is not None:
+            self.area.remove()
+        self.area = self.ax.fill_between(edge_x, np.append(heights, heights[-1:]),
+                                         step="post", **self.kwargs)
+
+def benchmark_render(sizes=(1_000, 10_000, 100_000, 1_000_000)):
+    """ time rendering of the Time Series chart with and without downsampling """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    rng = np.random.default_rng(42)
+    row = "| {:>10} | {:>14} | {:>14} |"
+    print(row.format("Rows", "full [s]", "downsampled [s]"))
+    results = []
+    for size in sizes:
+        x = np.arange(size, dtype=np.float64)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size)))
+        volume = rng.integers(1_000, 100_000, size).astype(np.float64)
+        timings = []
+        for downsample in (False, True):
+            fig, (top, bottom) = plt.subplots(2, 1, figsize=(15, 14))
+            start = time.perf_counter()
+            if downsample:
+                DownsampledLine(top, x, close, color="#154892")
+                DownsampledArea(bottom, x, volume, color="#154892")
+            else:
+                top.plot(x, close, color="#154892")
+                # bars are only drawn for up to 10k rows, beyond that it takes minutes
+                if size <= 10_000:
+                    bottom.bar(x, volume, width=1, color="#154892")
+                else:
+                    bottom.plot(x, volume, color="#154892")
+            fig.canvas.draw()
+            timings.append(time.perf_counter() - start)
+            plt.close(fig)
+        results.append((size, timings[0], timings[1]))
+        print(row.format(size, round(timings[0], 3), round(timings[1], 3)))
+    return pd.DataFrame(results, columns=["Rows", "Full", "Downsampled"]).set_index("Rows")
+
+if __name__ == "__main__":
+    benchmark_render()
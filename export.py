@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Chart Export
+- Render the Graphs charts to PNG/SVG files without a display
+- Fan out over a universe of tickers with a process pool
+
+Each worker process uses the non-interactive Agg backend and keeps one
+figure per chart type, which is cleared and reused for every ticker.
+
+@author: Sabine Kopplin
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from tracing import span
+
+# chart name -> Graphs method (the trend chart needs the regression first)
+CHART_TYPES = ("timeseries", "timeseries_trend", "ma_compare", "wma_vs_close", "macd")
+
+def use_agg_backend():
+    """ switch matplotlib to the non-interactive Agg backend """
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+def export_charts(stock_data, ticker_str, company_name, out_dir,
+                  charts=CHART_TYPES, formats=("png",), dpi=100):
+    """ render the selected charts of one ticker to files,
+        return list of file paths """
+    from plots import Graphs
+    from prediction import linear_reg
+
+    graph = Graphs(stock_data, ticker_str, company_name, interactive=False)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for chart in charts:
+        if chart not in CHART_TYPES:
+            raise ValueError("Unknown chart type: {}".format(chart))
+        if chart == "timeseries_trend":
+            num_data_points, lr, trendline, rmse = linear_reg(stock_data)
+            fig = graph.timeseries_trend(trendline)
+        else:
+            fig = getattr(graph, chart)()
+        for fmt in formats:
+            path = os.path.join(out_dir, "{}_{}.{}".format(ticker_str, chart, fmt))
+            with span("export.savefig", chart=chart, format=fmt):
+                fig.savefig(path, format=fmt, dpi=dpi)
+            paths.append(path)
+        # keep the figure for the next ticker, but drop its artists now
+        fig.clf()
+    return paths
+
+def _export_ticker(job):
+    """ load data of one ticker and export its charts (runs in a worker) """
+    from data import get_data
+    from cache import OHLCVCache
+    from metadata import default_info_cache
+
+    (ticker_str, start_date, end_date, out_dir, charts, formats, cache_dir, ticker_factory) = job
+    cache = OHLCVCache(cache_dir) if cache_dir is not None else None
+    ticker = ticker_factory(ticker_str)
+    stock_data = get_data(ticker, ticker_str, start_date, end_date, cache=cache)
+    if len(stock_data) == 0:
+        raise ValueError("no data in selected time range")
+    try:
+        company_name = default_info_cache.short_name(ticker_str, ticker)
+    except Exception:
+        company_name = ticker_str
+    return export_charts(stock_data, ticker_str, company_name, out_dir, charts, formats)
+
+def _safe_export(job):
+    """ run _export_ticker and return (paths, error) instead of raising """
+    try:
+        return _export_ticker(job), None
+    except Exception as error:
+        return None, error
+
+def export_universe(tickers, start_date, end_date, out_dir, charts=CHART_TYPES,
+                    formats=("png",), max_workers=None, cache_dir=None, ticker_factory=None):
+    """ export chart packs of many tickers with a process pool,
+        return (dict ticker -> file paths, dict ticker -> error)
+        cache_dir: directory of an OHLCVCache shared by the workers """
+    if ticker_factory is None:
+        from providers import YFinanceProvider
+        ticker_factory = YFinanceProvider().ticker
+    jobs = [(ticker_str, start_date, end_date, out_dir, tuple(charts), tuple(formats),
+             cache_dir, ticker_factory) for ticker_str in tickers]
+    exported = {}
+    errors = {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=use_agg_backend) as executor:
+        # several tickers per task keep the per-task overhead small
+        chunksize = max(1, len(jobs) // (4 * (max_workers or os.cpu_count() or 1)))
+        for ticker_str, (paths, error) in zip(tickers, executor.map(_safe_export, jobs,
+                                                                    chunksize=chunksize)):
+            if error is None:
+                exported[ticker_str] = paths
+            else:
+                errors[ticker_str] = error
+    return exported, errors
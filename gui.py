@@ -14,10 +14,15 @@ from tkinter import ttk
 from tkcalendar import Calendar,DateEntry
 import tkinter.messagebox as msg
 import datetime
-import yfinance as yf
-from data import get_data, descriptive_stats
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib.pyplot as plt
+from data import get_data, descriptive_stats, summarize_close
+from cache import OHLCVCache
+from providers import YFinanceProvider
+from metadata import InfoCache, DEFAULT_INFO_PATH
+from memo import ResultCache, result_key, data_version
 from plots import Graphs
-from prediction import linear_reg, predict_value, predict_series
+from prediction import linear_reg, predict_value, predict_series, best_lookback
 from datetime import timedelta
 
 # Code from Lecture 8b "Event-driven Programming"
@@ -26,11 +31,22 @@ class StockAnalyser_Main:
 
     getdata_button_clicked = False
 
-    def __init__(self, master):
+    def __init__(self, master, provider=None):
         # Save master reference
         self.master = master
         # Set window title
         master.title("Stock Analyser")
+        # source of prices and metadata (default: download from yfinance)
+        self.provider = provider or YFinanceProvider()
+        # local cache of downloaded prices, shared by all requests
+        # (local files and recordings are read from disk anyway)
+        self.cache = OHLCVCache() if isinstance(self.provider, YFinanceProvider) else None
+        # ticker metadata, fetched once per symbol and kept on disk for a day
+        self.info_cache = InfoCache(ttl=24 * 3600, path=DEFAULT_INFO_PATH,
+                                    fetch=self.provider.info)
+        # regressions, statistics and figures of the selections, reused until
+        # the data of a ticker and date range changes
+        self.results = ResultCache()
         self.master.configure(background="#5991CA")
 
         # Create a welcome label
@@ -56,7 +72,19 @@ class StockAnalyser_Main:
                                     "Enter a day (0-20):", 6, 0)
 
         # Create OK button to get data from input fields
-        Gui_Tools.create_button(master, "OK", "SystemButtonFace", "black", self.get_input)
+        self.ok_button = Gui_Tools.create_button(master, "OK", "SystemButtonFace",
+                                                 "black", self.get_input)
+
+        # Create busy indicator and cancel button for the data download
+        self.progress = Gui_Tools.create_progressbar(self.master)
+        self.cancel_button = Gui_Tools.create_button(master, "Cancel", "SystemButtonFace",
+                                                     "black", self.cancel_loading)
+        self.cancel_button.configure(state="disabled")
+        # download and indicator computation run on a worker thread,
+        # the second worker prefetches the next likely request
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.loading = None
+        self.request_id = 0
 
         # create 2 combobox for descriptive + predictive analytics events
         self.str_descr_selected, self.select_descriptive = Gui_Tools.create_combobox(self.master,
@@ -66,10 +94,16 @@ class StockAnalyser_Main:
                                                             "Select the Predictive Analytics: ",
                                                             self.predictive)
 
+        # analytics can only be selected once the data is loaded
+        self.select_descriptive.configure(state="disabled")
+        self.select_predictive.configure(state="disabled")
+
         # Create button to quit program, Handler for button click is self.quit
         Gui_Tools.create_button(master, "Quit", "#2B547E", "#EBF3FB", self.quit)
 
     def quit(self):
+        self.request_id += 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
         self.master.destroy()
 
     def get_input(self):
@@ -92,38 +126,136 @@ class StockAnalyser_Main:
             msg.showinfo("Wrong Input", \
             "Please make sure the Start Date lies before the End Date.")
         else:
-            # error handling if ticker not valid
-            try:
-                self.ticker_str = self.stocktkr_entry.get().upper()
-                self.ticker = yf.Ticker(self.ticker_str)
-                self.company_name = self.ticker.info["shortName"]
-                # if all error tests pass, store data in variables for processing
-                self.getdata_button_clicked = True
-                self.populate_combobox()
-                self.start_date = self.startdate.get_date()
-                self.end_date = self.enddate.get_date()
-                self.daysinfuture = int(self.daysinfuture_entry.get())
-                # create dateframe with stock data based on user input
-                self.stock_data = get_data(self.ticker, self.ticker_str,
-                                    self.start_date, self.end_date)
-                # instantiate graph to be used in analytics
-                self.graph = Graphs(self.stock_data, self.ticker_str, self.company_name)
-                # transform daysinfuture to business date in future
-                # bank holidays not considered, only weekends
-                self.date_daysinfuture = self.end_date + \
-                                            timedelta(days=self.daysinfuture)
-                while self.date_daysinfuture.weekday() > 4:
-                    self.date_daysinfuture += timedelta(days=1)
-                # show summary of data stored
-                msg.showinfo("Data stored", "{} \n\nTicker {} \nStart Date: {} \
-                             \nEnd  Date: {} \
-                             \nDay(s) in the Future: {} -> bd {}".format(self.company_name,
-                             self.ticker_str, self.start_date, self.end_date,
-                             self.daysinfuture, self.date_daysinfuture))
-                # return values for other functions
-                return self.ticker_str, self.ticker, self.company_name
-            except KeyError:
-                msg.showinfo("Wrong Input", "Please enter a valid stock ticker.")
+            # download data on a worker thread, keep the window responsive
+            ticker_str = self.stocktkr_entry.get().upper()
+            start_date = self.startdate.get_date()
+            end_date = self.enddate.get_date()
+            daysinfuture = int(self.daysinfuture_entry.get())
+            self.request_id += 1
+            self.loading = self.executor.submit(self.load_data, ticker_str,
+                                                start_date, end_date)
+            self.set_busy(True)
+            self.master.after(100, self.check_loading, self.request_id, ticker_str,
+                              start_date, end_date, daysinfuture)
+
+    def load_data(self, ticker_str, start_date, end_date):
+        """ validate ticker and create dateframe (runs on worker thread) """
+        ticker = self.provider.ticker(ticker_str)
+        company_name = self.info_cache.short_name(ticker_str, ticker)
+        stock_data = get_data(ticker, ticker_str, start_date, end_date, cache=self.cache)
+        return ticker, company_name, stock_data, data_version(stock_data)
+
+    def check_loading(self, request_id, ticker_str, start_date, end_date, daysinfuture):
+        """ poll the worker thread and take over its result on the Tk thread """
+        # result of a cancelled or replaced request is dropped
+        if request_id != self.request_id:
+            return
+        if not self.loading.done():
+            self.master.after(100, self.check_loading, request_id, ticker_str,
+                              start_date, end_date, daysinfuture)
+            return
+        self.set_busy(False)
+        # error handling if ticker not valid
+        try:
+            ticker, company_name, stock_data, version = self.loading.result()
+        except KeyError:
+            msg.showinfo("Wrong Input", "Please enter a valid stock ticker.")
+            return
+        except Exception as error:
+            msg.showinfo("Download failed", "The data could not be loaded:\n{}".format(error))
+            return
+        # if all error tests pass, store data in variables for processing
+        self.ticker_str = ticker_str
+        self.ticker = ticker
+        self.company_name = company_name
+        self.start_date = start_date
+        self.end_date = end_date
+        self.daysinfuture = daysinfuture
+        self.stock_data = stock_data
+        self.data_version = version
+        # results of the previous data of this ticker and dates are outdated
+        self.results.check_version(self.result_key("data")[:4], version)
+        self.getdata_button_clicked = True
+        self.populate_combobox()
+        self.prefetch_next(ticker, ticker_str, end_date)
+        self.show_summary()
+
+    def show_summary(self):
+        """ prepare analytics for the loaded data and show a summary """
+        # instantiate graph to be used in analytics
+        # graphs are only built there, show_graph shows them
+        self.graph = Graphs(self.stock_data, self.ticker_str, self.company_name,
+                            interactive=False)
+        # transform daysinfuture to business date in future
+        # bank holidays not considered, only weekends
+        self.date_daysinfuture = self.end_date + \
+                                    timedelta(days=self.daysinfuture)
+        while self.date_daysinfuture.weekday() > 4:
+            self.date_daysinfuture += timedelta(days=1)
+        # show summary of data stored
+        msg.showinfo("Data stored", "{} \n\nTicker {} \nStart Date: {} \
+                     \nEnd  Date: {} \
+                     \nDay(s) in the Future: {} -> bd {}".format(self.company_name,
+                     self.ticker_str, self.start_date, self.end_date,
+                     self.daysinfuture, self.date_daysinfuture))
+
+    def set_busy(self, busy):
+        """ switch buttons, comboboxes and busy indicator while loading """
+        if busy:
+            self.progress.start(10)
+            self.ok_button.configure(state="disabled")
+            self.cancel_button.configure(state="normal")
+            self.select_descriptive.configure(state="disabled")
+            self.select_predictive.configure(state="disabled")
+        else:
+            self.progress.stop()
+            self.ok_button.configure(state="normal")
+            self.cancel_button.configure(state="disabled")
+            if self.getdata_button_clicked:
+                self.select_descriptive.configure(state="readonly")
+                self.select_predictive.configure(state="readonly")
+
+    def cancel_loading(self):
+        """ drop the running download, the previous data stays available """
+        self.request_id += 1
+        if self.loading is not None:
+            self.loading.cancel()
+        self.set_busy(False)
+
+    def prefetch_next(self, ticker, ticker_str, end_date):
+        """ warm the price cache for the most likely next request:
+            the same ticker with the End Date moved up to today """
+        today = datetime.date.today()
+        if self.cache is not None and end_date < today:
+            self.executor.submit(self.cache.history, ticker_str, end_date,
+                                 today + timedelta(days=1), "1d",
+                                 lambda start, end: ticker.history(ticker_str, start=start,
+                                                                   end=end, interval="1d"))
+
+    def result_key(self, analysis, **params):
+        """ key of an analysis result of the loaded data """
+        return result_key(self.ticker_str, self.start_date, self.end_date, "1d",
+                          analysis, **params)
+
+    def memo(self, analysis, compute, **params):
+        """ result of an analysis of the loaded data, computed once """
+        return self.results.get(self.result_key(analysis, **params), compute,
+                                self.data_version)
+
+    def show_graph(self, name, build):
+        """ show a graph, its window is reused if it is still open with the loaded data """
+        key = self.result_key("figure", name=name)
+        self.results.check_version(key[:4], self.data_version)
+        fig = self.results.peek(key)
+        # graphs of the same type share one figure, so it may show other data by now
+        if fig is None or not plt.fignum_exists(fig.number) or \
+                getattr(fig, "result_key", None) != key:
+            fig = build()
+            fig.result_key = key
+            self.results.put(key, fig)
+        plt.figure(fig.number)
+        Graphs.max_graph()
+        plt.show()
 
     def descriptive(self, event):
         """ process descriptive analytics """
@@ -132,29 +264,33 @@ class StockAnalyser_Main:
         selected = self.str_descr_selected.get()
         # option 1
         if selected == "Data Overview":
-            descriptive_stats(self.stock_data, self.ticker_str, self.ticker)
+            summary = self.memo("summary",
+                                lambda: summarize_close(self.stock_data["Close"]).iloc[0])
+            descriptive_stats(self.stock_data, self.ticker_str, self.ticker, self.info_cache,
+                              summary)
         # option 2
         elif selected == "Time Series - Price & Volume":
-            self.graph.timeseries()
+            self.show_graph(selected, self.graph.timeseries)
         # option 3
         elif selected == "Moving Average Cross":
-            self.graph.ma_compare()
+            self.show_graph(selected, self.graph.ma_compare)
         # option 4
         elif selected == "Weighted MA vs Closing Price":
-            self.graph.wma_vs_close()
+            self.show_graph(selected, self.graph.wma_vs_close)
         # option 5
         elif selected == "MACD":
-            self.graph.macd()
+            self.show_graph(selected, self.graph.macd)
 
     def predictive(self, event):
         """ process predictive analytics """
 
-        num_data_points, lr, trendline, rmse = linear_reg(self.stock_data)
+        num_data_points, lr, trendline, rmse = self.memo("linear_reg",
+                                                         lambda: linear_reg(self.stock_data))
         # check which option was selected and call respective function
         selected = self.str_pred_selected.get()
         # option 1
         if selected == "Time Series with Linear Trend":
-            self.graph.timeseries_trend(trendline)
+            self.show_graph(selected, lambda: self.graph.timeseries_trend(trendline))
         # option 2
         elif selected == "Predict the Future - LinReg":
             # calculate predicted closing price
@@ -174,13 +310,21 @@ class StockAnalyser_Main:
                      \nRMSE: {} \
                      \nThe model seems decent.".format(round(lr.rvalue**2,5), rmse))
             else:
+                # suggest the recent lookback with the best fitting trend
+                window, fit = self.memo("best_lookback",
+                                        lambda: best_lookback(self.stock_data))
+                suggestion = ""
+                if window is not None and window < num_data_points:
+                    suggestion = "\n\nThe last {} days have the best fitting trend: \
+                     \nR-Squared: {} \
+                     \nRMSE: {}".format(window, round(fit["R-Squared"],5), round(fit["RMSE"],5))
                 msg.showinfo("LinReg - Confidence",
                      "For a good model, the following should be true: \
                      \nR-Squared > 0.75 and RMSE < 25 \
                      \n\nR-Squared: {} \
                      \nRMSE: {} \
                      \nMaybe you should not trust the prediction...\
-                     \nperhaps if you choose a shorter, more recent time frame, the linear regression results would improve.".format(round(lr.rvalue**2,5), rmse))
+                     \nperhaps if you choose a shorter, more recent time frame, the linear regression results would improve.{}".format(round(lr.rvalue**2,5), rmse, suggestion))
 
     def populate_combobox(self):
         """ populate combobox in GUI """
@@ -231,5 +375,13 @@ class Gui_Tools:
         return combobox_selected, combobox
 
     def create_button(master, label, button_color, label_color, function):
-        tk.Button(master, text = label, bg = button_color,
-                  fg = label_color, command = function, width = 10).grid(columnspan=2)
+        button = tk.Button(master, text = label, bg = button_color,
+                           fg = label_color, command = function, width = 10)
+        button.grid(columnspan=2)
+        return button
+
+    def create_progressbar(master):
+        # busy indicator, runs while data is downloaded
+        progressbar = ttk.Progressbar(master, mode = "indeterminate", length = 150)
+        progressbar.grid(columnspan=2, pady = 2)
+        return progressbar
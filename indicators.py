@@ -0,0 +1,670 @@
+# -*- coding: utf-8 -*-
+"""
+Indicator Engine
+- Whole-array NumPy kernels for moving averages and MACD
+- Rolling quartiles, std, COV and range (sorted window, O(log n) search per bar)
+- Registry of indicator kinds so get_data can ask for a list of indicators
+- Stateful indicators that update in constant time per new bar
+
+All kernels work on the last axis, so they accept a single price series
+(1-D) as well as a ticker x day price matrix (2-D).
+
+@author: Sabine Kopplin
+"""
+
+import copy
+import time
+import bisect
+from collections import deque
+import numpy as np
+
+def _lfilter(b, a, x, axis=-1):
+    """ scipy.signal.lfilter, imported on first use (scipy.signal is slow to import) """
+    from scipy.signal import lfilter as scipy_lfilter
+    return scipy_lfilter(b, a, x, axis=axis)
+
+def _as_float_array(prices):
+    """ convert prices (list, array, Series) to a float64 ndarray """
+    return np.asarray(prices, dtype=np.float64)
+
+def _window_sum(values, window):
+    """ sum over a trailing window along the last axis via cumulative sums,
+        first window-1 entries are NaN """
+    csum = np.cumsum(values, axis=-1)
+    out = np.full(values.shape, np.nan)
+    out[..., window - 1] = csum[..., window - 1]
+    out[..., window:] = csum[..., window:] - csum[..., :-window]
+    return out
+
+def sma(prices, window):
+    """ simple moving average over a trailing window of n bars
+        (same as pandas rolling(window).mean()) """
+    prices = _as_float_array(prices)
+    if window > prices.shape[-1]:
+        return np.full(prices.shape, np.nan)
+    missing = np.isnan(prices)
+    # subtract the mean before summing to keep the cumsum small and precise
+    counts = np.maximum((~missing).sum(axis=-1, keepdims=True), 1)
+    offset = np.where(missing, 0.0, prices).sum(axis=-1, keepdims=True) / counts
+    filled = np.where(missing, 0.0, prices - offset)
+    out = _window_sum(filled, window) / window + offset
+    # a window with any missing price has no average (as in pandas)
+    out[_window_sum(missing.astype(np.float64), window) > 0] = np.nan
+    return out
+
+def wma(prices, window):
+    """ linearly weighted moving average, most recent bar has weight n
+        (same as rolling(window).apply(np.dot(prices, 1..n)/sum(1..n))) """
+    prices = _as_float_array(prices)
+    if window > prices.shape[-1]:
+        return np.full(prices.shape, np.nan)
+    weights = np.arange(1, window + 1, dtype=np.float64)
+    missing = np.isnan(prices)
+    # FIR filter: y[t] = sum_k b[k] * x[t-k] with b = [n, n-1, ..., 1] / sum
+    out = _lfilter(weights[::-1] / weights.sum(), [1.0],
+                  np.where(missing, 0.0, prices), axis=-1)
+    out[..., :window - 1] = np.nan
+    out[_window_sum(missing.astype(np.float64), window) > 0] = np.nan
+    return out
+
+def ema(prices, span):
+    """ exponential moving average with alpha = 2/(span+1)
+        (same as pandas ewm(span=span).mean(), i.e. adjust=True) """
+    prices = _as_float_array(prices)
+    decay = 1.0 - 2.0 / (span + 1.0)
+    valid = ~np.isnan(prices)
+    # weighted sum of prices and sum of weights as two IIR filters,
+    # missing prices carry no weight but still age the older ones
+    num = _lfilter([1.0], [1.0, -decay], np.where(valid, prices, 0.0), axis=-1)
+    den = _lfilter([1.0], [1.0, -decay], valid.astype(np.float64), axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = num / den
+    out[den == 0] = np.nan
+    return out
+
+def macd(prices, fast=12, slow=26, signal=9, decimals=3):
+    """ MACD line (EMA fast - EMA slow) and its signal line (EMA of MACD),
+        rounded to n decimals like the original get_data columns """
+    macd_line = np.round(ema(prices, fast), decimals) - np.round(ema(prices, slow), decimals)
+    signal_line = np.round(ema(macd_line, signal), decimals)
+    return macd_line, signal_line
+
+def _rolling_moments(prices, window):
+    """ number of prices, mean and sum of squared deviations of every trailing
+        window; the sums restart every n bars around the mean of those bars,
+        so they stay precise over millions of bars (unlike one long cumsum) """
+    prices = _as_float_array(prices)
+    length = prices.shape[-1]
+    chunks = -(-length // window)
+    padded = np.full(prices.shape[:-1] + (chunks * window,), np.nan)
+    padded[..., :length] = prices
+    padded = padded.reshape(prices.shape[:-1] + (chunks, window))
+    valid = ~np.isnan(padded)
+    count = valid.sum(axis=-1)
+    offset = np.where(valid, padded, 0.0).sum(axis=-1) / np.maximum(count, 1)
+    deviation = np.where(valid, padded - offset[..., None], 0.0)
+    # prefix sums inside every chunk
+    n = np.cumsum(valid, axis=-1, dtype=np.float64)
+    s1 = np.cumsum(deviation, axis=-1)
+    s2 = np.cumsum(deviation**2, axis=-1)
+    # the rest of the window lies in the previous chunk after the same position
+    def previous(prefix):
+        rest = np.zeros(prefix.shape)
+        rest[..., 1:, :-1] = prefix[..., :-1, -1:] - prefix[..., :-1, :-1]
+        return rest
+    rest_n, rest_s1, rest_s2 = previous(n), previous(s1), previous(s2)
+    # move the sums of the previous chunk to the offset of the current one
+    delta = np.zeros(offset.shape)
+    delta[..., 1:] = offset[..., 1:] - offset[..., :-1]
+    delta = delta[..., None]
+    total_n = n + rest_n
+    total_s1 = s1 + rest_s1 - rest_n * delta
+    total_s2 = s2 + rest_s2 - 2 * delta * rest_s1 + rest_n * delta**2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total_s1 / total_n + offset[..., None]
+        squares = np.maximum(total_s2 - total_s1**2 / total_n, 0.0)
+    shape = prices.shape[:-1] + (chunks * window,)
+    return tuple(values.reshape(shape)[..., :length] for values in (total_n, mean, squares))
+
+def rolling_std(prices, window, ddof=1):
+    """ standard deviation over a trailing window of n bars
+        (same as pandas rolling(window).std()) """
+    count, _, squares = _rolling_moments(prices, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.sqrt(squares / (window - ddof))
+    # incomplete windows and windows with missing prices have no value
+    out[count < window] = np.nan
+    return out
+
+def rolling_cov(prices, window, ddof=1):
+    """ coefficient of variation (std / mean in %) over a trailing window,
+        as the COV of calc_descriptive """
+    count, mean, squares = _rolling_moments(prices, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.sqrt(squares / (window - ddof)) / mean * 100
+    out[count < window] = np.nan
+    return out
+
+def _order_stats_row(values, window, positions):
+    """ order statistics of every trailing window of a list of floats, kept in
+        a sorted list: each bar is one bisect insertion and one removal instead
+        of sorting the window again; positions: (index, fraction) into the
+        sorted window, linearly interpolated """
+    insort, bisect_left = bisect.insort, bisect.bisect_left
+    ordered = []
+    missing = 0
+    columns = [[np.nan] * len(values) for _ in positions]
+    # exact order statistics need no interpolation
+    exact = [(column, index) for column, (index, fraction) in zip(columns, positions)
+             if not fraction]
+    between = [(column, index, fraction) for column, (index, fraction)
+               in zip(columns, positions) if fraction]
+    for i, value in enumerate(values):
+        if i >= window:
+            oldest = values[i - window]
+            if oldest != oldest:
+                missing -= 1
+            else:
+                del ordered[bisect_left(ordered, oldest)]
+        if value != value:
+            missing += 1
+        else:
+            insort(ordered, value)
+        if i >= window - 1 and not missing:
+            for column, index in exact:
+                column[i] = ordered[index]
+            for column, index, fraction in between:
+                low = ordered[index]
+                column[i] = low + (ordered[index + 1] - low) * fraction
+    return columns
+
+def _rolling_order_stats(prices, window, quantiles):
+    """ array (quantiles, ...) of rolling quantiles along the last axis """
+    prices = _as_float_array(prices)
+    out = np.full((len(quantiles),) + prices.shape, np.nan)
+    if window < 1 or window > prices.shape[-1]:
+        return out
+    # position q * (n - 1) in the sorted window, as pandas' linear interpolation
+    positions = []
+    for q in quantiles:
+        index = min(int(np.floor(q * (window - 1))), window - 1)
+        positions.append((index, q * (window - 1) - index))
+    rows = prices.reshape(-1, prices.shape[-1])
+    flat = out.reshape(len(quantiles), -1, prices.shape[-1])
+    for row in range(rows.shape[0]):
+        flat[:, row] = _order_stats_row(rows[row].tolist(), window, positions)
+    return out
+
+def rolling_quantile(prices, window, q=0.5):
+    """ quantile(s) over a trailing window of n bars (same as pandas
+        rolling(window).quantile(q)), one array or a tuple for several q,
+        which share one pass over the prices """
+    if np.ndim(q) == 0:
+        return _rolling_order_stats(prices, window, (q,))[0]
+    return tuple(_rolling_order_stats(prices, window, tuple(q)))
+
+def _rolling_extreme(prices, window, function):
+    """ rolling maximum or minimum (np.maximum, np.minimum) in O(1) per bar:
+        running extremes forward and backward inside blocks of n bars, a
+        window is the backward extreme of one block and the forward one of
+        the next (van Herk / Gil-Werman); NaN in a window gives NaN """
+    prices = _as_float_array(prices)
+    length = prices.shape[-1]
+    out = np.full(prices.shape, np.nan)
+    if window < 1 or window > length:
+        return out
+    blocks = -(-length // window)
+    padded = np.full(prices.shape[:-1] + (blocks * window,), np.nan)
+    padded[..., :length] = prices
+    shaped = padded.reshape(prices.shape[:-1] + (blocks, window))
+    forward = function.accumulate(shaped, axis=-1).reshape(padded.shape)
+    backward = function.accumulate(shaped[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+    out[..., window - 1:] = function(backward[..., :length - window + 1],
+                                     forward[..., window - 1:length])
+    return out
+
+def rolling_range(prices, window):
+    """ maximum - minimum over a trailing window of n bars """
+    return _rolling_extreme(prices, window, np.maximum) - \
+        _rolling_extreme(prices, window, np.minimum)
+
+# registry of indicator kinds: kind -> function returning one array or a tuple
+INDICATORS = {
+    "sma": sma,
+    "wma": wma,
+    "ema": ema,
+    "macd": macd,
+    "quantile": rolling_quantile,
+    "std": rolling_std,
+    "cov": rolling_cov,
+    "range": rolling_range,
+}
+
+# indicator columns of get_data: (column name(s), kind, parameters)
+DEFAULT_INDICATORS = (
+    ("Short Term MA (50d)", "sma", {"window": 50}),
+    ("Long Term MA (200d)", "sma", {"window": 200}),
+    ("Weighted MA (10d)", "wma", {"window": 10}),
+    (("MACD", "MACD Signal"), "macd", {"fast": 12, "slow": 26, "signal": 9}),
+)
+
+def rolling_stats(window=20):
+    """ indicator specs of the rolling quartiles, std, COV and range, window in
+        bars or in time (e.g. "1d" for one day of intraday bars, see get_data);
+        the columns are labelled with the window as given, e.g. "Rolling Std (20)"
+        for 20 bars and "Rolling Std (1d)" for one day """
+    label = str(window)
+    return (
+        (tuple("Rolling {} ({})".format(name, label) for name in ("Q1", "Q2", "Q3")),
+         "quantile", {"window": window, "q": (0.25, 0.5, 0.75)}),
+        ("Rolling Std ({})".format(label), "std", {"window": window}),
+        ("Rolling COV ({})".format(label), "cov", {"window": window}),
+        ("Rolling Range ({})".format(label), "range", {"window": window}),
+    )
+
+# rolling versions of the calc_descriptive statistics, added to get_data on request
+ROLLING_STATS = rolling_stats(20)
+
+def register_indicator(kind, function):
+    """ add a new indicator kind to the registry """
+    INDICATORS[kind] = function
+
+def compute_indicators(prices, specs=DEFAULT_INDICATORS):
+    """ compute all requested indicators and return dict column -> array """
+    prices = _as_float_array(prices)
+    columns = {}
+    for names, kind, params in specs:
+        try:
+            function = INDICATORS[kind]
+        except KeyError:
+            raise ValueError("Unknown indicator kind: {}".format(kind))
+        result = function(prices, **params)
+        if isinstance(names, str):
+            columns[names] = result
+        else:
+            for name, values in zip(names, result):
+                columns[name] = values
+    return columns
+
+class _RollingState:
+    """ ring buffer with running plain and linearly weighted sums """
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = deque(maxlen=window)
+        self.total = 0.0
+        self.weighted = 0.0
+        self.missing = 0
+        self.updates = 0
+
+    def seed(self, prices):
+        self.buffer.clear()
+        self.buffer.extend(prices[-self.window:])
+        self._resum()
+
+    def push(self, price):
+        if len(self.buffer) == self.window:
+            oldest = self.buffer[0]
+            # shift all weights down by one and add the new bar with weight n
+            self.weighted += self.window * _zero_nan(price) - self.total
+            self.total += _zero_nan(price) - _zero_nan(oldest)
+            self.missing += int(np.isnan(price)) - int(np.isnan(oldest))
+        else:
+            self.weighted += (len(self.buffer) + 1) * _zero_nan(price)
+            self.total += _zero_nan(price)
+            self.missing += int(np.isnan(price))
+        self.buffer.append(price)
+        # recompute the sums once per window to stop rounding drift (amortized O(1))
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self._resum()
+
+    def _resum(self):
+        values = np.nan_to_num(np.asarray(self.buffer, dtype=np.float64))
+        self.total = float(values.sum())
+        self.weighted = float(np.dot(values, np.arange(1, len(values) + 1)))
+        self.missing = int(np.isnan(np.asarray(self.buffer, dtype=np.float64)).sum())
+
+    def full(self):
+        return len(self.buffer) == self.window and self.missing == 0
+
+class _EMAState:
+    """ weighted sum of prices and sum of weights of an adjusted EMA """
+
+    def __init__(self, span):
+        self.decay = 1.0 - 2.0 / (span + 1.0)
+        self.num = 0.0
+        self.den = 0.0
+
+    def seed(self, prices):
+        valid = ~np.isnan(prices)
+        self.num = _lfilter([1.0], [1.0, -self.decay], np.where(valid, prices, 0.0))[-1] \
+            if len(prices) else 0.0
+        self.den = _lfilter([1.0], [1.0, -self.decay], valid.astype(np.float64))[-1] \
+            if len(prices) else 0.0
+
+    def push(self, price):
+        self.num = self.decay * self.num + _zero_nan(price)
+        self.den = self.decay * self.den + (not np.isnan(price))
+        return self.num / self.den if self.den else np.nan
+
+class IncrementalSMA:
+    """ simple moving average updated in O(1) per bar """
+
+    def __init__(self, window):
+        self.state = _RollingState(window)
+
+    def seed(self, prices):
+        self.state.seed(prices)
+
+    def update(self, price):
+        self.state.push(price)
+        return self.state.total / self.state.window if self.state.full() else np.nan
+
+class IncrementalWMA:
+    """ linearly weighted moving average updated in O(1) per bar """
+
+    def __init__(self, window):
+        self.state = _RollingState(window)
+        self.weight_sum = window * (window + 1) / 2
+
+    def seed(self, prices):
+        self.state.seed(prices)
+
+    def update(self, price):
+        self.state.push(price)
+        return self.state.weighted / self.weight_sum if self.state.full() else np.nan
+
+class IncrementalEMA:
+    """ exponential moving average updated in O(1) per bar """
+
+    def __init__(self, span):
+        self.state = _EMAState(span)
+
+    def seed(self, prices):
+        self.state.seed(prices)
+
+    def update(self, price):
+        return self.state.push(price)
+
+class IncrementalMACD:
+    """ MACD and signal line updated in O(1) per bar """
+
+    def __init__(self, fast=12, slow=26, signal=9, decimals=3):
+        self.spans = (fast, slow)
+        self.fast = _EMAState(fast)
+        self.slow = _EMAState(slow)
+        self.signal = _EMAState(signal)
+        self.decimals = decimals
+
+    def seed(self, prices):
+        self.fast.seed(prices)
+        self.slow.seed(prices)
+        macd_line = np.round(ema(prices, self.spans[0]), self.decimals) - \
+            np.round(ema(prices, self.spans[1]), self.decimals)
+        self.signal.seed(macd_line)
+
+    def update(self, price):
+        macd_value = round(self.fast.push(price), self.decimals) - \
+            round(self.slow.push(price), self.decimals)
+        return macd_value, round(self.signal.push(macd_value), self.decimals)
+
+class _SortedWindow:
+    """ last n prices in arrival order and sorted (bisect insertion and
+        removal), with running sums of the prices shifted by a reference """
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = deque(maxlen=window)
+        self.ordered = []
+        self.missing = 0
+        self.shift = 0.0
+        self.total = 0.0
+        self.squares = 0.0
+        self.updates = 0
+
+    def seed(self, prices):
+        self.buffer.clear()
+        self.buffer.extend(prices[-self.window:])
+        self.ordered = sorted(price for price in self.buffer if not np.isnan(price))
+        self.missing = len(self.buffer) - len(self.ordered)
+        self._resum()
+
+    def push(self, price):
+        if len(self.buffer) == self.window:
+            self._remove(self.buffer[0])
+        self.buffer.append(price)
+        if np.isnan(price):
+            self.missing += 1
+        else:
+            bisect.insort(self.ordered, price)
+            self.total += price - self.shift
+            self.squares += (price - self.shift) ** 2
+        # recompute the sums once per window to stop rounding drift (amortized O(1))
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self._resum()
+
+    def _remove(self, price):
+        if np.isnan(price):
+            self.missing -= 1
+        else:
+            del self.ordered[bisect.bisect_left(self.ordered, price)]
+            self.total -= price - self.shift
+            self.squares -= (price - self.shift) ** 2
+
+    def _resum(self):
+        values = np.asarray(self.ordered, dtype=np.float64)
+        # sums around the current mean stay small
+        self.shift = float(values.mean()) if len(values) else 0.0
+        self.total = float((values - self.shift).sum())
+        self.squares = float(((values - self.shift) ** 2).sum())
+
+    def full(self):
+        return len(self.buffer) == self.window and self.missing == 0
+
+    def quantile(self, q):
+        position = q * (self.window - 1)
+        index = min(int(np.floor(position)), self.window - 1)
+        low = self.ordered[index]
+        fraction = position - index
+        return low + (self.ordered[index + 1] - low) * fraction if fraction else low
+
+    def std(self, ddof=1):
+        variance = (self.squares - self.total ** 2 / self.window) / (self.window - ddof)
+        return float(np.sqrt(max(variance, 0.0)))
+
+    def mean(self):
+        return self.total / self.window + self.shift
+
+class IncrementalQuantile:
+    """ rolling quantile(s) updated in O(log n) search per bar """
+
+    def __init__(self, window, q=0.5):
+        self.state = _SortedWindow(window)
+        self.q = q
+
+    def seed(self, prices):
+        self.state.seed(prices)
+
+    def update(self, price):
+        self.state.push(price)
+        single = np.ndim(self.q) == 0
+        quantiles = (self.q,) if single else self.q
+        values = tuple(self.state.quantile(q) if self.state.full() else np.nan
+                       for q in quantiles)
+        return values[0] if single else values
+
+class IncrementalStd:
+    """ rolling standard deviation updated in O(1) sums per bar """
+
+    def __init__(self, window, ddof=1):
+        self.state = _SortedWindow(window)
+        self.ddof = ddof
+
+    def seed(self, prices):
+        self.state.seed(prices)
+
+    def update(self, price):
+        self.state.push(price)
+        return self.state.std(self.ddof) if self.state.full() else np.nan
+
+class IncrementalCOV(IncrementalStd):
+    """ rolling coefficient of variation (%) updated in O(1) sums per bar """
+
+    def update(self, price):
+        self.state.push(price)
+        if not self.state.full():
+            return np.nan
+        return self.state.std(self.ddof) / self.state.mean() * 100
+
+class IncrementalRange:
+    """ rolling maximum - minimum updated in O(log n) search per bar """
+
+    def __init__(self, window):
+        self.state = _SortedWindow(window)
+
+    def seed(self, prices):
+        self.state.seed(prices)
+
+    def update(self, price):
+        self.state.push(price)
+        ordered = self.state.ordered
+        return ordered[-1] - ordered[0] if self.state.full() else np.nan
+
+# registry of stateful counterparts of the indicator kinds
+INCREMENTAL_INDICATORS = {
+    "sma": IncrementalSMA,
+    "wma": IncrementalWMA,
+    "ema": IncrementalEMA,
+    "macd": IncrementalMACD,
+    "quantile": IncrementalQuantile,
+    "std": IncrementalStd,
+    "cov": IncrementalCOV,
+    "range": IncrementalRange,
+}
+
+def _zero_nan(price):
+    return 0.0 if np.isnan(price) else price
+
+class IncrementalIndicators:
+    """ class to keep indicator columns current bar by bar,
+        seeded from a get_data frame instead of a full recompute """
+
+    def __init__(self, specs=DEFAULT_INDICATORS):
+        self.specs = specs
+        self.states = []
+        for names, kind, params in specs:
+            try:
+                self.states.append((names, INCREMENTAL_INDICATORS[kind](**params)))
+            except KeyError:
+                raise ValueError("No incremental version of indicator kind: {}".format(kind))
+        # states before the last bar, restored by replace_last
+        self._before_last = None
+
+    @classmethod
+    def from_frame(cls, stock_data, specs=DEFAULT_INDICATORS):
+        """ create indicators seeded with the closing prices of stock_data """
+        indicators = cls(specs)
+        indicators.seed(stock_data["Close"])
+        return indicators
+
+    def seed(self, prices):
+        """ set the state as if all prices had been passed to update """
+        prices = _as_float_array(prices)
+        if len(prices):
+            for _, state in self.states:
+                state.seed(prices[:-1])
+            self._before_last = copy.deepcopy(self.states)
+        for _, state in self.states:
+            state.seed(prices)
+        return self
+
+    def update(self, price):
+        """ add one closing price and return dict column -> new value """
+        price = float(price)
+        values = {}
+        for names, state in self.states:
+            result = state.update(price)
+            if isinstance(names, str):
+                values[names] = result
+            else:
+                values.update(zip(names, result))
+        return values
+
+    def update_many(self, prices):
+        """ add a small batch of closing prices, return dict column -> array """
+        rows = [self.update(price) for price in _as_float_array(prices)]
+        return {name: np.array([row[name] for row in rows]) for name in self.columns()}
+
+    def append(self, stock_data, bars):
+        """ return stock_data extended by new bars incl. their indicator columns """
+        import pandas as pd
+
+        bars = bars.copy()
+        prices = _as_float_array(bars["Close"])
+        if len(prices) == 0:
+            return stock_data
+        columns = self.update_many(prices[:-1])
+        self._before_last = copy.deepcopy(self.states)
+        last = self.update(prices[-1])
+        for name, values in columns.items():
+            bars[name] = np.append(values, last[name])
+        return pd.concat([stock_data, bars])
+
+    def replace_last(self, stock_data, bars):
+        """ return stock_data with its last bar replaced by the first of bars
+            (e.g. a still-forming bar that was updated) and the later bars
+            appended, incl. their indicator columns """
+        if self._before_last is None or len(stock_data) == 0:
+            raise ValueError("No last bar to replace")
+        self.states = self._before_last
+        self._before_last = None
+        return self.append(stock_data.iloc[:-1], bars)
+
+    def columns(self):
+        """ list of all indicator column names """
+        names = []
+        for name, _ in self.states:
+            names.extend([name] if isinstance(name, str) else name)
+        return names
+
+def _pandas_reference(close):
+    """ original per-window pandas implementation of the get_data columns """
+    weights = np.arange(1, 11)
+    columns = {}
+    columns["Short Term MA (50d)"] = close.rolling(50).mean()
+    columns["Long Term MA (200d)"] = close.rolling(200).mean()
+    columns["Weighted MA (10d)"] = close.rolling(10).apply(lambda prices: np.dot(prices, weights)/weights.sum(), raw=True)
+    ema12 = round(close.ewm(span=12).mean(),3)
+    ema26 = round(close.ewm(span=26).mean(),3)
+    columns["MACD"] = ema12 - ema26
+    columns["MACD Signal"] = round(columns["MACD"].ewm(span=9).mean(),3)
+    return columns
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000), repeat=3):
+    """ time the NumPy kernels against the original pandas implementation
+        and print the speedup per number of rows """
+    import pandas as pd
+
+    rng = np.random.default_rng(42)
+    row = "| {:>10} | {:>12} | {:>12} | {:>9} |"
+    print(row.format("Rows", "pandas [s]", "numpy [s]", "Speedup"))
+    results = []
+    for size in sizes:
+        close = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, size))))
+        timings = []
+        for function in (_pandas_reference, lambda c: compute_indicators(c.to_numpy())):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                function(close)
+                best = min(best, time.perf_counter() - start)
+            timings.append(best)
+        results.append((size, timings[0], timings[1]))
+        print(row.format(size, round(timings[0], 4), round(timings[1], 4),
+                         round(timings[0] / timings[1], 1)))
+    return results
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Bar Intervals
+- Minute, hourly and daily bars: chunking of long intraday ranges into
+  provider-sized requests, fetched concurrently
+- Resampling of OHLCV bars to coarser intervals, so that cached fine bars
+  are reused instead of downloading every resolution
+- Indicator windows in bars (50) or in time ("50d", "4h", "30min"); on
+  intraday bars, windows of columns labelled in days (e.g. "Short Term MA
+  (50d)") span trading days
+
+@author: Sabine Kopplin
+"""
+
+import re
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+# interval name (as used by yfinance) -> bar length
+INTERVALS = {"1m": pd.Timedelta(minutes=1), "2m": pd.Timedelta(minutes=2),
+             "5m": pd.Timedelta(minutes=5), "15m": pd.Timedelta(minutes=15),
+             "30m": pd.Timedelta(minutes=30), "60m": pd.Timedelta(hours=1),
+             "90m": pd.Timedelta(minutes=90), "1h": pd.Timedelta(hours=1),
+             "1d": pd.Timedelta(days=1)}
+
+# longest range yfinance serves per request (days), daily bars are not limited
+MAX_REQUEST_DAYS = {"1m": 7, "2m": 60, "5m": 60, "15m": 60, "30m": 60,
+                    "60m": 730, "90m": 60, "1h": 730}
+
+# how every column is aggregated into a coarser bar
+AGGREGATION = {"Open": "first", "High": "max", "Low": "min", "Close": "last",
+               "Volume": "sum", "Dividends": "sum", "Stock Splits": "max"}
+
+# indicator parameters that are windows and may be given in time
+WINDOW_PARAMS = ("window", "span", "fast", "slow", "signal")
+
+def bar_length(interval):
+    """ length of one bar of the interval, raise ValueError if unsupported """
+    try:
+        return INTERVALS[interval]
+    except KeyError:
+        raise ValueError("Unsupported interval: {} (supported: {})".format(
+            interval, ", ".join(INTERVALS))) from None
+
+def chunk_ranges(start_date, end_date, interval):
+    """ split [start, end) into ranges the provider serves in one request """
+    bar_length(interval)
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    max_days = MAX_REQUEST_DAYS.get(interval)
+    if max_days is None:
+        return [(start, end)]
+    edges = list(pd.date_range(start, end, freq=pd.Timedelta(days=max_days)))
+    if edges[-1] < end:
+        edges.append(end)
+    return list(zip(edges[:-1], edges[1:]))
+
+def fetch_chunked(fetch, start_date, end_date, interval, max_workers=4):
+    """ call fetch(start, end) once per chunk (concurrently) and return
+        the bars of all chunks in one sorted frame """
+    if start_date is None or end_date is None:
+        return fetch(start_date, end_date)
+    chunks = chunk_ranges(start_date, end_date, interval)
+    if len(chunks) == 1:
+        return fetch(start_date, end_date)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(lambda chunk: fetch(*chunk), chunks))
+    filled = [frame for frame in frames if len(frame)]
+    if not filled:
+        return frames[0]
+    stock_data = pd.concat(filled)
+    return stock_data[~stock_data.index.duplicated(keep="last")].sort_index()
+
+def resample_ohlcv(stock_data, interval):
+    """ aggregate bars to a coarser interval (first open, highest high, lowest
+        low, last close, summed volume); bins without bars are dropped """
+    rule = bar_length(interval)
+    columns = {column: how for column, how in AGGREGATION.items() if column in stock_data}
+    if len(stock_data) == 0:
+        return stock_data[list(columns)]
+    if rule >= pd.Timedelta(days=1):
+        # calendar days in exchange time
+        resampler = stock_data.resample("1D")
+    else:
+        # align the bins to the first bar (e.g. 9:30 for hourly bars)
+        first = stock_data.index[0]
+        offset = (first - first.normalize()) % rule
+        resampler = stock_data.resample(rule, offset=offset, label="left", closed="left")
+    counts = resampler["Close"].count()
+    return resampler.agg(columns)[counts > 0]
+
+def finer_intervals(interval):
+    """ intervals whose bars add up to bars of the interval, coarsest first """
+    rule = bar_length(interval)
+    finer = {INTERVALS[name]: name for name in INTERVALS
+             if INTERVALS[name] < rule and rule % INTERVALS[name] == pd.Timedelta(0)}
+    return [finer[length] for length in sorted(finer, reverse=True)]
+
+def cached_bars(cache, ticker_str, start_date, end_date, interval, fetch):
+    """ bars of the interval from the cache: stored bars of the interval,
+        otherwise resampled from finer stored bars that cover the whole range
+        (any of them gives the same bars, the coarsest is the cheapest),
+        otherwise downloaded with fetch(start, end) and stored """
+    if not cache.covers(ticker_str, start_date, end_date, interval):
+        for finer in finer_intervals(interval):
+            if cache.covers(ticker_str, start_date, end_date, finer):
+                bars = cache.history(ticker_str, start_date, end_date, finer, fetch=None)
+                return resample_ohlcv(bars, interval)
+    return cache.history(ticker_str, start_date, end_date, interval, fetch)
+
+def window_bars(window, index):
+    """ number of bars of a window given in bars (int) or in time ("50d", "4h");
+        day windows on intraday bars count trading days, not calendar hours """
+    if not isinstance(window, str):
+        return int(window)
+    # "50d" is written like in the indicator names (pandas wants "50D")
+    duration = pd.Timedelta(window[:-1] + "D" if window.endswith("d") else window)
+    if len(index) < 2:
+        # the bar length is unknown: a window longer than the bars leaves the
+        # indicator NaN instead of equal to the price
+        return len(index) + 1
+    spacing = pd.Series(index).diff().median()
+    if duration >= pd.Timedelta(days=1) and spacing < pd.Timedelta(days=1):
+        # bars of a typical trading day, e.g. 390 one-minute bars
+        local = index.tz_localize(None) if getattr(index, "tz", None) is not None else index
+        bars_per_day = pd.Series(local.normalize()).value_counts().median()
+        return max(1, int(round(duration / pd.Timedelta(days=1) * bars_per_day)))
+    return max(1, int(round(duration / spacing)))
+
+def _day_labels(names):
+    """ numbers of days in column names, e.g. {50} for "Short Term MA (50d)" """
+    names = [names] if isinstance(names, str) else names
+    return {int(match.group(1)) for match in (re.search(r"\((\d+)d\)$", name)
+                                              for name in names) if match}
+
+def resolve_windows(specs, index, interval="1d"):
+    """ indicator specs with all windows given in time converted to bars;
+        on intraday bars, bar windows of columns labelled in days are taken
+        as trading days (e.g. 50 of "Short Term MA (50d)" as "50d") """
+    intraday = bar_length(interval) < pd.Timedelta(days=1)
+    resolved = []
+    for names, kind, params in specs:
+        days = _day_labels(names) if intraday else set()
+        params = {key: window_bars("{}d".format(value) if isinstance(value, int) and
+                                   value in days else value, index)
+                  if key in WINDOW_PARAMS else value for key, value in params.items()}
+        resolved.append((names, kind, params))
+    return resolved
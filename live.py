@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Live Mode
+- asyncio loop polling a data provider for new bars of several symbols
+- New bars are appended to stock_data with incrementally updated MAs and MACD
+- Charts side by side that only redraw the changed lines (blitting)
+- Simulated feed releasing synthetic bars over time (no network needed)
+
+@author: Sabine Kopplin
+"""
+
+import time
+import asyncio
+import numpy as np
+import pandas as pd
+from providers import Provider
+from indicators import IncrementalIndicators, DEFAULT_INDICATORS
+from intervals import bar_length, resolve_windows
+from tracing import count
+
+# lines of the live charts: (columns on the price axes, columns on the MACD axes)
+PRICE_COLUMNS = ("Close", "Short Term MA (50d)", "Long Term MA (200d)")
+MACD_COLUMNS = ("MACD", "MACD Signal")
+COLORS = {"Close": "#154892", "Short Term MA (50d)": "#6A8EC0",
+          "Long Term MA (200d)": "#D53032", "MACD": "#154892", "MACD Signal": "#D53032"}
+
+def _wall_clock(timestamp):
+    """ timestamp without time zone (exchange time) """
+    return timestamp.tz_localize(None) if timestamp.tzinfo is not None else timestamp
+
+class SimulatedFeed(Provider):
+    """ provider releasing synthetic intraday bars over time: the first
+        history_bars are available at once, then bars_per_second more
+        (0 = only on advance(), e.g. in tests) """
+
+    def __init__(self, start_date="2020-01-06", days=5, interval="1m", history_bars=390,
+                 bars_per_second=1.0, seed=0):
+        from synthetic import SyntheticTicker
+        self.start = pd.Timestamp(start_date)
+        self.end = self.start + pd.offsets.BDay(days)
+        self.interval = interval
+        self.seed = seed
+        self.bars_per_second = bars_per_second
+        self._ticker = SyntheticTicker
+        self._frames = {}
+        # all bars of the simulated days share the same timestamps
+        self.timeline = self._bars("SIM").index
+        self.released = min(history_bars, len(self.timeline))
+        self._started = time.monotonic()
+
+    def _bars(self, symbol):
+        if symbol not in self._frames:
+            self._frames[symbol] = self._ticker(symbol, self.seed).history(
+                start=self.start, end=self.end, interval=self.interval)
+        return self._frames[symbol]
+
+    def advance(self, bars=1):
+        """ release the next n bars """
+        self.released = min(self.released + bars, len(self.timeline))
+
+    def _cutoff(self):
+        released = self.released + int((time.monotonic() - self._started) * self.bars_per_second)
+        return self.timeline[max(min(released, len(self.timeline)), 1) - 1]
+
+    def history(self, symbol, start_date=None, end_date=None, interval="1m"):
+        if interval != self.interval:
+            raise ValueError("The simulated feed serves {} bars".format(self.interval))
+        bars = self._bars(symbol.upper())
+        bars = bars[bars.index <= self._cutoff()]
+        local = bars.index.tz_localize(None)
+        mask = np.ones(len(bars), dtype=bool)
+        if start_date is not None:
+            mask &= local >= pd.Timestamp(start_date)
+        if end_date is not None:
+            mask &= local < pd.Timestamp(end_date)
+        return bars[mask].copy()
+
+    def info(self, symbol):
+        return self._ticker(symbol.upper(), self.seed).info
+
+class LiveSession:
+    """ class polling a provider for new bars of several symbols and keeping
+        their stock_data and indicator columns current """
+
+    def __init__(self, provider, symbols, interval="1m", start_date=None,
+                 indicators=DEFAULT_INDICATORS, max_rows=None):
+        self.provider = provider
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.interval = interval
+        # default history: the last 5 days (yfinance serves 1m bars for 7 days)
+        self.start_date = start_date if start_date is not None else \
+            pd.Timestamp.now().normalize() - pd.Timedelta(days=5)
+        self.indicators = indicators
+        # drop the oldest rows beyond this length (None = keep all)
+        self.max_rows = max_rows
+        self.stock_data = {}
+        # symbol -> exception of its last poll, if it failed
+        self.errors = {}
+        self._incremental = {}
+
+    async def start(self):
+        """ load the history of all symbols concurrently and seed the indicators """
+        from data import get_data
+
+        async def load(symbol):
+            return await asyncio.to_thread(get_data, self.provider, symbol, self.start_date,
+                                           None, self.indicators, interval=self.interval)
+
+        frames = await asyncio.gather(*(load(symbol) for symbol in self.symbols))
+        for symbol, stock_data in zip(self.symbols, frames):
+            self.stock_data[symbol] = stock_data
+            # windows in bars as used by get_data for the history
+            specs = resolve_windows(self.indicators, stock_data.index, self.interval)
+            self._incremental[symbol] = IncrementalIndicators.from_frame(stock_data, specs)
+        return self.stock_data
+
+    async def _poll_symbol(self, symbol):
+        """ fetch the bars from the last known one on, replace the last known bar
+            if it changed (it may still have been forming) and append the later
+            ones, return the number of new or changed bars """
+        stock_data = self.stock_data[symbol]
+        last = stock_data.index[-1] if len(stock_data) else None
+        start = _wall_clock(last) if last is not None else self.start_date
+        bars = await asyncio.to_thread(self.provider.history, symbol, start, None,
+                                       self.interval)
+        bars = bars[[column for column in bars if column in stock_data]]
+        replace = False
+        if last is not None:
+            bars = bars[bars.index >= last]
+            if len(bars) and bars.index[0] == last:
+                known = stock_data[bars.columns].iloc[-1].to_numpy(dtype=np.float64)
+                replace = not np.array_equal(known, bars.iloc[0].to_numpy(dtype=np.float64),
+                                             equal_nan=True)
+                if not replace:
+                    bars = bars.iloc[1:]
+        if len(bars) == 0:
+            return 0
+        if replace:
+            stock_data = self._incremental[symbol].replace_last(stock_data, bars)
+        else:
+            stock_data = self._incremental[symbol].append(stock_data, bars)
+        if self.max_rows is not None and len(stock_data) > self.max_rows:
+            stock_data = stock_data.iloc[-self.max_rows:]
+        self.stock_data[symbol] = stock_data
+        return len(bars)
+
+    async def poll_once(self):
+        """ poll all symbols concurrently, return dict symbol -> number of new or
+            changed bars (failing requests are kept in errors, counted as
+            live.errors and retried next time) """
+        results = await asyncio.gather(*(self._poll_symbol(symbol) for symbol in self.symbols),
+                                       return_exceptions=True)
+        updated = {}
+        for symbol, result in zip(self.symbols, results):
+            if isinstance(result, Exception):
+                self.errors[symbol] = result
+                count("live.errors")
+                continue
+            self.errors.pop(symbol, None)
+            if result > 0:
+                updated[symbol] = result
+        return updated
+
+class LiveChart:
+    """ class for the live charts of a session, one column per symbol with the
+        price and MAs on top and MACD below; only changed axes are redrawn """
+
+    def __init__(self, session, window=300):
+        import matplotlib.pyplot as plt
+        import matplotlib.dates as mdates
+
+        self.session = session
+        # number of bars shown
+        self.window = window
+        self._date2num = mdates.date2num
+        num = len(session.symbols)
+        self.fig, axes = plt.subplots(2, num, squeeze=False, sharex="col",
+                                      figsize=(6 * num, 7), num="Live",
+                                      gridspec_kw={"height_ratios": [3, 1]})
+        self.axes = {}
+        self.lines = {}
+        for column, symbol in enumerate(session.symbols):
+            price_ax, macd_ax = axes[0, column], axes[1, column]
+            price_ax.set_title(symbol)
+            self.axes[symbol] = (price_ax, macd_ax)
+            lines = {}
+            for ax, names in ((price_ax, PRICE_COLUMNS), (macd_ax, MACD_COLUMNS)):
+                for name in names:
+                    # animated lines are left out of the cached background
+                    (lines[name],) = ax.plot([], [], color=COLORS[name], label=name,
+                                             animated=True, linewidth=1)
+                ax.legend(loc="upper left", fontsize=8)
+                ax.xaxis_date()
+            self.lines[symbol] = lines
+        self.fig.tight_layout()
+        self.backgrounds = {}
+        # number of full redraws and of blitted updates, e.g. to check the CPU load
+        self.full_draws = 0
+        self.blits = 0
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
+        for symbol in session.symbols:
+            self._set_data(symbol)
+            self._rescale(symbol)
+
+    def _on_draw(self, event):
+        """ cache the background of every axes and draw the animated lines """
+        canvas = self.fig.canvas
+        for symbol, axes in self.axes.items():
+            for ax in axes:
+                self.backgrounds[ax] = canvas.copy_from_bbox(ax.bbox)
+            self._draw_lines(symbol)
+        self.full_draws += 1
+
+    def _visible(self, symbol):
+        return self.session.stock_data[symbol].iloc[-self.window:]
+
+    def _set_data(self, symbol):
+        visible = self._visible(symbol)
+        index = visible.index
+        x = self._date2num(index.tz_localize(None) if index.tz is not None else index)
+        for name, line in self.lines[symbol].items():
+            if name in visible:
+                line.set_data(x, visible[name].to_numpy(dtype=np.float64))
+
+    def _limits(self, symbol, columns):
+        values = self._visible(symbol)[[name for name in columns
+                                        if name in self.session.stock_data[symbol]]]
+        return np.nanmin(values.to_numpy(dtype=np.float64)), \
+            np.nanmax(values.to_numpy(dtype=np.float64))
+
+    def _rescale(self, symbol):
+        """ set limits with headroom, so that most new bars fit without rescaling """
+        visible = self._visible(symbol)
+        if len(visible) < 2:
+            return
+        x = self.lines[symbol]["Close"].get_xdata()
+        step = np.median(np.diff(x))
+        price_ax, macd_ax = self.axes[symbol]
+        price_ax.set_xlim(x[0], x[-1] + step * max(self.window // 5, 1))
+        for ax, columns in ((price_ax, PRICE_COLUMNS), (macd_ax, MACD_COLUMNS)):
+            low, high = self._limits(symbol, columns)
+            margin = (high - low) * 0.1 or abs(high) * 0.01 or 1.0
+            ax.set_ylim(low - margin, high + margin)
+
+    def _fits(self, symbol):
+        """ True if the visible data lies inside the current limits """
+        price_ax, macd_ax = self.axes[symbol]
+        if self.lines[symbol]["Close"].get_xdata()[-1] > price_ax.get_xlim()[1]:
+            return False
+        for ax, columns in ((price_ax, PRICE_COLUMNS), (macd_ax, MACD_COLUMNS)):
+            low, high = self._limits(symbol, columns)
+            bottom, top = ax.get_ylim()
+            if low < bottom or high > top:
+                return False
+        return True
+
+    def _draw_lines(self, symbol):
+        for name, line in self.lines[symbol].items():
+            line.axes.draw_artist(line)
+
+    def update(self, symbols):
+        """ show the new bars of the given symbols: blit their axes, or redraw
+            the figure if an axis range has to grow """
+        canvas = self.fig.canvas
+        full = not self.backgrounds
+        for symbol in symbols:
+            self._set_data(symbol)
+            if not self._fits(symbol):
+                self._rescale(symbol)
+                full = True
+        if full:
+            # draw_event caches the new backgrounds and draws all lines
+            canvas.draw()
+        else:
+            for symbol in symbols:
+                for ax in self.axes[symbol]:
+                    canvas.restore_region(self.backgrounds[ax])
+                self._draw_lines(symbol)
+                for ax in self.axes[symbol]:
+                    canvas.blit(ax.bbox)
+                self.blits += 1
+        canvas.flush_events()
+
+    def is_open(self):
+        import matplotlib.pyplot as plt
+        return plt.fignum_exists(self.fig.number)
+
+async def run_live(session, chart=None, poll_seconds=1.0, max_polls=None):
+    """ poll the session (and update the chart) every n seconds until the chart
+        window is closed or max_polls is reached """
+    loop = asyncio.get_running_loop()
+    if not session.stock_data:
+        await session.start()
+    if chart is not None:
+        chart.fig.canvas.draw()
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        started = loop.time()
+        updated = await session.poll_once()
+        if chart is not None:
+            if not chart.is_open():
+                break
+            if updated:
+                chart.update(list(updated))
+            else:
+                # keep the window responsive between bars
+                chart.fig.canvas.flush_events()
+        polls += 1
+        # sleep for the rest of the period, the CPU is idle in between
+        await asyncio.sleep(max(0.0, poll_seconds - (loop.time() - started)))
+    return session.stock_data
+
+def live(symbols, provider=None, interval="1m", poll_seconds=1.0, window=300):
+    """ open live charts of several symbols side by side (blocks until closed) """
+    import matplotlib.pyplot as plt
+
+    bar_length(interval)
+    session = LiveSession(provider or _default_provider(), symbols, interval)
+
+    async def main():
+        # one event loop for loading the history and polling
+        await session.start()
+        chart = LiveChart(session, window)
+        plt.show(block=False)
+        return await run_live(session, chart, poll_seconds)
+
+    return asyncio.run(main())
+
+def _default_provider():
+    from providers import YFinanceProvider
+    return YFinanceProvider()
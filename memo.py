@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Result Cache
+- In-session memoization of analysis results (regressions, statistics,
+  rendered figures), keyed by ticker, date range, interval, analysis type
+  and parameters
+- Least recently used results are dropped once a memory ceiling is reached
+- All results of a ticker and date range are dropped when its data is
+  refreshed with different prices
+
+@author: Sabine Kopplin
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from tracing import count
+
+# default memory ceiling of a ResultCache
+DEFAULT_MAX_BYTES = 256 * 1024**2
+
+def result_key(ticker_str, start_date, end_date, interval, analysis, **params):
+    """ hashable key of an analysis result """
+    return (ticker_str.upper(), str(start_date), str(end_date), interval, analysis,
+            tuple(sorted(params.items())))
+
+def data_version(stock_data):
+    """ fingerprint of the prices of a get_data frame, changes if any bar changes """
+    hashes = pd.util.hash_pandas_object(stock_data[["Close", "Volume"]]
+                                        if "Volume" in stock_data else stock_data[["Close"]])
+    return (len(stock_data), int(hashes.sum()))
+
+def result_size(value):
+    """ estimated memory of a result in bytes """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(result_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_size(item) for item in value.values())
+    # matplotlib figures: the RGBA buffer of the canvas and the plotted data
+    if hasattr(value, "get_size_inches") and hasattr(value, "dpi"):
+        width, height = value.get_size_inches() * value.dpi
+        lines = [line.get_xydata().nbytes for ax in value.axes for line in ax.get_lines()]
+        return int(width * height * 4) + sum(lines)
+    return sys.getsizeof(value)
+
+class ResultCache:
+    """ class for a thread-safe LRU cache of analysis results with a memory ceiling """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (result, size), least recently used first
+        self._entries = OrderedDict()
+        # (ticker, start, end, interval) -> data version of the cached results
+        self._versions = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute, version=None):
+        """ return the result of key, computing it with compute() on a miss
+            version: data_version of the data the result is based on; results
+            of the same ticker and dates with another version are dropped """
+        if version is not None:
+            self.check_version(key[:4], version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            count("memo.hit")
+            return entry[0]
+        count("memo.miss")
+        result = compute()
+        self.put(key, result)
+        with self._lock:
+            self.misses += 1
+        return result
+
+    def peek(self, key, default=None):
+        """ return a cached result without computing it (and mark it as used) """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, result):
+        """ store a result, dropping the least recently used ones above the ceiling """
+        size = result_size(result)
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            # a result larger than the whole ceiling is not kept
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (result, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self.size -= self._entries.popitem(last=False)[1][1]
+
+    def check_version(self, scope, version):
+        """ drop the results of (ticker, start, end, interval) if its data changed """
+        with self._lock:
+            previous = self._versions.get(scope)
+            self._versions[scope] = version
+        if previous is not None and previous != version:
+            self.invalidate(*scope)
+
+    def invalidate(self, *scope):
+        """ drop all results whose key starts with the given ticker (and dates,
+            interval, analysis), or all results without arguments """
+        scope = tuple(scope)
+        if scope:
+            scope = (scope[0].upper(),) + scope[1:]
+        with self._lock:
+            for key in [key for key in self._entries if key[:len(scope)] == scope]:
+                self.size -= self._entries.pop(key)[1]
+            if not scope:
+                self._versions.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
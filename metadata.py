@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Ticker Metadata
+- In-process cache of Ticker.info with a time to live (TTL)
+- Optional persistence on disk and bulk prefetch of many symbols
+
+@author: Sabine Kopplin
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_INFO_PATH = os.path.join(os.path.expanduser("~"), ".stock_analyser", "info.json")
+
+def _fetch_info(symbol):
+    """ download the info dict of a symbol from yfinance """
+    import yfinance as yf
+    return yf.Ticker(symbol).info
+
+class InfoCache:
+    """ class to fetch the info dict once per symbol and reuse it until the TTL expires """
+
+    def __init__(self, ttl=6 * 3600, path=None, fetch=_fetch_info):
+        self.ttl = ttl
+        self.path = path
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        self._entries = {}
+        if path is not None:
+            self._read()
+
+    def get(self, symbol, ticker=None):
+        """ return the info dict of symbol, using ticker.info if a ticker is
+            given and the cached one is missing or expired """
+        return self._get(symbol, ticker, persist=True)
+
+    def _get(self, symbol, ticker=None, persist=True):
+        symbol = symbol.upper()
+        with self._lock:
+            entry = self._entries.get(symbol)
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            return entry[1]
+        info = dict(ticker.info if ticker is not None else self.fetch(symbol))
+        with self._lock:
+            self._entries[symbol] = (time.time(), info)
+        if persist:
+            self._write()
+        return info
+
+    def short_name(self, symbol, ticker=None):
+        """ return the company name of a valid ticker, raise KeyError otherwise """
+        return self.get(symbol, ticker)["shortName"]
+
+    def prefetch(self, symbols, max_workers=8):
+        """ fetch the info dicts of many symbols concurrently,
+            return (dict symbol -> info, dict symbol -> error) """
+        infos = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {symbol.upper(): executor.submit(self._get, symbol, persist=False)
+                       for symbol in symbols}
+            for symbol, future in futures.items():
+                try:
+                    infos[symbol] = future.result()
+                except Exception as error:
+                    errors[symbol] = error
+        # write the file once for the whole batch
+        self._write()
+        return infos, errors
+
+    def invalidate(self, symbol=None):
+        """ drop one symbol (or all) from the cache """
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(symbol.upper(), None)
+        self._write()
+
+    def _read(self):
+        """ load still valid entries from disk """
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                stored = json.load(file)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        self._entries = {symbol: (entry["time"], entry["info"])
+                         for symbol, entry in stored.items() if now - entry["time"] < self.ttl}
+
+    def _write(self):
+        """ store all entries on disk (if a path is set) """
+        if self.path is None:
+            return
+        with self._lock:
+            stored = {symbol: {"time": fetched, "info": info}
+                      for symbol, (fetched, info) in self._entries.items()}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(stored, file, default=str)
+            os.replace(tmp_path, self.path)
+
+# shared in-process cache used when no other cache is passed
+default_info_cache = InfoCache()
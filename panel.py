@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Panel Store
+- Columnar on-disk format for a whole universe: one contiguous
+  ticker x date array per field, ticker and date indexes alongside
+- Read-only memory mapping, so many worker processes share the same pages
+  instead of receiving pickled dataframes
+- get_data-compatible per-ticker views for linear_reg, calc_descriptive
+  and Graphs, and a process-pool runner over all tickers
+
+Layout of a store directory:
+    meta.json       tickers, fields, time zone, date span of every ticker and
+                    its slice of positions.npy
+    dates.npy       bar timestamps (UTC nanoseconds) of all tickers
+    positions.npy   date positions of the bars of every ticker, one after
+                    another (a ticker has no bar on dates of other calendars)
+    field{i}.npy    values of field i, shape (tickers, dates), NaN if missing
+
+@author: Sabine Kopplin
+"""
+
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+def _frames(stock_data):
+    """ dict ticker -> dataframe from a dict or a get_data_many panel """
+    if isinstance(stock_data, dict):
+        return stock_data
+    tickers = stock_data.columns.get_level_values(0).unique()
+    return {ticker_str: stock_data[ticker_str].dropna(how="all") for ticker_str in tickers}
+
+def _utc_ns(index):
+    """ int64 UTC nanoseconds of a DatetimeIndex (naive = UTC) """
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.as_unit("ns").asi8
+
+def write_panel(directory, stock_data):
+    """ store get_data frames of many tickers (dict or panel) as panel store,
+        return the opened PanelStore """
+    frames = {ticker_str: frame for ticker_str, frame in _frames(stock_data).items()
+              if len(frame)}
+    if not frames:
+        raise ValueError("no data to store")
+    tickers = list(frames)
+    first = next(iter(frames.values()))
+    fields = [column for column in first.columns
+              if all(column in frame for frame in frames.values())]
+    dates = np.unique(np.concatenate([_utc_ns(frame.index) for frame in frames.values()]))
+    # missing values are NaN, so every field is stored as float (float32 stays float32)
+    dtypes = [np.result_type(np.float32, *[frame[field].dtype for frame in frames.values()])
+              for field in fields]
+    dtypes = [dtype if dtype in (np.float32, np.float64) else np.dtype(np.float64)
+              for dtype in dtypes]
+
+    tmp_path = directory.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "dates.npy"), dates)
+    spans = {}
+    offsets = {}
+    positions = {ticker_str: np.searchsorted(dates, _utc_ns(frame.index))
+                 for ticker_str, frame in frames.items()}
+    for i, (field, dtype) in enumerate(zip(fields, dtypes)):
+        # written through a memory map, one ticker row at a time
+        values = np.lib.format.open_memmap(os.path.join(tmp_path, "field{}.npy".format(i)),
+                                           mode="w+", dtype=dtype,
+                                           shape=(len(tickers), len(dates)))
+        values[:] = np.nan
+        for row, ticker_str in enumerate(tickers):
+            values[row, positions[ticker_str]] = frames[ticker_str][field].to_numpy(dtype=dtype)
+        values.flush()
+        del values
+    offset = 0
+    for ticker_str in tickers:
+        spans[ticker_str] = [int(positions[ticker_str][0]), int(positions[ticker_str][-1]) + 1]
+        offsets[ticker_str] = [offset, offset + len(positions[ticker_str])]
+        offset += len(positions[ticker_str])
+    np.save(os.path.join(tmp_path, "positions.npy"),
+            np.concatenate([positions[ticker_str] for ticker_str in tickers]).astype(np.int64))
+    meta = {"tickers": tickers, "fields": fields, "tz": str(first.index.tz)
+            if first.index.tz is not None else None, "index_name": first.index.name,
+            "spans": spans, "offsets": offsets}
+    with open(os.path.join(tmp_path, "meta.json"), "w") as file:
+        json.dump(meta, file)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_path, directory)
+    return PanelStore(directory)
+
+class PanelStore:
+    """ class for a read-only, memory-mapped panel store """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+        self.tickers = meta["tickers"]
+        self.fields = meta["fields"]
+        self.spans = meta["spans"]
+        self.offsets = meta["offsets"]
+        self._positions = np.load(os.path.join(directory, "positions.npy"), mmap_mode="r")
+        self._rows = {ticker_str: row for row, ticker_str in enumerate(self.tickers)}
+        dates = pd.to_datetime(np.load(os.path.join(directory, "dates.npy")), utc=True)
+        self.dates = dates.tz_convert(meta["tz"]) if meta["tz"] else dates.tz_localize(None)
+        self.dates.name = meta["index_name"]
+        self._values = {}
+
+    def field(self, name):
+        """ memory-mapped array tickers x dates of a field (e.g. "Close") """
+        if name not in self._values:
+            path = os.path.join(self.directory, "field{}.npy".format(self.fields.index(name)))
+            self._values[name] = np.load(path, mmap_mode="r")
+        return self._values[name]
+
+    def positions(self, ticker_str):
+        """ date positions of the bars of a ticker """
+        first, last = self.offsets[ticker_str]
+        return np.asarray(self._positions[first:last])
+
+    def frame(self, ticker_str):
+        """ get_data-compatible dataframe of the bars of one ticker; the columns
+            are read-only views of the memory map if the ticker has a bar on
+            every date of its span, else copies of its own bars """
+        row = self._rows[ticker_str]
+        start, end = self.spans[ticker_str]
+        positions = self.positions(ticker_str)
+        if len(positions) == end - start:
+            positions = slice(start, end)
+        # plain ndarrays (not np.memmap) behave like the get_data columns
+        columns = {name: np.asarray(self.field(name)[row, positions]) for name in self.fields}
+        return pd.DataFrame(columns, index=self.dates[positions], copy=False)
+
+    def frames(self):
+        """ iterate over (ticker, dataframe) of all tickers """
+        for ticker_str in self.tickers:
+            yield ticker_str, self.frame(ticker_str)
+
+# store opened once per worker process by the initializer of map_tickers
+_worker_store = None
+
+def _open_worker_store(directory):
+    global _worker_store
+    _worker_store = PanelStore(directory)
+
+def _run_ticker(job):
+    """ call the function of a job on the view of its ticker (runs in a worker) """
+    function, ticker_str = job
+    try:
+        return function(ticker_str, _worker_store.frame(ticker_str)), None
+    except Exception as error:
+        return None, error
+
+def map_tickers(directory, function, tickers=None, max_workers=None):
+    """ call function(ticker, dataframe) for every ticker of a panel store with a
+        process pool, return (dict ticker -> result, dict ticker -> error);
+        only ticker names and results are pickled, the data is memory-mapped """
+    if tickers is None:
+        tickers = PanelStore(directory).tickers
+    results = {}
+    errors = {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_open_worker_store,
+                             initargs=(directory,)) as executor:
+        chunksize = max(1, len(tickers) // (4 * (max_workers or os.cpu_count() or 1)))
+        jobs = [(function, ticker_str) for ticker_str in tickers]
+        for ticker_str, (result, error) in zip(tickers, executor.map(_run_ticker, jobs,
+                                                                     chunksize=chunksize)):
+            if error is None:
+                results[ticker_str] = result
+            else:
+                errors[ticker_str] = error
+    return results, errors
@@ -3,119 +3,166 @@
 Created on Mon Nov  9 21:02:05 2020
 
 Class for graphs/ plots
+- long series are downsampled to the pixel width before they are drawn
 
 @author: Sabine Kopplin
 """
 
-import pandas as pd
+import functools
 import numpy as np
-import yfinance as yf
-import matplotlib.pyplot as plt
-from scipy import stats
-import seaborn as sns
-from prediction import linear_reg, predict_value, predict_series
+import pandas as pd
+from downsample import DownsampledLine, DownsampledArea
+from tracing import tracer
+
+def _graph(name):
+    """ decorator for the graph methods: builds the graph on the cleared figure
+        of its type inside a span (incl. drawing while tracing), then shows it
+        (interactive only) and returns the figure """
+    def decorator(build):
+        @functools.wraps(build)
+        def wrapper(self, *args, **kwargs):
+            with tracer.span("Graphs: " + name, rows=len(self.stock_data)):
+                fig = self.new_figure(name)
+                build(self, *args, **kwargs)
+                if tracer.enabled:
+                    fig.canvas.draw()
+            return self.show(fig)
+        return wrapper
+    return decorator
 
 class Graphs:
     """ class to define graphs """
 
-    def __init__(self, stock_data, ticker_str, company_name):
+    def __init__(self, stock_data, ticker_str, company_name, interactive=True):
         self.stock_data = stock_data
+        # interactive: show graphs in a window, otherwise only draw them (export)
+        self.interactive = interactive
         self.ticker_str = ticker_str
         self.company_name = company_name
+        # seaborn is only needed for the style and is slow to import
+        import seaborn as sns
         sns.set(style="darkgrid")
-
+        # matplotlib is imported on first use, pyplot selects a GUI backend
+        import matplotlib.dates as mdates
+        # x values of all plots: dates as matplotlib numbers (exchange wall-clock time)
+        index = stock_data.index
+        self.is_date = isinstance(index, pd.DatetimeIndex)
+        if self.is_date:
+            self.x = mdates.date2num(index.tz_localize(None) if index.tz is not None else index)
+        else:
+            self.x = np.arange(len(index), dtype=np.float64)
+
+    def new_figure(self, name):
+        """ get the figure of a graph type, reused and cleared between graphs """
+        import matplotlib.pyplot as plt
+        fig = plt.figure(num=name)
+        fig.clf()
+        return fig
+
+    def show(self, fig=None):
+        """ show a figure (default: the current one) in a maximized window
+            (interactive only), return the figure """
+        import matplotlib.pyplot as plt
+        fig = fig if fig is not None else plt.gcf()
+        if self.interactive:
+            Graphs.max_graph()
+            plt.show()
+        return fig
+
+    def plot_line(self, ax, values, **kwargs):
+        """ plot a column (or array) against the dates, downsampled """
+        DownsampledLine(ax, self.x, values, **kwargs)
+        if self.is_date:
+            ax.xaxis_date()
+
+    @_graph("Time Series - Price & Volume")
     def timeseries(self):
         """ generate plot of Closing Price and Volume """
+        import matplotlib.pyplot as plt
 
-        plt.figure(num="Time Series - Price & Volume");
         # https://subscription.packtpub.com/book/big_data_and_business_intelligence/9781787123137/15/ch15lvl1sec125/plotting-volume-series-data
         # plot closing price in graph (top)
         top = plt.subplot2grid((5,4), (0,0),rowspan=3,colspan=4)
-        top.plot(self.stock_data["Close"].index, self.stock_data["Close"], label="Closing Price", color="#154892")
+        self.plot_line(top, self.stock_data["Close"], label="Closing Price", color="#154892")
         plt.title("{}'s ({}) Closing Price".format(self.company_name,self.ticker_str, size=14))
         plt.ylabel("Share Price in $", size=12)
 
         # plot trade volume in graph (bottom)
         bottom = plt.subplot2grid((5,4), (3,0),rowspan=2,colspan=4)
-        bottom.bar(self.stock_data.index, self.stock_data["Volume"], width=1, color="#154892", edgecolor="#154892")
+        # volume as filled area of the maximum per pixel instead of one bar per day
+        DownsampledArea(bottom, self.x, self.stock_data["Volume"], color="#154892", edgecolor="#154892")
+        if self.is_date:
+            bottom.xaxis_date()
         plt.title("{}'s ({}) Trading Volume".format(self.company_name, self.ticker_str, size=14))
         plt.ylabel("Vol per 1eN ", size=12)
 
         plt.subplots_adjust(hspace=0.75)
         plt.gcf().set_size_inches(15,14)
-        # show graph
-        Graphs.max_graph()
-        plt.show()
 
+    @_graph("Time Series with Linear Trend")
     def timeseries_trend(self, trendline):
         """ generate plot of Closing Price including trend line (linear regression) """
+        import matplotlib.pyplot as plt
 
-        plt.figure(num="Time Series with Linear Trend");
         # make graph look pretty
         Graphs.graph_layout()
         # plot in a graph
-        plt.plot(self.stock_data.index, trendline, color="#8FA8CC", label="Linear Trend", linestyle='dashed', alpha=0.8)
-        self.stock_data["Close"].plot(label="Closing Price", color="#154892")
+        ax = plt.gca()
+        self.plot_line(ax, trendline, color="#8FA8CC", label="Linear Trend", linestyle='dashed', alpha=0.8)
+        self.plot_line(ax, self.stock_data["Close"], label="Closing Price", color="#154892")
         plt.title("{}'s ({}) Closing Price incl. Linear Trend".format(self.company_name, self.ticker_str, size=14))
         plt.legend(loc='upper left',facecolor="white")
-        # show graph
-        Graphs.max_graph()
-        plt.show()
 
+    @_graph("Moving Average Cross")
     def ma_compare(self):
         """ generate plot of Short Term and Long Term Moving Average (MA) """
+        import matplotlib.pyplot as plt
 
-        plt.figure(num="Moving Average Cross");
         # make graph look pretty
         Graphs.graph_layout()
         # plot in a graph
-        self.stock_data["Short Term MA (50d)"].plot(label="Short Term MA (50d)", color="#8FA8CC")
-        self.stock_data["Long Term MA (200d)"].plot(label="Long Term MA (200d)", color="#154892")
+        ax = plt.gca()
+        self.plot_line(ax, self.stock_data["Short Term MA (50d)"], label="Short Term MA (50d)", color="#8FA8CC")
+        self.plot_line(ax, self.stock_data["Long Term MA (200d)"], label="Long Term MA (200d)", color="#154892")
         plt.title("{}'s ({}) Moving Average Cross".format(self.company_name, self.ticker_str, size=14))
         plt.legend(loc='upper left',facecolor="white")
-        # show graph
-        Graphs.max_graph()
-        plt.show()
 
+    @_graph("Weighted MA vs Closing Price")
     def wma_vs_close(self):
         """ generate plot of weighted Moving Average (MA) and Closing Price """
+        import matplotlib.pyplot as plt
 
-        plt.figure(num="Weighted MA vs Closing Price");
         # make graph look pretty
         Graphs.graph_layout()
         # plot in a graph
-        self.stock_data["Close"].plot(label="Closing Price", color="#4C6FA1",
-                                      alpha=0.8, linestyle='dashed', linewidth=0.9)
-        self.stock_data["Weighted MA (10d)"].plot(label="Weighted MA (10d)", color="#154892")
+        ax = plt.gca()
+        self.plot_line(ax, self.stock_data["Close"], label="Closing Price", color="#4C6FA1",
+                       alpha=0.8, linestyle='dashed', linewidth=0.9)
+        self.plot_line(ax, self.stock_data["Weighted MA (10d)"], label="Weighted MA (10d)", color="#154892")
         plt.title("{}'s ({}) Weighted Moving Average vs Closing Price".format(self.company_name,
                                                                               self.ticker_str,
                                                                               size=14))
         plt.legend(loc='upper left', facecolor="white")
-        # show graph
-        Graphs.max_graph()
-        plt.show()
 
+    @_graph("MACD")
     def macd(self):
         """ generate plot of MACD - Relationship between EMA of 12 days vs 26 days  """
+        import matplotlib.pyplot as plt
 
-        plt.figure(num="MACD");
+        ax = plt.gca()
         # create baseline at 0
-        baseline = np.zeros(len(self.stock_data["Close"]))
+        ax.axhline(0, color="#8FA8CC", label="Baseline", linestyle='dashed', alpha=0.8)
         # plot in a graph
-        plt.plot(self.stock_data.index, baseline, color="#8FA8CC",
-                 label="Baseline", linestyle='dashed', alpha=0.8)
-        self.stock_data["MACD Signal"].plot(label="Signal Line", color="#F0A755")
-        self.stock_data["MACD"].plot(label="MACD", color="#154892")
+        self.plot_line(ax, self.stock_data["MACD Signal"], label="Signal Line", color="#F0A755")
+        self.plot_line(ax, self.stock_data["MACD"], label="MACD", color="#154892")
         # make graph look pretty
         plt.title("{}'s ({}) MACD".format(self.company_name, self.ticker_str, size=14))
         plt.legend(loc='upper left', facecolor="white")
         plt.ylabel("")
         plt.xlabel("")
-        # show graph
-        Graphs.max_graph()
-        plt.show()
 
     def graph_layout():
+        import matplotlib.pyplot as plt
         # define graph layout and plot
         plt.ylabel("Closing Price in $", size=12)
         plt.xlabel("")
@@ -123,6 +170,16 @@ class Graphs:
         plt.yticks(size=11)
 
     def max_graph():
+        import matplotlib.pyplot as plt
         # https://stackoverflow.com/questions/12439588/how-to-maximize-a-plt-show-window-using-python
         mng = plt.get_current_fig_manager()
-        mng.window.showMaximized()
+        window = getattr(mng, "window", None)
+        # Qt backends
+        if hasattr(window, "showMaximized"):
+            window.showMaximized()
+        # Tk backend (zoomed state is not supported by every window manager)
+        elif hasattr(window, "state"):
+            try:
+                window.state("zoomed")
+            except Exception:
+                pass
@@ -3,25 +3,32 @@
 Created on Wed Nov 18 10:51:41 2020
 
 Functions to predict values based on linear regression
+- Rolling/expanding regression over all windows of a series in one pass
+- Batch forecasts of many tickers with one shared design-matrix factorization
 
 @author: Sabine Kopplin
 """
+from collections import namedtuple
+from functools import lru_cache
 import numpy as np
-from scipy import stats
-import tkinter.messagebox as msg
-from sklearn.metrics import mean_squared_error as mse
+import pandas as pd
+from tracing import span, count
 
 def linear_reg(stock_data):
     """ Linear Regression """
+    # scipy.stats is slow to import, only load it when a regression is run
+    from scipy import stats
     # compute days in the index
     num_data_points = len(stock_data["Close"])
     days = np.arange(num_data_points)
 
-    # code based on code of slide 39, lecture 7a "Pandas"
-    # calculate trendline with linear regression
-    lr = stats.linregress(days, stock_data['Close'])
-    trendline = lr.intercept + lr.slope * days
-    rmse = round(mse(stock_data["Close"], trendline, squared=False),5)
+    with span("linear_reg", rows=num_data_points):
+        # code based on code of slide 39, lecture 7a "Pandas"
+        # calculate trendline with linear regression
+        lr = stats.linregress(days, stock_data['Close'])
+        trendline = lr.intercept + lr.slope * days
+        rmse = round(float(np.sqrt(np.mean((stock_data["Close"] - trendline)**2))),5)
+    count("rows.linear_reg", num_data_points)
     return num_data_points, lr, trendline, rmse
 
 def predict_value(lr, num_data_points, daysinfuture):
@@ -35,3 +42,142 @@ def predict_series(lr, num_data_points, daysinfuture):
     for i in range(num_data_points + 1, num_data_points + 1 + daysinfuture):
         pred_list.append(round((lr.intercept + lr.slope * i),2))
     return pred_list
+
+def rolling_linear_reg(stock_data, window=250, expanding=False):
+    """ linear regression of every window of n days (or of every expanding
+        range from the start) in one vectorized pass with sliding sums,
+        returns dataframe with Slope, Intercept, R-Squared and RMSE per end date;
+        missing prices are left out of the windows that contain them """
+    close = stock_data["Close"] if isinstance(stock_data, pd.DataFrame) else stock_data
+    y = np.asarray(close, dtype=np.float64)
+    n = len(y)
+    index = close.index if hasattr(close, "index") else None
+    columns = ["Slope", "Intercept", "R-Squared", "RMSE"]
+    if not expanding and window > n:
+        # no complete window in a short series
+        return pd.DataFrame(np.nan, index=index if index is not None else pd.RangeIndex(n),
+                            columns=columns)
+    pos = np.arange(n, dtype=np.float64)
+    valid = ~np.isnan(y)
+    # center prices and day numbers so the running sums stay small and precise,
+    # missing prices count as zero with zero weight
+    offset = y[valid].mean() if valid.any() else 0.0
+    y_c = np.where(valid, y - offset, 0.0)
+    pos_c = np.where(valid, pos - (n - 1) / 2, 0.0)
+
+    def window_sum(values):
+        csum = np.concatenate(([0.0], np.cumsum(values)))
+        if expanding:
+            return csum[1:]
+        sums = np.full(n, np.nan)
+        sums[window - 1:] = csum[window:] - csum[:n - window + 1]
+        return sums
+
+    # number of valid points and first day of each window
+    size = window_sum(valid.astype(np.float64))
+    first = pos - (pos if expanding else window - 1)
+    sum_p = window_sum(pos_c)
+    sum_y = window_sum(y_c)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sxx = window_sum(pos_c**2) - sum_p**2 / size
+        sxy = window_sum(pos_c * y_c) - sum_p * sum_y / size
+        syy = np.maximum(window_sum(y_c**2) - sum_y**2 / size, 0.0)
+        slope = sxy / sxx
+        # intercept at the first day of the window
+        mean_day = sum_p / size + (n - 1) / 2 - first
+        intercept = sum_y / size + offset - slope * mean_day
+        # R-squared of a flat window is undefined
+        r_squared = np.where(syy > 0, np.minimum(sxy**2 / (sxx * syy), 1.0), np.nan)
+        rmse = np.sqrt(np.maximum(syy - slope * sxy, 0.0) / size)
+    result = pd.DataFrame({"Slope": slope, "Intercept": intercept,
+                           "R-Squared": r_squared, "RMSE": rmse},
+                          index=index)
+    # a regression needs at least two days
+    result.loc[~(size >= 2)] = np.nan
+    return result
+
+def best_lookback(stock_data, windows=(20, 50, 100, 150, 200, 250)):
+    """ return the lookback (in days) whose regression over the most recent
+        days fits best (highest R-squared), with the regression results """
+    close = stock_data["Close"] if isinstance(stock_data, pd.DataFrame) else stock_data
+    best_window, best_fit = None, None
+    for window in windows:
+        if window > len(close):
+            continue
+        fit = rolling_linear_reg(close.iloc[-window:], window).iloc[-1]
+        # windows without a defined fit (flat or missing prices) are skipped
+        if np.isnan(fit["R-Squared"]):
+            continue
+        # on a tie (at the displayed 5 decimals) the longer lookback wins
+        if best_fit is None or round(fit["R-Squared"],5) >= round(best_fit["R-Squared"],5):
+            best_window, best_fit = window, fit
+    return best_window, best_fit
+
+# result of batch_forecast, one row per ticker
+BatchForecast = namedtuple("BatchForecast", ["forecasts", "coefficients", "rmse", "r_squared"])
+
+TREND_BASES = ("linear", "poly", "loglinear")
+
+@lru_cache(maxsize=32)
+def _trend_design(num_data_points, degree):
+    """ design matrix of the day index 0..n-1 (scaled to [0, 1) for a well
+        conditioned polynomial basis) and its QR factorization """
+    days = np.arange(num_data_points) / num_data_points
+    design = np.vander(days, degree + 1, increasing=True)
+    q, r = np.linalg.qr(design)
+    return design, q, r
+
+def batch_forecast(prices, daysinfuture, basis="linear", degree=2):
+    """ fit a trend to every ticker at once and predict the closing prices
+        1..n days ahead (same days as predict_series)
+        prices: array tickers x days, or dataframe with one column per ticker;
+            missing prices are left out of the fit of their ticker, tickers
+            with too few prices get NaN
+        basis: "linear", "poly" (polynomial of degree n) or "loglinear" """
+    if basis not in TREND_BASES:
+        raise ValueError("Unknown trend basis: {}".format(basis))
+    if isinstance(prices, pd.DataFrame):
+        prices = prices.to_numpy().T
+    prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+    num_data_points = prices.shape[1]
+    degree = degree if basis == "poly" else 1
+    if num_data_points <= degree:
+        raise ValueError("A {} trend needs at least {} prices per ticker, got {}".format(
+            basis, degree + 1, num_data_points))
+
+    # the day index is the same for every ticker, so the factorization is shared
+    design, q, r = _trend_design(num_data_points, degree)
+    target = np.log(prices) if basis == "loglinear" else prices
+    valid = ~np.isnan(prices)
+    complete = valid.all(axis=1)
+    coefficients = np.full((degree + 1, prices.shape[0]), np.nan)
+    if complete.any():
+        coefficients[:, complete] = np.linalg.solve(r, q.T @ target[complete].T)
+    # tickers with gaps (late listings, halts) are fitted on their own days
+    for row in np.nonzero(~complete)[0]:
+        days = valid[row]
+        if days.sum() > degree:
+            coefficients[:, row] = np.linalg.lstsq(design[days], target[row, days],
+                                                   rcond=None)[0]
+    fitted = design @ coefficients
+    future = np.vander(np.arange(num_data_points + 1, num_data_points + 1 + daysinfuture)
+                       / num_data_points, degree + 1, increasing=True)
+    forecasts = future @ coefficients
+    if basis == "loglinear":
+        fitted = np.exp(fitted)
+        forecasts = np.exp(forecasts)
+
+    # quality of the fit on the price scale
+    residuals = np.where(valid.T, prices.T - fitted, 0.0)
+    num_valid = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rmse = np.sqrt(np.sum(residuals**2, axis=0) / num_valid)
+        mean = np.where(valid, prices, 0.0).sum(axis=1) / num_valid
+        total = np.sum(np.where(valid.T, prices.T - mean, 0.0)**2, axis=0)
+        r_squared = np.where(total > 0, 1 - np.sum(residuals**2, axis=0) / total, 0.0)
+    unfitted = np.isnan(coefficients[0])
+    rmse[unfitted] = np.nan
+    r_squared[unfitted] = np.nan
+    # coefficients per power of the (unscaled) day index: intercept, slope, ...
+    coefficients = coefficients.T / float(num_data_points) ** np.arange(degree + 1)
+    return BatchForecast(forecasts.T, coefficients, rmse, r_squared)
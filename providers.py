@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Data Providers
+- Common interface for OHLCV histories and ticker metadata
+- Backends: yfinance (network), a local directory of CSV/Parquet files
+  (e.g. a pre-staged data lake) and record/replay of another provider
+
+Every provider hands out yf.Ticker-like objects via provider.ticker(symbol),
+so get_data, the cache and the GUI work the same for all backends.
+
+@author: Sabine Kopplin
+"""
+
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+
+def _wall_clock(index):
+    """ index without time zone (local exchange time), for slicing by date """
+    return index.tz_localize(None) if getattr(index, "tz", None) is not None else index
+
+def _between(stock_data, start_date=None, end_date=None):
+    """ rows from start date (incl.) to end date (excl.) like Ticker.history """
+    local = _wall_clock(stock_data.index)
+    mask = np.ones(len(local), dtype=bool)
+    if start_date is not None:
+        mask &= local >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= local < pd.Timestamp(end_date)
+    return stock_data[mask]
+
+class Provider:
+    """ base class of all data providers """
+
+    def history(self, symbol, start_date=None, end_date=None, interval="1d"):
+        """ dataframe with the columns of Ticker.history, start incl. and end excl.,
+            raise KeyError for unknown symbols """
+        raise NotImplementedError
+
+    def info(self, symbol):
+        """ info dict of the symbol (at least "shortName") """
+        raise NotImplementedError
+
+    def ticker(self, symbol):
+        """ yf.Ticker-like view of one symbol """
+        return ProviderTicker(self, symbol)
+
+class ProviderTicker:
+    """ class with the parts of yf.Ticker used by the analyser (history, info) """
+
+    def __init__(self, provider, symbol):
+        self.provider = provider
+        self.symbol = symbol.upper()
+
+    def history(self, period=None, start=None, end=None, interval="1d"):
+        # period is ignored as the analyser always passes start and end
+        return self.provider.history(self.symbol, start, end, interval)
+
+    @property
+    def info(self):
+        return self.provider.info(self.symbol)
+
+class TickerProvider(Provider):
+    """ provider on top of a yf.Ticker-like factory (symbol -> ticker) """
+
+    def __init__(self, ticker_factory):
+        self.ticker_factory = ticker_factory
+
+    def history(self, symbol, start_date=None, end_date=None, interval="1d"):
+        return self.ticker_factory(symbol).history(start=start_date, end=end_date,
+                                                   interval=interval)
+
+    def info(self, symbol):
+        return self.ticker_factory(symbol).info
+
+class YFinanceProvider(TickerProvider):
+    """ provider downloading from Yahoo Finance (needs network access) """
+
+    def __init__(self):
+        super().__init__(None)
+
+    def history(self, symbol, start_date=None, end_date=None, interval="1d"):
+        import yfinance as yf
+        return yf.Ticker(symbol).history(start=start_date, end=end_date, interval=interval)
+
+    def info(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+class LocalProvider(Provider):
+    """ provider reading one file per symbol and interval from a directory:
+        AAPL.csv / AAPL.parquet (daily bars), AAPL_1h.csv (other intervals),
+        AAPL.json (optional info dict)
+        tz: time zone of CSV timestamps with UTC offsets, e.g. "America/New_York" """
+
+    def __init__(self, directory, tz=None):
+        self.directory = directory
+        self.tz = tz
+        self._lock = threading.Lock()
+        # path -> (modification time, dataframe), files are parsed only once
+        self._frames = {}
+
+    def __getstate__(self):
+        # lock and parsed files stay in this process, e.g. for process pool jobs
+        return {"directory": self.directory, "tz": self.tz}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _path(self, symbol, interval, fmt):
+        name = symbol.upper() if interval == "1d" else "{}_{}".format(symbol.upper(), interval)
+        return os.path.join(self.directory, "{}.{}".format(name, fmt))
+
+    def _read(self, path):
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            entry = self._frames.get(path)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+        if path.endswith(".parquet"):
+            stock_data = pd.read_parquet(path)
+        else:
+            stock_data = pd.read_csv(path, index_col=0, float_precision="round_trip")
+            raw = stock_data.index
+            # timestamps with UTC offsets (also mixed ones across DST) are parsed
+            # as UTC and shown in the exchange time zone (or the first offset)
+            aware = len(raw) > 0 and pd.Timestamp(raw[0]).tz is not None
+            stock_data.index = pd.to_datetime(raw, utc=aware)
+            if aware:
+                stock_data.index = stock_data.index.tz_convert(self.tz or
+                                                               pd.Timestamp(raw[0]).tz)
+            stock_data.index.name = raw.name or "Date"
+        with self._lock:
+            self._frames[path] = (mtime, stock_data)
+        return stock_data
+
+    def history(self, symbol, start_date=None, end_date=None, interval="1d"):
+        for fmt in ("parquet", "csv"):
+            path = self._path(symbol, interval, fmt)
+            if os.path.exists(path):
+                return _between(self._read(path), start_date, end_date).copy()
+        raise KeyError("no local data for {} ({})".format(symbol.upper(), interval))
+
+    def info(self, symbol):
+        path = os.path.join(self.directory, "{}.json".format(symbol.upper()))
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                return json.load(file)
+        if not os.path.exists(self._path(symbol, "1d", "csv")) and \
+           not os.path.exists(self._path(symbol, "1d", "parquet")):
+            raise KeyError("no local data for {}".format(symbol.upper()))
+        return {"shortName": symbol.upper()}
+
+    def store(self, symbol, stock_data, interval="1d", fmt="csv", info=None):
+        """ write a dataframe (and info dict) into the directory, e.g. to stage a data lake """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(symbol, interval, fmt)
+        if fmt == "parquet":
+            stock_data.to_parquet(path)
+        else:
+            stock_data.to_csv(path)
+        if info is not None:
+            with open(os.path.join(self.directory, "{}.json".format(symbol.upper())),
+                      "w", encoding="utf-8") as file:
+                json.dump(info, file, default=str)
+        return path
+
+class ReplayProvider(Provider):
+    """ provider that records the responses of a source provider once and
+        serves them from disk afterwards, without source only replays """
+
+    def __init__(self, directory, source=None):
+        self.directory = directory
+        self.source = source
+
+    @staticmethod
+    def _stamp(date):
+        return "none" if date is None else pd.Timestamp(date).strftime("%Y%m%dT%H%M%S")
+
+    def _load_or_record(self, path, record, load, save):
+        if os.path.exists(path):
+            return load(path)
+        if self.source is None:
+            raise KeyError("no recording {}".format(os.path.basename(path)))
+        result = record()
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        save(result, tmp_path)
+        os.replace(tmp_path, path)
+        return result
+
+    def history(self, symbol, start_date=None, end_date=None, interval="1d"):
+        name = "{}_{}_{}_{}.pkl".format(symbol.upper(), interval,
+                                        self._stamp(start_date), self._stamp(end_date))
+        # pickle keeps dtypes, time zone and index exactly as recorded
+        return self._load_or_record(
+            os.path.join(self.directory, name),
+            lambda: self.source.history(symbol, start_date, end_date, interval),
+            pd.read_pickle, lambda stock_data, path: stock_data.to_pickle(path))
+
+    def info(self, symbol):
+        def load(path):
+            with open(path, encoding="utf-8") as file:
+                return json.load(file)
+
+        def save(info, path):
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(info, file, default=str)
+
+        return self._load_or_record(
+            os.path.join(self.directory, "{}_info.json".format(symbol.upper())),
+            lambda: dict(self.source.info(symbol)), load, save)
+
+# provider name -> class, used by the command line
+PROVIDERS = {"yfinance": YFinanceProvider, "local": LocalProvider, "replay": ReplayProvider}
+
+def make_provider(name="yfinance", directory=None):
+    """ create a provider by name; local and replay need a directory,
+        replay records missing responses from yfinance """
+    if name == "yfinance":
+        return YFinanceProvider()
+    if directory is None:
+        raise ValueError("The {} provider needs a data directory.".format(name))
+    if name == "local":
+        return LocalProvider(directory)
+    if name == "replay":
+        return ReplayProvider(directory, YFinanceProvider())
+    raise ValueError("Unknown provider: {}".format(name))
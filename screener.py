@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Crossover Screener
+- Moving Average Cross (golden/death cross) and MACD signal crossings of a
+  whole universe of tickers at once
+- Works on a ticker x day price matrix, events are found by sign changes
+  of (fast - slow) without a Python loop per ticker
+
+@author: Sabine Kopplin
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from indicators import sma, macd
+
+# event name per indicator and direction (+1 crosses above, -1 below)
+EVENTS = {("ma", 1): "Golden Cross", ("ma", -1): "Death Cross",
+          ("macd", 1): "MACD Bullish Cross", ("macd", -1): "MACD Bearish Cross"}
+
+def crossings(fast, slow):
+    """ +1 where fast crosses above slow, -1 where it crosses below and 0
+        otherwise (int8, same shape); days where both are equal or missing
+        keep the side of the day before, so touching is no crossing """
+    with np.errstate(invalid="ignore"):
+        side = np.sign(fast - slow)
+    side = np.nan_to_num(side).astype(np.int8)
+    # carry the last non-zero side forward along the day axis
+    days = np.arange(side.shape[-1])
+    last = np.maximum.accumulate(np.where(side != 0, days, 0), axis=-1)
+    side = np.take_along_axis(side, last, axis=-1)
+    events = np.zeros(side.shape, dtype=np.int8)
+    flipped = (side[..., 1:] != side[..., :-1]) & (side[..., :-1] != 0)
+    events[..., 1:] = np.where(flipped, side[..., 1:], 0)
+    return events
+
+def _as_matrix(prices, tickers, dates):
+    """ price matrix (tickers x days) with ticker names and dates, from an array
+        or a dataframe with one column per ticker (e.g. data.close_prices) """
+    if isinstance(prices, pd.DataFrame):
+        tickers = list(prices.columns) if tickers is None else tickers
+        dates = prices.index if dates is None else dates
+        prices = prices.to_numpy(dtype=np.float64).T
+    prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+    if tickers is None:
+        tickers = list(range(prices.shape[0]))
+    if dates is None:
+        dates = pd.RangeIndex(prices.shape[1])
+    return prices, list(tickers), dates
+
+def _block_events(prices, short, long, fast, slow, signal, lookback):
+    """ events of the last lookback days of a block of tickers,
+        as list of (indicator, event matrix, fast line, slow line) """
+    # the moving averages of the last days only need the last long+lookback prices
+    tail = prices[:, -(long + lookback):]
+    ma_short = sma(tail, short)[:, -lookback - 1:]
+    ma_long = sma(tail, long)[:, -lookback - 1:]
+    # the EMAs of the MACD depend on the whole history
+    macd_line, signal_line = macd(prices, fast, slow, signal)
+    macd_line = macd_line[:, -lookback - 1:]
+    signal_line = signal_line[:, -lookback - 1:]
+    return [("ma", crossings(ma_short, ma_long)[:, 1:], ma_short, ma_long),
+            ("macd", crossings(macd_line, signal_line)[:, 1:], macd_line, signal_line)]
+
+def screen(prices, tickers=None, dates=None, short=50, long=200, fast=12, slow=26,
+           signal=9, lookback=20, block=1000):
+    """ find Moving Average and MACD crossings of the last n days of all tickers,
+        return dataframe of events ranked by recency and strength
+        prices: array tickers x days or dataframe days x tickers
+        block: number of tickers processed together (limits memory) """
+    prices, tickers, dates = _as_matrix(prices, tickers, dates)
+    num_days = prices.shape[1]
+    lookback = min(lookback, num_days - 1)
+    rows = []
+    for first in range(0, prices.shape[0], block):
+        chunk = prices[first:first + block]
+        last_close = chunk[:, -1]
+        for indicator, events, fast_line, slow_line in _block_events(
+                chunk, short, long, fast, slow, signal, lookback):
+            ticker_idx, day_idx = np.nonzero(events)
+            direction = events[ticker_idx, day_idx]
+            # distance of the lines today in % of the price, positive if the
+            # lines still point the way of the crossing
+            gap = (fast_line[ticker_idx, -1] - slow_line[ticker_idx, -1]) \
+                / last_close[ticker_idx] * 100
+            rows.append(pd.DataFrame({
+                "Ticker": np.asarray(tickers, dtype=object)[first + ticker_idx],
+                "Date": np.asarray(dates)[num_days - lookback + day_idx],
+                "Signal": [EVENTS[(indicator, int(value))] for value in direction],
+                "Direction": direction.astype(int),
+                "Days Ago": lookback - 1 - day_idx,
+                "Close": last_close[ticker_idx],
+                "Strength (%)": np.round(gap * direction, 3)}))
+    if not rows:
+        return pd.DataFrame(columns=["Ticker", "Date", "Signal", "Direction", "Days Ago",
+                                     "Close", "Strength (%)"])
+    table = pd.concat(rows, ignore_index=True)
+    # most recent first, confirmed crossings (lines moving apart) before weak ones
+    table = table.sort_values(["Days Ago", "Strength (%)"], ascending=[True, False],
+                              kind="stable")
+    table.index = pd.RangeIndex(1, len(table) + 1, name="Rank")
+    return table
+
+def benchmark(num_tickers=5000, num_days=2520, lookback=20):
+    """ time the screening of a synthetic universe (default 5000 tickers x 10 years) """
+    from synthetic import synthetic_prices
+    prices = synthetic_prices(num_tickers, num_days)
+    start = time.perf_counter()
+    table = screen(prices, lookback=lookback)
+    seconds = time.perf_counter() - start
+    print("{} tickers x {} days: {:.2f} s, {} events".format(num_tickers, num_days,
+                                                          seconds, len(table)))
+    return seconds
+
+if __name__ == "__main__":
+    benchmark()
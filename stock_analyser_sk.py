@@ -3,20 +3,19 @@
 Created on Tue Nov 17 17:35:42 2020
 
 Main program file for execution
+- without arguments the GUI is launched
+- with arguments the batch mode runs without Tk (see cli.py)
 
 @author: Sabine Kopplin
 """
 
-import tkinter as tk
-from tkcalendar import Calendar,DateEntry
-import tkinter.messagebox as msg
-import datetime
-from plots import Graphs
-from gui import StockAnalyser_Main
-from data import get_data, descriptive_stats
-from prediction import linear_reg, predict_value, predict_series
+import sys
 
 def main():
+    # Tk and the plotting modules are only imported for the GUI
+    import tkinter as tk
+    from gui import StockAnalyser_Main
+
     # interact with program on cmd line
     print("\n\n\nWhen you are ready, the Stock Analyser GUI will launch.")
     user_choice = input("Are you ready? Then enter YES.    ")
@@ -28,9 +27,12 @@ def main():
     # launch GUI
     root = tk.Tk()
     # Force a specific geometry
-    root.geometry("275x320")
+    root.geometry("275x375")
     StockAnalyser_Main(root)
     root.mainloop()
 
 if __name__== "__main__":
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main())
     main()
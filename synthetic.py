@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic Data
+- Deterministic OHLCV generator (geometric random walk) for tests and benchmarks
+- Stand-in for yf.Ticker that serves synthetic bars without network access
+
+@author: Sabine Kopplin
+"""
+
+import time
+import zlib
+import numpy as np
+import pandas as pd
+
+# first day of the synthetic history served by SyntheticTicker
+EPOCH = "1990-01-01"
+
+def _seed(ticker_str, seed):
+    """ reproducible seed per ticker """
+    return zlib.crc32("{}:{}".format(ticker_str, seed).encode())
+
+def synthetic_prices(num_tickers, num_rows, seed=0, volatility=0.015, drift=0.0003):
+    """ closing prices as array tickers x days (geometric random walk from 100) """
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(drift, volatility, (num_tickers, num_rows))
+    return 100 * np.exp(np.cumsum(returns, axis=1))
+
+def synthetic_ohlcv(num_rows, ticker_str="SYN", seed=0, start=EPOCH, freq=None):
+    """ dataframe with the columns of Ticker.history for n bars,
+        business days up to 50k rows, minute bars above (unless freq is given) """
+    if freq is None:
+        freq = "B" if num_rows <= 50_000 else "min"
+    # one random stream per column, so the first n bars never depend on the length
+    streams = [np.random.default_rng(child) for child in
+               np.random.SeedSequence(_seed(ticker_str, seed)).spawn(5)]
+    close = 100 * np.exp(np.cumsum(streams[0].normal(0.0003, 0.015, num_rows)))
+    spread = [np.abs(rng.normal(0, 0.01, num_rows)) * close for rng in streams[1:4]]
+    index = pd.date_range(start, periods=num_rows, freq=freq, tz="America/New_York", name="Date")
+    return pd.DataFrame({"Open": close + spread[0] - spread[1],
+                         "High": close + spread[0] + spread[2],
+                         "Low": close - spread[1] - spread[2],
+                         "Close": close,
+                         "Volume": streams[4].integers(100_000, 10_000_000, num_rows),
+                         "Dividends": 0.0,
+                         "Stock Splits": 0.0}, index=index)
+
+class SyntheticTicker:
+    """ stand-in for yf.Ticker: the same date always gets the same bar,
+        daily or intraday (minute bars from 9:30 to 16:00 and resampled
+        coarser ones), optionally with a simulated network latency per request """
+
+    def __init__(self, ticker_str="SYN", seed=0, latency=0.0):
+        self.ticker_str = ticker_str
+        self.seed = seed
+        self.latency = latency
+        self.info = {"shortName": "{} Synthetic Inc.".format(ticker_str),
+                     "fiftyTwoWeekLow": 90.0, "fiftyTwoWeekHigh": 110.0,
+                     "fiftyDayAverage": 100.0, "previousClose": 100.0,
+                     "trailingPE": 20.0}
+
+    def history(self, period=None, start=None, end=None, interval="1d"):
+        time.sleep(self.latency)
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.now().normalize()
+        start = pd.Timestamp(start) if start is not None else end - pd.DateOffset(years=1)
+        # generate from the epoch so that overlapping requests agree
+        num_rows = len(pd.bdate_range(EPOCH, end - pd.Timedelta(days=1)))
+        bars = synthetic_ohlcv(num_rows, self.ticker_str, self.seed, freq="B")
+        local = bars.index.tz_localize(None)
+        if interval != "1d":
+            # minute bars of every day in the range, coarser bars resampled from them
+            from intervals import resample_ohlcv
+            days = bars[(local >= start.normalize()) & (local < end)]
+            bars = pd.concat([self._minute_bars(day, row["Open"], row["Close"])
+                              for day, row in days.iterrows()]) if len(days) else days
+            if interval != "1m":
+                bars = resample_ohlcv(bars, interval)
+            local = bars.index.tz_localize(None)
+        return bars[(local >= start) & (local < end)]
+
+    def _minute_bars(self, day, day_open, day_close):
+        """ 390 minute bars from 9:30 to 16:00 leading from the open to the
+            close of the day (same bars for the same day in every request) """
+        rng = np.random.default_rng(_seed(self.ticker_str, "{}:{}".format(self.seed,
+                                                                         day.date())))
+        walk = np.cumsum(rng.normal(0, 0.001, 390))
+        # bridge the random walk to the close of the daily bar
+        walk -= np.linspace(0, 1, 390) * (walk[-1] - np.log(day_close / day_open))
+        close = day_open * np.exp(walk)
+        open_ = np.concatenate(([day_open], close[:-1]))
+        spread = np.abs(rng.normal(0, 0.0005, (2, 390)))
+        index = pd.date_range(day.normalize() + pd.Timedelta(hours=9, minutes=30),
+                              periods=390, freq="min", name="Date")
+        return pd.DataFrame({"Open": open_,
+                             "High": np.maximum(open_, close) * (1 + spread[0]),
+                             "Low": np.minimum(open_, close) * (1 - spread[1]),
+                             "Close": close,
+                             "Volume": rng.integers(100, 10_000, 390),
+                             "Dividends": 0.0,
+                             "Stock Splits": 0.0}, index=index)
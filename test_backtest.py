@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the MA cross backtest
+
+@author: Sabine Kopplin
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from backtest import moving_averages, sweep, sweep_many, best_pair, bars_per_year
+from synthetic import synthetic_prices
+
+def reference(close, short, long, cost=0.0):
+    """ straightforward backtest of one pair with pandas and a trade loop """
+    close = pd.Series(close)
+    position = (close.rolling(short).mean() > close.rolling(long).mean()).astype(int)
+    returns = np.log(close).diff().shift(-1).fillna(0) * position
+    trades = position.diff().fillna(position.iloc[0]).abs()
+    returns = (returns + trades * np.log1p(-cost)).iloc[:-1]
+    equity = returns.cumsum()
+    drawdown = 1 - np.exp((equity - np.maximum(equity.cummax(), 0)).min())
+    profits = []
+    for day, held in enumerate(position.iloc[:-1]):
+        if held and (day == 0 or not position.iloc[day - 1]):
+            profits.append(0.0)
+        if held:
+            profits[-1] += returns.iloc[day]
+    hit_rate = np.mean(np.array(profits) > 0) if profits else np.nan
+    return np.expm1(equity.iloc[-1]), hit_rate, drawdown, len(profits)
+
+class BacktestTest(unittest.TestCase):
+
+    prices = synthetic_prices(1, 1500, seed=11)[0]
+
+    def test_moving_averages(self):
+        """ tests if the MAs from one cumulative sum match pandas rolling means """
+        averages = moving_averages(self.prices, [1, 20, 200])
+        for row, window in enumerate([1, 20, 200]):
+            np.testing.assert_allclose(averages[row],
+                                       pd.Series(self.prices).rolling(window).mean(),
+                                       rtol=1e-10)
+
+    def test_missing_prices(self):
+        """ tests if a missing price only spoils the MAs of windows containing it
+            and the sweep carries the last price over it """
+        gappy = self.prices.copy()
+        gappy[[100, 700]] = np.nan
+        averages = moving_averages(gappy, [1, 20])
+        for row, window in enumerate([1, 20]):
+            np.testing.assert_allclose(averages[row], pd.Series(gappy).rolling(window).mean(),
+                                       rtol=1e-10)
+        filled = pd.Series(gappy).ffill().to_numpy()
+        result = sweep(gappy, [5, 20], [50])
+        self.assertFalse(result.isna().any().any())
+        pd.testing.assert_frame_equal(result, sweep(filled, [5, 20], [50]))
+
+    def test_annual_return(self):
+        """ tests if intraday returns are annualised with the bars of a year """
+        self.assertEqual((bars_per_year("1d"), bars_per_year("1m"), bars_per_year("1h")),
+                         (252, 252 * 390, 252 * 7))
+        daily = sweep(self.prices, [5], [50])
+        minutes = sweep(self.prices, [5], [50], interval="1m")
+        total = np.log1p(daily["Total Return"].iloc[0])
+        np.testing.assert_allclose(minutes["Annual Return"].iloc[0],
+                                   np.expm1(total * 252 * 390 / (len(self.prices) - 1)))
+
+    def test_matches_reference(self):
+        """ tests return, hit rate, drawdown and trades against a per-pair loop """
+        result = sweep(self.prices, [5, 20, 50], [50, 100, 200], cost=0.001)
+        self.assertEqual(len(result), 8)
+        for short, long in [(5, 50), (20, 100), (50, 200)]:
+            row = result.loc[(short, long)]
+            np.testing.assert_allclose(
+                row[["Total Return", "Hit Rate", "Max Drawdown", "Trades"]].to_numpy(float),
+                reference(self.prices, short, long, cost=0.001), rtol=1e-9)
+
+    def test_many(self):
+        """ tests if the process pool gives the same grid per ticker """
+        close = pd.DataFrame(synthetic_prices(3, 800, seed=4).T, columns=["A", "B", "C"])
+        result, errors = sweep_many(close, [5, 10], [30, 60], max_workers=2)
+        self.assertEqual(errors, {})
+        pd.testing.assert_frame_equal(result.loc["B"], sweep(close["B"], [5, 10], [30, 60]))
+        self.assertIn(best_pair(result.loc["A"]), result.loc["A"].index)
+
+if __name__ == "__main__":
+    unittest.main()
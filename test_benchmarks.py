@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the synthetic data generator and the benchmark regression check
+
+@author: Sabine Kopplin
+"""
+
+import io
+import os
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+import pandas as pd
+from synthetic import synthetic_ohlcv, SyntheticTicker
+from benchmarks import compare, run, main
+
+class SyntheticTest(unittest.TestCase):
+
+    def test_deterministic(self):
+        """ tests if the same seed gives the same bars and longer series extend shorter ones """
+        short = synthetic_ohlcv(1000, "AAA")
+        pd.testing.assert_frame_equal(short, synthetic_ohlcv(1000, "AAA"))
+        pd.testing.assert_frame_equal(short, synthetic_ohlcv(2000, "AAA").iloc[:1000],
+                                      check_freq=False)
+        self.assertFalse(short["Close"].equals(synthetic_ohlcv(1000, "BBB")["Close"]))
+        self.assertTrue((short["High"] >= short[["Open", "Close"]].max(axis=1)).all())
+        self.assertTrue((short["Low"] <= short[["Open", "Close"]].min(axis=1)).all())
+
+    def test_ticker_overlap(self):
+        """ tests if overlapping requests of the SyntheticTicker serve the same bars """
+        ticker = SyntheticTicker("AAA")
+        first = ticker.history(start="2019-01-01", end="2020-01-01")
+        second = ticker.history(start="2019-06-01", end="2020-06-01")
+        common = first.index.intersection(second.index)
+        self.assertGreater(len(common), 100)
+        pd.testing.assert_frame_equal(first.loc[common], second.loc[common], check_freq=False)
+
+class CompareTest(unittest.TestCase):
+
+    def test_regression(self):
+        """ tests if only slowdowns beyond the threshold are reported """
+        baseline = {"a@1000": {"seconds": 1.0}, "b@1000": {"seconds": 1.0}}
+        results = {"a@1000": {"seconds": 1.2}, "b@1000": {"seconds": 1.3},
+                   "c@1000": {"seconds": 9.0}}
+        self.assertEqual(compare(results, baseline, 0.25), [("b@1000", 1.0, 1.3)])
+        self.assertEqual(compare({"a@1000": {"skipped": "too large"}}, baseline), [])
+
+    def test_row_limits(self):
+        """ tests if hot paths above their row limit are recorded as skipped """
+        limits = {"backtest.sweep": 500, "Graphs.": 500, "[universe]": 1000}
+        with mock.patch.dict("benchmarks.ROW_LIMITS", limits, clear=True), \
+                contextlib.redirect_stdout(io.StringIO()):
+            results = run(sizes=(1000,), num_tickers=2, repeat=1, charts=False)
+        self.assertEqual(results["backtest.sweep@1000"], {"skipped": "more than 500 rows"})
+        self.assertIn("skipped", results["correlation[universe]@1000"])
+        self.assertIn("seconds", results["linear_reg@1000"])
+
+    def test_missing_baseline(self):
+        """ tests if checking without a baseline file fails with a message """
+        with tempfile.TemporaryDirectory() as tmp:
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                self.assertEqual(main(["--check", "--baseline", os.path.join(tmp, "none.json")]),
+                                 2)
+        self.assertIn("--save", stderr.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the command line batch mode
+
+@author: Sabine Kopplin
+"""
+
+import io
+import os
+import sys
+import json
+import contextlib
+import unittest
+import tempfile
+import subprocess
+
+HEAVY_MODULES = ("tkinter", "matplotlib", "seaborn", "yfinance", "scipy.stats",
+                 "scipy.signal", "sklearn")
+
+def measure_import(module):
+    """ import module in a fresh interpreter, return (seconds, loaded heavy modules) """
+    code = ("import sys, time, json; start = time.perf_counter(); import {}; "
+            "print(json.dumps([time.perf_counter() - start, "
+            "[m for m in {} if m in sys.modules]]))").format(module, list(HEAVY_MODULES))
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    return json.loads(output.stdout)
+
+class CliTest(unittest.TestCase):
+
+    def test_import_time(self):
+        """ tests if the batch mode imports no Tk and no heavy modules up front """
+        for module in ("cli", "data", "prediction", "plots", "stock_analyser_sk"):
+            seconds, loaded = measure_import(module)
+            print("import {}: {:.3f} s".format(module, seconds))
+            self.assertEqual(loaded, [], "{} imports {}".format(module, loaded))
+
+    def test_parser(self):
+        """ tests if the subcommands parse ticker list, dates and horizon """
+        from cli import build_parser
+        args = build_parser().parse_args(["forecast", "AAPL", "MSFT", "--start", "2020-01-01",
+                                          "--end", "2020-06-01", "--horizon", "5",
+                                          "--out", tempfile.gettempdir()])
+        self.assertEqual((args.command, args.tickers, args.horizon),
+                         ("forecast", ["AAPL", "MSFT"], 5))
+
+    def test_local_provider(self):
+        """ tests if the batch mode runs offline against a directory of CSV files """
+        from cli import main
+        data_dir, out = self._local_data("AAA")
+        self.assertEqual(main(["regress", "AAA", "--start", "2019-01-01", "--end", "2020-01-01",
+                               "--provider", "local", "--data-dir", data_dir, "--out", out]), 0)
+        self.assertTrue(os.path.exists(os.path.join(out, "regression.csv")))
+
+    def test_stats(self):
+        """ tests if the statistics are printed and stored without capturing stdout """
+        from cli import main
+        from data import descriptive_stats, format_descriptive, get_data
+        from providers import LocalProvider
+        data_dir, out = self._local_data("AAA")
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            self.assertEqual(main(["stats", "AAA", "--start", "2019-01-01", "--end", "2020-01-01",
+                                   "--provider", "local", "--data-dir", data_dir,
+                                   "--out", out]), 0)
+        stock_data = get_data(LocalProvider(data_dir), "AAA", "2019-01-01", "2020-01-01")
+        table = format_descriptive(descriptive_stats(stock_data))
+        with open(os.path.join(out, "AAA_stats.txt"), encoding="utf-8") as file:
+            self.assertEqual(file.read(), table + "\n")
+        self.assertIn(table, stdout.getvalue())
+
+    def test_local_charts(self):
+        """ tests if the process pool of the chart export gets the local provider """
+        from cli import main
+        data_dir, out = self._local_data("AAA", "BBB")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main(["charts", "AAA", "BBB", "--start", "2019-01-01",
+                                   "--end", "2020-01-01", "--provider", "local",
+                                   "--data-dir", data_dir, "--out", out, "--workers", "2",
+                                   "--charts", "macd"]), 0)
+        self.assertEqual(sorted(os.listdir(out)), ["AAA_macd.png", "BBB_macd.png"])
+
+    def _local_data(self, *tickers):
+        """ directories of staged synthetic bars and of the output, removed after the test """
+        from providers import LocalProvider
+        from synthetic import SyntheticTicker
+        directories = []
+        for _ in range(2):
+            temp = tempfile.TemporaryDirectory()
+            self.addCleanup(temp.cleanup)
+            directories.append(temp.name)
+        for ticker_str in tickers:
+            bars = SyntheticTicker(ticker_str).history(start="2019-01-01", end="2020-01-01")
+            LocalProvider(directories[0]).store(ticker_str, bars)
+        return directories
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the correlation engine
+
+@author: Sabine Kopplin
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from correlation import (aligned_returns, correlation, covariance, open_matrix,
+                         rolling_correlation, top_correlated)
+
+def _returns(num_tickers=30, num_days=400, missing=0.1, seed=1):
+    """ returns of correlated tickers (common factor) with missing prices """
+    rng = np.random.default_rng(seed)
+    market = np.cumsum(rng.normal(0, 0.01, num_days))
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (num_tickers, num_days)), axis=1)
+                          + market * rng.uniform(0, 1, (num_tickers, 1)))
+    prices[rng.random(prices.shape) < missing] = np.nan
+    # a late listing
+    prices[3, :100] = np.nan
+    return aligned_returns(prices)
+
+class CorrelationTest(unittest.TestCase):
+
+    def test_aligned_returns(self):
+        """ tests if returns span holidays and days without a price get none """
+        dates = pd.bdate_range("2020-01-01", periods=4)
+        close = pd.DataFrame({"A": [1.0, 2.0, np.nan, 8.0], "B": [1.0, 1.0, 2.0, 2.0]},
+                             index=dates)
+        returns = aligned_returns(close, log=False)
+        np.testing.assert_allclose(returns["A"], [1.0, np.nan, 3.0])
+        np.testing.assert_allclose(returns["B"], [0.0, 1.0, 0.0])
+
+    def test_matches_pandas(self):
+        """ tests if the tiled matrices equal DataFrame.corr and .cov with missing values """
+        returns = _returns()
+        for complete in (False, True):
+            data = returns.dropna() if complete else returns
+            pd.testing.assert_frame_equal(correlation(data, block=7),
+                                          data.corr(min_periods=20), atol=1e-12)
+            pd.testing.assert_frame_equal(covariance(data, block=7),
+                                          data.cov(min_periods=20), atol=1e-15)
+
+    def test_memory_mapped(self):
+        """ tests if a matrix written to a file opens with its tickers """
+        returns = _returns(12).rename(columns=lambda i: "T{}".format(i))
+        path = os.path.join(tempfile.mkdtemp(), "corr.npy")
+        expected = correlation(returns, block=5, path=path, dtype=np.float32)
+        pd.testing.assert_frame_equal(open_matrix(path), expected)
+
+    def test_rolling(self):
+        """ tests if the rolling pair correlations equal pandas rolling corr """
+        returns = _returns(6)
+        result = rolling_correlation(returns, 60, [(0, 1), (3, 5)])
+        for a, b in ((0, 1), (3, 5)):
+            expected = returns[a].rolling(60, min_periods=30).corr(returns[b])
+            np.testing.assert_allclose(result[(a, b)], expected, atol=1e-10)
+
+    def test_top_correlated(self):
+        """ tests if the blockwise top k equal the largest values of the full matrix """
+        returns = _returns()
+        matrix = returns.corr(min_periods=20)
+        table = top_correlated(returns, 3, block=7)
+        for ticker_str, rows in table.groupby("Ticker"):
+            expected = matrix[ticker_str].drop(ticker_str).nlargest(3)
+            self.assertEqual(list(rows["Other"]), list(expected.index))
+            np.testing.assert_allclose(rows["Correlation"], expected, atol=1e-12)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for data gathering without network access
+
+@author: Sabine Kopplin
+"""
+
+import io
+import os
+import unittest
+from unittest import mock
+import contextlib
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from cache import OHLCVCache, missing_ranges
+from data import (get_data, get_data_many, calc_descriptive, summarize_close,
+                  frame_memory, COMPACT_TOLERANCE)
+from metadata import InfoCache
+from providers import LocalProvider, ReplayProvider, TickerProvider
+from intervals import resample_ohlcv, window_bars, chunk_ranges
+from synthetic import SyntheticTicker
+
+class FakeTicker:
+    """ stand-in for yf.Ticker returning deterministic business-day bars """
+
+    def __init__(self, ticker_str="FAKE", latency=0.0):
+        self.ticker_str = ticker_str
+        self.latency = latency
+        self.requests = []
+
+    def history(self, period=None, start=None, end=None, interval="1d"):
+        self.requests.append((pd.Timestamp(start), pd.Timestamp(end)))
+        if self.ticker_str == "FAIL":
+            raise KeyError(self.ticker_str)
+        # simulated network round-trip
+        time.sleep(self.latency)
+        index = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1),
+                               tz="America/New_York", name="Date")
+        close = 100 + np.sin(index.as_unit("ns").asi8 / 8.64e13)
+        return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1,
+                             "Close": close, "Volume": np.full(len(index), 1000),
+                             "Dividends": 0.0, "Stock Splits": 0.0}, index=index)
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = OHLCVCache(self.tmp.name)
+        self.ticker = FakeTicker()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_missing_ranges(self):
+        """ tests if only the gaps between covered ranges are requested """
+        self.assertEqual(missing_ranges(0, 10, [[2, 4], [6, 8]]),
+                         [(0, 2), (4, 6), (8, 10)])
+        self.assertEqual(missing_ranges(3, 7, [[0, 10]]), [])
+
+    def test_incremental_fetch(self):
+        """ tests if a cached range is served from disk and extended by gaps only """
+        first = get_data(self.ticker, "FAKE", "2019-01-01", "2020-01-01", cache=self.cache)
+        again = get_data(self.ticker, "FAKE", "2019-01-01", "2020-01-01", cache=self.cache)
+        longer = get_data(self.ticker, "FAKE", "2018-06-01", "2020-06-01", cache=self.cache)
+        direct = get_data(self.ticker, "FAKE", "2018-06-01", "2020-06-01")
+        pd.testing.assert_frame_equal(first, again, check_freq=False, check_index_type=False)
+        pd.testing.assert_frame_equal(longer, direct, check_freq=False, check_index_type=False)
+        self.assertEqual(self.ticker.requests[1:3],
+                         [(pd.Timestamp("2018-06-01"), pd.Timestamp("2019-01-01")),
+                          (pd.Timestamp("2020-01-01"), pd.Timestamp("2020-06-01"))])
+        stats = self.cache.stats()
+        self.assertEqual((stats["misses"], stats["hits"], stats["partial_hits"]), (1, 1, 1))
+
+    def test_eviction(self):
+        """ tests if least recently used tickers are evicted above the size cap """
+        cache = OHLCVCache(self.tmp.name, max_bytes=30000)
+        for ticker_str in ("AAA", "BBB", "CCC"):
+            cache.history(ticker_str, "2019-01-01", "2020-01-01", "1d",
+                          lambda start, end: self.ticker.history(start=start, end=end))
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], 30000)
+        self.assertGreater(stats["evictions"], 0)
+
+    def test_eviction_skips_busy(self):
+        """ tests if an entry in use by another thread is not evicted """
+        cache = OHLCVCache(self.tmp.name, max_bytes=30000)
+        fetch = lambda start, end: self.ticker.history(start=start, end=end)
+        cache.history("AAA", "2019-01-01", "2020-01-01", "1d", fetch)
+        with cache._key_lock("AAA_1d"):
+            for ticker_str in ("BBB", "CCC"):
+                cache.history(ticker_str, "2019-01-01", "2020-01-01", "1d", fetch)
+            self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "AAA_1d")))
+        cache.history("DDD", "2019-01-01", "2020-01-01", "1d", fetch)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "AAA_1d")))
+
+    def test_directory_scanned_once(self):
+        """ tests if sizes and last accesses are kept in memory between requests """
+        fetch = lambda start, end: self.ticker.history(start=start, end=end)
+        with mock.patch("cache.os.listdir", wraps=os.listdir) as listdir:
+            for ticker_str in ("AAA", "BBB", "CCC", "AAA"):
+                self.cache.history(ticker_str, "2019-01-01", "2019-03-01", "1d", fetch)
+            stats = self.cache.stats()
+        self.assertEqual(listdir.call_count, 1)
+        self.assertEqual(stats["entries"], 3)
+        self.assertEqual(stats["bytes"], OHLCVCache(self.tmp.name).stats()["bytes"])
+
+    def test_empty_range(self):
+        """ tests if a covered range without bars (weekend) keeps the columns """
+        for _ in range(2):
+            weekend = get_data(self.ticker, "FAKE", "2019-01-05", "2019-01-07", cache=self.cache)
+            self.assertEqual(len(weekend), 0)
+            self.assertIn("Close", weekend)
+        get_data(self.ticker, "FAKE", "2019-01-01", "2019-02-01", cache=self.cache)
+        self.assertIn("Close", get_data(self.ticker, "FAKE", "2019-01-05", "2019-01-07",
+                                        cache=self.cache))
+
+class DataManyTest(unittest.TestCase):
+
+    def test_failures_reported(self):
+        """ tests if a failing ticker is reported without aborting the batch """
+        stock_data, errors = get_data_many(["AAA", "FAIL", "BBB"], "2019-01-01", "2020-01-01",
+                                           ticker_factory=FakeTicker)
+        self.assertEqual(list(stock_data), ["AAA", "BBB"])
+        self.assertEqual(list(errors), ["FAIL"])
+        self.assertTrue("MACD Signal" in stock_data["AAA"])
+
+    def test_panel(self):
+        """ tests if the panel has one column group per ticker """
+        panel, _ = get_data_many(["AAA", "BBB"], "2019-01-01", "2020-01-01",
+                                 panel=True, ticker_factory=FakeTicker)
+        self.assertEqual(list(panel.columns.get_level_values(0).unique()), ["AAA", "BBB"])
+        self.assertTrue(("BBB", "Close") in panel)
+
+    def test_throughput_scales(self):
+        """ tests if more workers overlap the provider latency """
+        tickers = ["T{}".format(i) for i in range(16)]
+        factory = lambda ticker_str: FakeTicker(ticker_str, latency=0.05)
+        timings = []
+        for workers in (1, 8):
+            start = time.perf_counter()
+            get_data_many(tickers, "2019-01-01", "2020-01-01", max_workers=workers,
+                          ticker_factory=factory)
+            timings.append(time.perf_counter() - start)
+        self.assertLess(timings[1], timings[0] / 3)
+
+class SummaryTest(unittest.TestCase):
+
+    def test_matches_pandas(self):
+        """ tests if the summary of a panel matches pandas per ticker """
+        rng = np.random.default_rng(5)
+        close = pd.DataFrame(rng.normal(100, 10, (400, 3)), columns=["AAA", "BBB", "CCC"])
+        close.iloc[:120, 1] = np.nan
+        summary = summarize_close(close)
+        expected = close.describe().T
+        for column, stat in (("Mean", "mean"), ("Std", "std"), ("Min", "min"), ("Q1 (25%)", "25%"),
+                             ("Q2 (50%)", "50%"), ("Q3 (75%)", "75%"), ("Max", "max")):
+            np.testing.assert_allclose(summary[column], expected[stat], err_msg=column)
+        self.assertEqual(list(summary["Count"]), [400, 280, 400])
+
+    def test_empty(self):
+        """ tests if a range without rows gives NaN statistics and a count of 0 """
+        summary = summarize_close(pd.DataFrame({"AAA": [], "BBB": []}, dtype=float))
+        self.assertEqual(list(summary["Count"]), [0, 0])
+        self.assertTrue(summary.drop(columns="Count").isna().all().all())
+
+    def test_calc_descriptive(self):
+        """ tests if the printed table shows the summary of the closing price """
+        stock_data = FakeTicker().history(start="2019-01-01", end="2020-01-01")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            summary = calc_descriptive(stock_data)
+        self.assertAlmostEqual(summary["Q3 (75%)"], stock_data["Close"].quantile(0.75))
+        self.assertIn("| Max              | {:12} |".format(round(stock_data["Close"].max(),2)),
+                      output.getvalue())
+
+class InfoCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.fetch = lambda symbol: self.calls.append(symbol) or {"shortName": symbol.title()}
+
+    def test_fetched_once(self):
+        """ tests if the info dict is fetched once until the TTL expires """
+        cache = InfoCache(ttl=60, fetch=self.fetch)
+        for _ in range(3):
+            self.assertEqual(cache.short_name("aapl"), "Aapl")
+        self.assertEqual(self.calls, ["AAPL"])
+        cache.ttl = 0
+        cache.get("AAPL")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_invalid_ticker(self):
+        """ tests if an unknown ticker raises KeyError like Ticker.info """
+        cache = InfoCache(fetch=lambda symbol: {})
+        self.assertRaises(KeyError, cache.short_name, "NOPE")
+
+    def test_persisted_and_prefetched(self):
+        """ tests if prefetched infos are reloaded from disk """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = tmp + "/info.json"
+            infos, errors = InfoCache(path=path, fetch=self.fetch).prefetch(["AAA", "BBB"])
+            self.assertEqual((sorted(infos), errors), (["AAA", "BBB"], {}))
+            reloaded = InfoCache(path=path, fetch=self.fetch)
+            self.assertEqual(reloaded.short_name("BBB"), "Bbb")
+            self.assertEqual(len(self.calls), 2)
+
+class CompactTest(unittest.TestCase):
+
+    def test_compact(self):
+        """ tests if compact frames are smaller, within tolerance and still analysable """
+        from prediction import linear_reg
+        full = get_data(FakeTicker(), "FAKE", "2000-01-01", "2020-01-01")
+        compact = get_data(FakeTicker(), "FAKE", "2000-01-01", "2020-01-01", compact=True)
+        self.assertNotIn("Dividends", compact)
+        self.assertEqual(compact["Close"].dtype, np.float32)
+        self.assertEqual(compact["Volume"].dtype, np.uint16)
+        self.assertLess(frame_memory(compact), 0.6 * frame_memory(full))
+        for column in compact:
+            np.testing.assert_allclose(compact[column], full[column], rtol=COMPACT_TOLERANCE)
+        self.assertAlmostEqual(linear_reg(compact)[1].slope, linear_reg(full)[1].slope,
+                               places=6)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pd.testing.assert_series_equal(calc_descriptive(compact), calc_descriptive(full),
+                                           atol=0.01)
+
+class CountingTicker(SyntheticTicker):
+    """ synthetic ticker that records its requests """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests = []
+
+    def history(self, period=None, start=None, end=None, interval="1d"):
+        self.requests.append((pd.Timestamp(start), pd.Timestamp(end), interval))
+        return super().history(period, start, end, interval)
+
+class IntervalTest(unittest.TestCase):
+
+    def test_chunked_fetch(self):
+        """ tests if long minute ranges are fetched in 7 day chunks without gaps """
+        ticker = CountingTicker("AAA")
+        stock_data = get_data(ticker, "AAA", "2020-01-01", "2020-02-01", interval="1m")
+        self.assertEqual(len(ticker.requests), len(chunk_ranges("2020-01-01", "2020-02-01", "1m")))
+        self.assertEqual(len(ticker.requests), 5)
+        self.assertEqual(len(stock_data), 390 * len(pd.bdate_range("2020-01-01", "2020-01-31")))
+        self.assertTrue(stock_data.index.is_monotonic_increasing)
+        self.assertIn("MACD", stock_data)
+
+    def test_resample_from_cache(self):
+        """ tests if coarser bars are built from cached minute bars without a download """
+        with tempfile.TemporaryDirectory() as directory:
+            cache = OHLCVCache(directory)
+            ticker = CountingTicker("AAA")
+            minutes = get_data(ticker, "AAA", "2020-03-02", "2020-03-07", cache=cache,
+                               interval="1m")
+            hourly = get_data(ticker, "AAA", "2020-03-02", "2020-03-07", cache=cache,
+                              interval="1h")
+            self.assertEqual(len(ticker.requests), 1)
+            expected = ticker.history(start="2020-03-02", end="2020-03-07", interval="1h")
+            pd.testing.assert_frame_equal(hourly[expected.columns], expected, check_freq=False,
+                                          check_index_type=False)
+            self.assertEqual(list(hourly.index[:2].strftime("%H:%M")), ["09:30", "10:30"])
+            # minute bars of a day add up to the daily bar
+            daily = resample_ohlcv(minutes, "1d")
+            expected = ticker.history(start="2020-03-02", end="2020-03-07")
+            np.testing.assert_allclose(daily[["Open", "Close"]], expected[["Open", "Close"]])
+
+    def test_time_windows(self):
+        """ tests if windows in time are converted with the bar spacing """
+        days = pd.bdate_range("2020-01-01", periods=300)
+        minutes = SyntheticTicker().history(start="2020-01-06", end="2020-01-08",
+                                            interval="1m").index
+        self.assertEqual(window_bars("50d", days), 50)
+        self.assertEqual(window_bars(50, minutes), 50)
+        self.assertEqual(window_bars("1h", minutes), 60)
+        self.assertEqual(window_bars("2d", minutes), 780)
+        stock_data = get_data(SyntheticTicker(), "AAA", "2019-01-01", "2020-01-01",
+                              indicators=[("MA", "sma", {"window": "50d"})])
+        expected = get_data(SyntheticTicker(), "AAA", "2019-01-01", "2020-01-01",
+                            indicators=[("MA", "sma", {"window": 50})])
+        pd.testing.assert_series_equal(stock_data["MA"], expected["MA"])
+        self.assertTrue(np.isnan(get_data(SyntheticTicker(), "AAA", "2019-01-02", "2019-01-03",
+                                          indicators=[("MA", "sma", {"window": "1d"})])["MA"]
+                                 ).all())
+
+    def test_intraday_default_windows(self):
+        """ tests if the default MAs of intraday bars span the days of their names """
+        stock_data = get_data(SyntheticTicker(), "AAA", "2019-09-01", "2020-01-01",
+                              interval="1h")
+        bars_per_day = stock_data.groupby(stock_data.index.date).size().median()
+        close = stock_data["Close"]
+        for name, days in (("Short Term MA (50d)", 50), ("Weighted MA (10d)", 10)):
+            window = int(days * bars_per_day)
+            self.assertEqual(stock_data[name].notna().idxmax(), close.index[window - 1], name)
+        np.testing.assert_allclose(stock_data["Short Term MA (50d)"].iloc[-1],
+                                   close.iloc[-int(50 * bars_per_day):].mean())
+
+class ProviderTest(unittest.TestCase):
+
+    def test_local(self):
+        """ tests if staged CSV files are served like Ticker.history and used by get_data """
+        bars = FakeTicker().history(start="2019-01-01", end="2020-01-01")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        provider = LocalProvider(directory.name, tz="America/New_York")
+        provider.store("AAA", bars, info={"shortName": "AAA Inc."})
+        pd.testing.assert_frame_equal(provider.history("aaa"), bars,
+                                      check_freq=False, check_index_type=False)
+        stock_data = get_data(provider, "AAA", "2019-03-01", "2019-06-01")
+        self.assertEqual(len(stock_data), len(pd.bdate_range("2019-03-01", "2019-05-31")))
+        self.assertIn("MACD", stock_data)
+        self.assertEqual(InfoCache(fetch=provider.info).short_name("AAA"), "AAA Inc.")
+        with self.assertRaises(KeyError):
+            provider.history("BBB")
+
+    def test_replay(self):
+        """ tests if responses are recorded once and replayed without the source """
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        directory = temp.name
+        source = FakeTicker()
+        recorder = ReplayProvider(directory, TickerProvider(lambda ticker_str: source))
+        recorded = recorder.history("AAA", "2019-01-01", "2019-06-01")
+        recorder.history("AAA", "2019-01-01", "2019-06-01")
+        self.assertEqual(len(source.requests), 1)
+        replayed = ReplayProvider(directory).ticker("AAA").history(start="2019-01-01",
+                                                                  end="2019-06-01")
+        pd.testing.assert_frame_equal(recorded, replayed)
+        with self.assertRaises(KeyError):
+            ReplayProvider(directory).history("AAA", "2019-01-01", "2019-07-01")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the indicator engine
+
+@author: Sabine Kopplin
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from indicators import (compute_indicators, sma, wma, ema, _pandas_reference,
+                        IncrementalIndicators, ROLLING_STATS, rolling_stats)
+
+rng = np.random.default_rng(7)
+close = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.02, 1500))))
+
+class IndicatorTest(unittest.TestCase):
+
+    def test_matches_pandas(self):
+        """ tests if the kernels match the original pandas columns """
+        expected = _pandas_reference(close)
+        result = compute_indicators(close.to_numpy())
+        for name, values in expected.items():
+            np.testing.assert_allclose(result[name], values.to_numpy(),
+                                       rtol=1e-9, atol=1e-9, err_msg=name)
+
+    def test_missing_prices(self):
+        """ tests if NaN prices are treated like pandas does """
+        gappy = close.copy()
+        gappy.iloc[[3, 400, 401]] = np.nan
+        np.testing.assert_allclose(sma(gappy, 20), gappy.rolling(20).mean(), atol=1e-9)
+        np.testing.assert_allclose(ema(gappy, 12), gappy.ewm(span=12).mean(), atol=1e-9)
+        self.assertTrue(np.isnan(wma(gappy, 10)[405]))
+
+    def test_price_matrix(self):
+        """ tests if a ticker x day matrix gives the same rows as single series """
+        prices = np.vstack([close.to_numpy(), close.to_numpy()[::-1]])
+        for function, param in ((sma, 50), (wma, 10), (ema, 26)):
+            result = function(prices, param)
+            np.testing.assert_allclose(result[1], function(prices[1], param))
+
+class RollingStatsTest(unittest.TestCase):
+
+    def test_matches_pandas(self):
+        """ tests if the rolling quartiles, std, COV and range equal pandas, also
+            with missing prices """
+        gappy = close.copy()
+        gappy.iloc[[3, 400, 401]] = np.nan
+        rolling = gappy.rolling(20)
+        expected = [rolling.quantile(0.25), rolling.quantile(0.5), rolling.quantile(0.75),
+                    rolling.std(), rolling.std() / rolling.mean() * 100,
+                    rolling.max() - rolling.min()]
+        result = compute_indicators(gappy.to_numpy(), ROLLING_STATS)
+        for (name, values), reference in zip(result.items(), expected):
+            np.testing.assert_allclose(values, reference, rtol=1e-9, atol=1e-9, err_msg=name)
+
+    def test_long_series(self):
+        """ tests if the std stays precise over many bars (no long cumsum) """
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, 100_000)))
+        windows = np.lib.stride_tricks.sliding_window_view(prices, 390)
+        result = compute_indicators(prices, [("Std", "std", {"window": 390})])["Std"]
+        np.testing.assert_allclose(result[389:], windows.std(axis=1, ddof=1), rtol=1e-12)
+
+    def test_rolling_stats_labels(self):
+        """ tests if bar-count windows are labelled in bars and time windows in time """
+        self.assertEqual(rolling_stats(390)[1][0], "Rolling Std (390)")
+        self.assertEqual(rolling_stats("1d")[1][0], "Rolling Std (1d)")
+
+class IncrementalTest(unittest.TestCase):
+
+    def test_equals_full_recompute(self):
+        """ tests if bar-by-bar updates give the same columns as a recompute """
+        seed_data = pd.DataFrame({"Close": close.iloc[:300]})
+        indicators = IncrementalIndicators.from_frame(seed_data)
+        values = [indicators.update(price) for price in close.iloc[300:]]
+        expected = compute_indicators(close.to_numpy())
+        for name in indicators.columns():
+            np.testing.assert_allclose([row[name] for row in values], expected[name][300:],
+                                       rtol=1e-9, atol=1e-9, err_msg=name)
+
+    def test_rolling_stats(self):
+        """ tests if the sorted window updates equal the rolling stats kernels """
+        gappy = close.to_numpy().copy()
+        gappy[[350, 700]] = np.nan
+        indicators = IncrementalIndicators(ROLLING_STATS).seed(gappy[:300])
+        values = [indicators.update(price) for price in gappy[300:]]
+        expected = compute_indicators(gappy, ROLLING_STATS)
+        for name in indicators.columns():
+            np.testing.assert_allclose([row[name] for row in values], expected[name][300:],
+                                       rtol=1e-9, atol=1e-9, err_msg=name)
+
+    def test_append_batch(self):
+        """ tests if appending a batch of bars extends the frame """
+        seed_data = pd.DataFrame({"Close": close.iloc[:100]})
+        seed_data = seed_data.assign(**compute_indicators(seed_data["Close"]))
+        indicators = IncrementalIndicators.from_frame(seed_data)
+        extended = indicators.append(seed_data, pd.DataFrame({"Close": close.iloc[100:105]}))
+        expected = compute_indicators(close.iloc[:105])
+        self.assertEqual(len(extended), 105)
+        np.testing.assert_allclose(extended["Weighted MA (10d)"], expected["Weighted MA (10d)"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the live mode with a simulated feed
+
+@author: Sabine Kopplin
+"""
+
+import asyncio
+import unittest
+import numpy as np
+import pandas as pd
+from export import use_agg_backend
+from live import SimulatedFeed, LiveSession, LiveChart, run_live
+from data import get_data
+
+class LiveTest(unittest.TestCase):
+
+    def setUp(self):
+        use_agg_backend()
+        self.feed = SimulatedFeed("2020-01-06", days=2, history_bars=390, bars_per_second=0)
+        self.session = LiveSession(self.feed, ["AAA", "BBB"], start_date="2020-01-06")
+        asyncio.run(self.session.start())
+
+    def tearDown(self):
+        import matplotlib.pyplot as plt
+        plt.close("all")
+
+    def test_incremental(self):
+        """ tests if polled bars and their indicators equal a full reload """
+        self.assertEqual(len(self.session.stock_data["AAA"]), 390)
+        self.feed.advance(7)
+        self.assertEqual(asyncio.run(self.session.poll_once()), {"AAA": 7, "BBB": 7})
+        self.assertEqual(asyncio.run(self.session.poll_once()), {})
+        expected = get_data(self.feed, "BBB", "2020-01-06", None, interval="1m")
+        pd.testing.assert_frame_equal(self.session.stock_data["BBB"], expected,
+                                      check_freq=False, rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(self.session.stock_data["BBB"]["Long Term MA (200d)"],
+                                   expected["Long Term MA (200d)"], rtol=1e-9)
+
+    def test_time_windows(self):
+        """ tests if indicator windows in time are resolved to bars like in get_data """
+        indicators = (("MA (30min)", "sma", {"window": "30min"}),
+                      ("Short Term MA (50d)", "sma", {"window": 50}),
+                      (("MACD", "MACD Signal"), "macd", {"fast": "12min", "slow": 26,
+                                                         "signal": 9}))
+        session = LiveSession(self.feed, ["AAA"], start_date="2020-01-06",
+                              indicators=indicators)
+        asyncio.run(session.start())
+        self.feed.advance(45)
+        asyncio.run(session.poll_once())
+        expected = get_data(self.feed, "AAA", "2020-01-06", None, indicators, interval="1m")
+        self.assertEqual(expected["MA (30min)"].notna().sum(), len(expected) - 29)
+        pd.testing.assert_frame_equal(session.stock_data["AAA"], expected, check_freq=False,
+                                      rtol=1e-9, atol=1e-9)
+
+    def test_forming_bar(self):
+        """ tests if a changed last bar is replaced and its indicators recomputed """
+        last = self.session.stock_data["AAA"].index[-1]
+        self.feed._bars("AAA").loc[last, ["Close", "High"]] += 1.0
+        self.assertEqual(asyncio.run(self.session.poll_once()), {"AAA": 1})
+        self.feed.advance(3)
+        self.assertEqual(asyncio.run(self.session.poll_once()), {"AAA": 3, "BBB": 3})
+        expected = get_data(self.feed, "AAA", "2020-01-06", None, interval="1m")
+        pd.testing.assert_frame_equal(self.session.stock_data["AAA"], expected,
+                                      check_freq=False, rtol=1e-9, atol=1e-9)
+
+    def test_errors(self):
+        """ tests if failing polls are kept and counted """
+        from tracing import tracer
+        history = self.feed.history
+        self.feed.history = lambda symbol, *args: history(symbol, *args) if symbol == "AAA" \
+            else 1 / 0
+        tracer.reset()
+        tracer.enabled = True
+        try:
+            self.feed.advance(2)
+            self.assertEqual(asyncio.run(self.session.poll_once()), {"AAA": 2})
+            self.assertIsInstance(self.session.errors["BBB"], ZeroDivisionError)
+            self.assertEqual(tracer.counters["live.errors"], 1)
+        finally:
+            tracer.enabled = False
+            tracer.reset()
+        self.feed.history = history
+        self.assertEqual(asyncio.run(self.session.poll_once()), {"BBB": 2})
+        self.assertEqual(self.session.errors, {})
+
+    def test_blitting(self):
+        """ tests if new bars are blitted and the figure is only redrawn to rescale """
+        chart = LiveChart(self.session, window=100)
+        self.feed.advance(40)
+        asyncio.run(run_live(self.session, chart, poll_seconds=0, max_polls=1))
+        draws = chart.full_draws
+        for _ in range(10):
+            self.feed.advance(1)
+            chart.update(list(asyncio.run(self.session.poll_once())))
+        self.assertLessEqual(chart.full_draws - draws, 2)
+        self.assertGreaterEqual(chart.blits, 16)
+        x = chart.lines["AAA"]["Close"].get_xdata()
+        self.assertEqual(len(x), 100)
+        self.assertEqual(len(self.session.stock_data["AAA"]), 440)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the result cache
+
+@author: Sabine Kopplin
+"""
+
+import unittest
+import numpy as np
+from memo import ResultCache, result_key, data_version, result_size
+from data import get_data
+from synthetic import SyntheticTicker
+
+def _key(analysis, ticker_str="AAA", **params):
+    return result_key(ticker_str, "2019-01-01", "2020-01-01", "1d", analysis, **params)
+
+class ResultCacheTest(unittest.TestCase):
+
+    def test_memoized(self):
+        """ tests if a result is computed once per key and parameters """
+        results = ResultCache()
+        calls = []
+        compute = lambda: calls.append(1) or np.zeros(10)
+        results.get(_key("linear_reg"), compute)
+        results.get(_key("linear_reg"), compute)
+        results.get(_key("predict", days=5), compute)
+        results.get(_key("predict", days=5), compute)
+        results.get(_key("predict", days=10), compute)
+        self.assertEqual((len(calls), results.hits, results.misses), (3, 2, 3))
+
+    def test_memory_ceiling(self):
+        """ tests if the least recently used results are dropped above the ceiling """
+        results = ResultCache(max_bytes=3000)
+        for name in ("a", "b", "c"):
+            results.get(_key(name), lambda: np.zeros(125))
+        # using "a" makes "b" the least recently used one
+        results.get(_key("a"), lambda: None)
+        results.get(_key("d"), lambda: np.zeros(125))
+        self.assertNotIn(_key("b"), results)
+        self.assertTrue(all(_key(name) in results for name in "acd"))
+        self.assertLessEqual(results.size, 3000)
+        results.get(_key("huge"), lambda: np.zeros(1000))
+        self.assertNotIn(_key("huge"), results)
+
+    def test_refreshed_data(self):
+        """ tests if changed data drops only the results of its ticker and dates """
+        stock_data = get_data(SyntheticTicker("AAA"), "AAA", "2019-01-01", "2020-01-01")
+        version = data_version(stock_data)
+        results = ResultCache()
+        results.get(_key("summary"), lambda: 1, version)
+        results.get(_key("summary", "BBB"), lambda: 2, version)
+        self.assertEqual(results.get(_key("summary"), lambda: 3,
+                                     data_version(stock_data.copy())), 1)
+        refreshed = stock_data.copy()
+        refreshed.iloc[5, refreshed.columns.get_loc("Close")] += 0.01
+        self.assertNotEqual(data_version(refreshed), version)
+        self.assertEqual(results.get(_key("summary"), lambda: 3, data_version(refreshed)), 3)
+        self.assertEqual(results.get(_key("summary", "BBB"), lambda: 4), 2)
+
+    def test_result_size(self):
+        """ tests if the size of frames, arrays and figures is estimated """
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        stock_data = get_data(SyntheticTicker("AAA"), "AAA", "2019-01-01", "2020-01-01")
+        self.assertGreaterEqual(result_size(stock_data), stock_data.memory_usage().sum())
+        self.assertGreater(result_size((1, np.zeros(100))), 800)
+        fig = plt.figure(figsize=(4, 3), dpi=100)
+        plt.plot(np.arange(1000))
+        self.assertGreaterEqual(result_size(fig), 400 * 300 * 4 + 16000)
+        plt.close(fig)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the memory-mapped panel store
+
+@author: Sabine Kopplin
+"""
+
+import io
+import os
+import unittest
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+from panel import write_panel, PanelStore, map_tickers
+from data import get_data, calc_descriptive
+from prediction import linear_reg
+from synthetic import SyntheticTicker
+
+def regression_rmse(ticker_str, stock_data):
+    """ task for the worker processes: RMSE of the linear trend """
+    if ticker_str == "FAIL":
+        raise ValueError(ticker_str)
+    return linear_reg(stock_data)[3]
+
+class PanelTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp = tempfile.TemporaryDirectory()
+        cls.directory = os.path.join(cls.temp.name, "panel")
+        cls.frames = {ticker_str: get_data(SyntheticTicker(ticker_str), ticker_str, start,
+                                           "2020-01-01")
+                      for ticker_str, start in (("AAA", "2017-01-01"), ("BBB", "2018-06-01"),
+                                                ("FAIL", "2019-01-01"))}
+        write_panel(cls.directory, cls.frames)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp.cleanup()
+
+    def test_views(self):
+        """ tests if ticker views equal the get_data frames and share the memory map """
+        store = PanelStore(self.directory)
+        self.assertEqual(store.field("Close").shape, (3, len(self.frames["AAA"])))
+        for ticker_str, stock_data in self.frames.items():
+            view = store.frame(ticker_str)
+            pd.testing.assert_frame_equal(view, stock_data, check_dtype=False,
+                                          check_freq=False, check_index_type=False)
+            self.assertTrue(np.shares_memory(view["Close"].to_numpy(), store.field("Close")))
+        view = store.frame("BBB")
+        self.assertEqual(linear_reg(view)[3], linear_reg(self.frames["BBB"])[3])
+        with contextlib.redirect_stdout(io.StringIO()):
+            calc_descriptive(view)
+
+    def test_calendars(self):
+        """ tests if tickers on different calendars get only their own bars """
+        frames = {"AAA": self.frames["AAA"].iloc[::2], "BBB": self.frames["AAA"].iloc[1::3]}
+        store = write_panel(os.path.join(self.temp.name, "calendars"), frames)
+        self.assertEqual(len(store.dates), len(frames["AAA"]) + len(frames["BBB"])
+                         - len(self.frames["AAA"].iloc[4::6]))
+        for ticker_str, stock_data in frames.items():
+            view = store.frame(ticker_str)
+            pd.testing.assert_frame_equal(view, stock_data, check_dtype=False,
+                                          check_freq=False, check_index_type=False)
+            self.assertFalse(view["Close"].isna().any())
+            self.assertEqual(linear_reg(view)[3], linear_reg(stock_data)[3])
+
+    def test_map_tickers(self):
+        """ tests if the process pool runs on the views and reports failing tickers """
+        results, errors = map_tickers(self.directory, regression_rmse, max_workers=2)
+        self.assertEqual(results, {ticker_str: linear_reg(self.frames[ticker_str])[3]
+                                   for ticker_str in ("AAA", "BBB")})
+        self.assertEqual(list(errors), ["FAIL"])
+
+if __name__ == "__main__":
+    unittest.main()
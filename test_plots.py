@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for downsampling and rendering of the graphs (no display needed)
+
+@author: Sabine Kopplin
+"""
+
+import os
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from downsample import minmax_downsample, aggregate_max, DownsampledLine, DownsampledArea
+from export import export_charts, export_universe, CHART_TYPES
+from test_data import FakeTicker
+
+rng = np.random.default_rng(11)
+prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 100_000)))
+
+class DownsampleTest(unittest.TestCase):
+
+    def test_keeps_extremes(self):
+        """ tests if min and max of every bucket survive downsampling """
+        indices = minmax_downsample(prices, 500)
+        self.assertLessEqual(len(indices), 1002)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        for bucket in np.array_split(prices, 500)[::50]:
+            self.assertIn(bucket.max(), prices[indices])
+            self.assertIn(bucket.min(), prices[indices])
+
+    def test_short_series_unchanged(self):
+        """ tests if series shorter than two points per bucket are kept """
+        np.testing.assert_array_equal(minmax_downsample(prices[:100], 500), np.arange(100))
+
+    def test_aggregate_max(self):
+        """ tests if the volume area keeps the maximum per bucket """
+        edges, heights = aggregate_max(np.arange(10.0), 3)
+        np.testing.assert_array_equal(edges, [0, 3, 6, 10])
+        np.testing.assert_array_equal(heights, [2, 5, 9])
+
+    def test_resample_on_zoom(self):
+        """ tests if zooming in draws the visible days at full resolution """
+        fig, ax = plt.subplots()
+        line = DownsampledLine(ax, np.arange(len(prices), dtype=float), prices).line
+        self.assertLess(len(line.get_xdata()), 5000)
+        ax.set_xlim(1000, 1500)
+        np.testing.assert_array_equal(line.get_xdata(), np.arange(999, 1501))
+        plt.close(fig)
+
+    def test_empty(self):
+        """ tests if empty data is drawn (and zoomed) without errors """
+        fig, ax = plt.subplots()
+        line = DownsampledLine(ax, [], [])
+        area = DownsampledArea(ax, [], [])
+        ax.set_xlim(0, 10)
+        fig.canvas.draw()
+        self.assertEqual(len(line.line.get_xdata()), 0)
+        self.assertIsNone(area.area)
+        plt.close(fig)
+
+    def test_reused_figure(self):
+        """ tests if rendering again on a reused figure keeps no old artists or callbacks """
+        import gc
+        import weakref
+        from data import get_data
+        from plots import Graphs
+        graph = Graphs(get_data(FakeTicker(), "FAKE", "2019-01-01", "2020-01-01"), "FAKE",
+                       "Fake Inc", interactive=False)
+        counts = []
+        for _ in range(3):
+            fig = graph.macd()
+            old_axes = weakref.ref(fig.axes[0])
+            counts.append((len(fig._canvas_callbacks.callbacks.get("resize_event", {})),
+                           sum(len(ax._downsampled) for ax in fig.axes)))
+        self.assertEqual(counts, [counts[0]] * 3)
+        self.assertEqual(counts[0][0], 1)
+        graph.macd()
+        gc.collect()
+        self.assertIsNone(old_axes())
+        plt.close("all")
+
+class ExportTest(unittest.TestCase):
+
+    def test_export_charts(self):
+        """ tests if every chart type is rendered to PNG and SVG """
+        from data import get_data
+        stock_data = get_data(FakeTicker(), "FAKE", "2018-01-01", "2020-01-01")
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = export_charts(stock_data, "FAKE", "Fake Inc", tmp, formats=("png", "svg"))
+            self.assertEqual(len(paths), 2 * len(CHART_TYPES))
+            self.assertTrue(all(os.path.getsize(path) > 0 for path in paths))
+
+    def test_export_universe(self):
+        """ tests if the process pool exports all tickers and reports failures """
+        with tempfile.TemporaryDirectory() as tmp:
+            exported, errors = export_universe(["AAA", "FAIL", "BBB"], "2019-01-01", "2020-01-01",
+                                               tmp, charts=("macd",), max_workers=2,
+                                               ticker_factory=FakeTicker)
+            self.assertEqual(sorted(exported), ["AAA", "BBB"])
+            self.assertEqual(list(errors), ["FAIL"])
+            self.assertTrue(os.path.exists(os.path.join(tmp, "AAA_macd.png")))
+
+if __name__ == '__main__':
+    unittest.main()
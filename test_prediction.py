@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the regression and forecast functions on synthetic prices
+
+@author: Sabine Kopplin
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from prediction import linear_reg, rolling_linear_reg, best_lookback, predict_series, batch_forecast
+
+rng = np.random.default_rng(3)
+stock_data = pd.DataFrame({"Close": 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 5000)))})
+
+class RollingRegressionTest(unittest.TestCase):
+
+    def test_matches_linear_reg(self):
+        """ tests if every window gives the same fit as linear_reg on that window """
+        rolling = rolling_linear_reg(stock_data, 250)
+        self.assertTrue(rolling.iloc[:249].isna().all().all())
+        for end in (249, 1234, 4999):
+            num_data_points, lr, trendline, rmse = linear_reg(stock_data.iloc[end - 249:end + 1])
+            row = rolling.iloc[end]
+            np.testing.assert_allclose([row["Slope"], row["Intercept"], row["R-Squared"]],
+                                       [lr.slope, lr.intercept, lr.rvalue**2], rtol=1e-7)
+            self.assertAlmostEqual(row["RMSE"], rmse, places=4)
+
+    def test_expanding(self):
+        """ tests if the last expanding fit equals the fit of the whole range """
+        expanding = rolling_linear_reg(stock_data, expanding=True)
+        num_data_points, lr, trendline, rmse = linear_reg(stock_data)
+        np.testing.assert_allclose(expanding.iloc[-1][["Slope", "Intercept"]],
+                                   [lr.slope, lr.intercept], rtol=1e-7)
+
+    def test_short_and_missing(self):
+        """ tests if short series give NaN and missing prices only affect their windows """
+        short = rolling_linear_reg(stock_data.iloc[:100], 250)
+        self.assertEqual(short.shape, (100, 4))
+        self.assertTrue(short.isna().all().all())
+        gappy = stock_data.copy()
+        gappy.iloc[300, 0] = np.nan
+        rolling = rolling_linear_reg(gappy, 250)
+        np.testing.assert_allclose(rolling.iloc[600:], rolling_linear_reg(stock_data, 250).iloc[600:],
+                                   atol=1e-9)
+        # the window with the gap is fitted on its other days
+        window = gappy.iloc[251:501].reset_index(drop=True).dropna()
+        slope, intercept = np.polyfit(window.index, window["Close"], 1)
+        np.testing.assert_allclose(rolling.iloc[500][["Slope", "Intercept"]], [slope, intercept])
+        flat = rolling_linear_reg(pd.Series(np.full(30, 5.0)), 20)
+        self.assertTrue(flat["R-Squared"].isna().all())
+
+    def test_best_lookback(self):
+        """ tests if the lookback of a recent straight trend is found """
+        trend = pd.concat([stock_data["Close"], pd.Series(200 + np.arange(60.0))],
+                          ignore_index=True)
+        window, fit = best_lookback(trend)
+        self.assertEqual(window, 50)
+        self.assertAlmostEqual(fit["R-Squared"], 1.0)
+
+class BatchForecastTest(unittest.TestCase):
+
+    def setUp(self):
+        self.prices = np.vstack([stock_data["Close"].iloc[:500], stock_data["Close"].iloc[500:1000],
+                                 100 + 0.5 * np.arange(500.0)])
+
+    def test_matches_predict_series(self):
+        """ tests if the linear batch gives predict_series' values for every ticker """
+        batch = batch_forecast(self.prices, 10)
+        self.assertEqual(batch.forecasts.shape, (3, 10))
+        for row, prices in enumerate(self.prices):
+            num_data_points, lr, trendline, rmse = linear_reg(pd.DataFrame({"Close": prices}))
+            np.testing.assert_allclose(np.round(batch.forecasts[row], 2),
+                                       predict_series(lr, num_data_points, 10))
+            np.testing.assert_allclose(batch.coefficients[row], [lr.intercept, lr.slope])
+            self.assertAlmostEqual(batch.r_squared[row], lr.rvalue**2)
+            self.assertAlmostEqual(batch.rmse[row], rmse, places=4)
+
+    def test_other_bases(self):
+        """ tests if polynomial and log-linear trends reproduce exact curves """
+        days = np.arange(600.0)
+        curves = np.vstack([5 + 0.1 * days + 0.002 * days**2, 50 * np.exp(0.001 * days)])
+        poly = batch_forecast(curves[:1], 3, basis="poly", degree=2)
+        np.testing.assert_allclose(poly.forecasts[0], 5 + 0.1 * (601 + np.arange(3)) +
+                                   0.002 * (601 + np.arange(3))**2)
+        loglinear = batch_forecast(curves[1:], 3, basis="loglinear")
+        np.testing.assert_allclose(loglinear.forecasts[0], 50 * np.exp(0.001 * (601 + np.arange(3))))
+        self.assertRaises(ValueError, batch_forecast, curves, 3, basis="spline")
+
+    def test_missing_prices(self):
+        """ tests if gaps only affect their ticker and too short inputs are rejected """
+        prices = self.prices.copy()
+        prices[0, :100] = np.nan
+        prices[1, :499] = np.nan
+        batch = batch_forecast(prices, 5)
+        complete = batch_forecast(self.prices[2:], 5)
+        np.testing.assert_allclose(batch.forecasts[2], complete.forecasts[0])
+        # a late listing is fitted on the days since its first price
+        late = batch_forecast(self.prices[:1, 100:], 5)
+        np.testing.assert_allclose(batch.coefficients[0, 1], late.coefficients[0, 1])
+        np.testing.assert_allclose(batch.rmse[0], late.rmse[0])
+        self.assertTrue(np.isnan(batch.forecasts[1]).all())
+        self.assertTrue(np.isnan(batch.r_squared[1]))
+        self.assertRaises(ValueError, batch_forecast, self.prices[:, :1], 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the crossover screener
+
+@author: Sabine Kopplin
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from screener import screen, crossings
+from synthetic import synthetic_prices
+
+class ScreenerTest(unittest.TestCase):
+
+    def test_crossings(self):
+        """ tests if touching lines are no crossing and missing days keep the side """
+        fast = np.array([[1, 2, 2, 3, 1, np.nan, 3], [1, 2, 2, 1, 1, 1, 1]], dtype=float)
+        slow = np.full((2, 7), 2.0)
+        np.testing.assert_array_equal(crossings(fast, slow),
+                                      [[0, 0, 0, 1, -1, 0, 1], [0, 0, 0, 0, 0, 0, 0]])
+
+    def test_matches_pandas(self):
+        """ tests if the events equal sign changes of the pandas indicators per ticker """
+        prices = synthetic_prices(40, 700, seed=5)
+        dates = pd.bdate_range("2018-01-01", periods=700)
+        close = pd.DataFrame(prices.T, index=dates, columns=["T{}".format(i) for i in range(40)])
+        table = screen(close, lookback=60)
+        self.assertTrue(table["Days Ago"].is_monotonic_increasing)
+        for ticker_str in close:
+            series = close[ticker_str]
+            ma_side = np.sign(series.rolling(50).mean() - series.rolling(200).mean())
+            macd_line = series.ewm(span=12).mean().round(3) - series.ewm(span=26).mean().round(3)
+            macd_side = np.sign(macd_line - macd_line.ewm(span=9).mean().round(3))
+            expected = set()
+            for side, up in ((ma_side, "Golden Cross"), (macd_side, "MACD Bullish Cross")):
+                change = side.diff().iloc[-60:]
+                down = "Death Cross" if up == "Golden Cross" else "MACD Bearish Cross"
+                expected |= {(day, up) for day in change.index[change > 0]}
+                expected |= {(day, down) for day in change.index[change < 0]}
+            events = table[table["Ticker"] == ticker_str]
+            self.assertEqual(set(zip(events["Date"], events["Signal"])), expected)
+
+if __name__ == "__main__":
+    unittest.main()
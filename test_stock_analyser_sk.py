@@ -7,19 +7,39 @@ Unit-test for Stock_Analyser program
 @author: VT_SA
 """
 
+import tempfile
 import unittest
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from scipy import stats
 from prediction import predict_value, predict_series
 from data import get_data
+from providers import LocalProvider
+from synthetic import synthetic_ohlcv
 
 ticker_str = "AAPL"
 start_date = "2019-11-23"
 end_date = "2020-11-23"
 intvl = "1d"
-ticker = yf.Ticker(ticker_str)
+
+def static_bars():
+    """ 251 daily bars whose closing prices have the linear trend the expected
+        values below were calculated with in Excel (intercept 57.387372836332,
+        slope 0.251764995965033), served from a local file (no network needed) """
+    bars = synthetic_ohlcv(251, ticker_str, start="2019-11-25")
+    days = np.arange(len(bars))
+    # synthetic fluctuation without a trend of its own around the static trend
+    noise = bars["Close"].to_numpy()
+    noise = noise - np.polyval(np.polyfit(days, noise, 1), days)
+    close = 57.387372836332 + 0.251764995965033 * days + noise
+    shift = close - bars["Close"].to_numpy()
+    for column in ("Open", "High", "Low", "Close"):
+        bars[column] = bars[column] + shift
+    return bars
+
+data_dir = tempfile.TemporaryDirectory()
+LocalProvider(data_dir.name).store(ticker_str, static_bars())
+ticker = LocalProvider(data_dir.name).ticker(ticker_str)
 
 stock_data = ticker.history(start = start_date, end = end_date, interval = intvl)
 num_data_points = len(stock_data["Close"])
@@ -27,6 +47,9 @@ days = np.arange(num_data_points)
 lr = stats.linregress(days, stock_data['Close'])
 trendline = lr.intercept + lr.slope * days
 
+def tearDownModule():
+    data_dir.cleanup()
+
 class StockAnalyserTest(unittest.TestCase):
 
     def test_prediction_value(self):
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-test for the tracing of the hot paths
+
+@author: Sabine Kopplin
+"""
+
+import os
+import json
+import unittest
+import tempfile
+from tracing import tracer
+from data import get_data
+from prediction import linear_reg
+from synthetic import SyntheticTicker
+
+class TracingTest(unittest.TestCase):
+
+    def tearDown(self):
+        tracer.enabled = False
+        tracer.reset()
+
+    def test_disabled(self):
+        """ tests if nothing is recorded while tracing is off """
+        tracer.enabled = False
+        linear_reg(get_data(SyntheticTicker(), "AAA", "2019-01-01", "2020-01-01"))
+        self.assertEqual((tracer.spans, tracer.counters), ([], {}))
+
+    def test_export(self):
+        """ tests if spans and counters of fetch, indicators and regression are exported """
+        tracer.reset()
+        tracer.enabled = True
+        stock_data = get_data(SyntheticTicker(), "AAA", "2019-01-01", "2020-01-01")
+        linear_reg(stock_data)
+        summary = tracer.summary()
+        for name in ("fetch", "fetch.request", "indicators", "linear_reg"):
+            self.assertEqual(summary[name]["calls"], 1)
+        self.assertEqual(tracer.counters["rows.fetched"], len(stock_data))
+        self.assertGreater(tracer.counters["bytes.fetched"], 0)
+        with tempfile.TemporaryDirectory() as directory:
+            json_path, chrome_path = tracer.export(os.path.join(directory, "trace"))
+            with open(json_path) as file:
+                self.assertEqual(json.load(file)["counters"]["rows.indicators"], len(stock_data))
+            with open(chrome_path) as file:
+                events = json.load(file)["traceEvents"]
+        self.assertEqual({event["ph"] for event in events}, {"X", "C"})
+        self.assertTrue(all(event["dur"] >= 0 for event in events if event["ph"] == "X"))
+
+    def test_failing_graph(self):
+        """ tests if the span of a graph is closed when building the graph fails """
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from plots import Graphs
+        tracer.reset()
+        tracer.enabled = True
+        stock_data = get_data(SyntheticTicker(), "AAA", "2019-01-01", "2020-01-01")
+        graph = Graphs(stock_data.drop(columns="MACD"), "AAA", "Aaa", interactive=False)
+        self.assertRaises(KeyError, graph.macd)
+        graph.ma_compare()
+        spans = [span for span in tracer.spans if span["name"].startswith("Graphs")]
+        self.assertEqual([span["name"] for span in spans], ["Graphs: MACD",
+                                                            "Graphs: Moving Average Cross"])
+        self.assertEqual(spans[0]["args"]["error"], "KeyError")
+        plt.close("all")
+
+if __name__ == "__main__":
+    unittest.main()
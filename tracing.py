@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Tracing
+- Spans (timed sections) and counters around the hot paths: fetch,
+  indicators, regression and chart rendering
+- Export as JSON (spans, counters, summary per span) and as Chrome trace
+  (open in chrome://tracing or https://ui.perfetto.dev)
+
+Tracing is off by default and then costs one attribute check per span.
+It is switched on without code changes by the environment variable
+STOCK_ANALYSER_TRACE=<file prefix> (or the CLI flag --trace <file prefix>),
+which writes <prefix>.json and <prefix>.trace.json when the program exits.
+
+@author: Sabine Kopplin
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+import functools
+
+ENV_VAR = "STOCK_ANALYSER_TRACE"
+
+class _NullSpan:
+    """ span that does nothing, shared by all calls while tracing is off """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    """ timed section, recorded by the tracer when it ends """
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        if exc_info[0] is not None:
+            self.args["error"] = exc_info[0].__name__
+        self.tracer._record(self.name, self.start, end, self.args)
+        return False
+
+    def set(self, **args):
+        """ attach values to the span, e.g. the number of rows """
+        self.args.update(args)
+
+class Tracer:
+    """ class collecting spans and counters of one process """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        # (time, name, total) of every counter change, for the Chrome trace
+        self._counter_events = []
+
+    def span(self, name, **args):
+        """ context manager timing a section (a no-op while disabled) """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name, value=1):
+        """ add value to a counter (e.g. rows or bytes processed) """
+        if not self.enabled:
+            return
+        with self._lock:
+            total = self.counters[name] = self.counters.get(name, 0) + value
+            self._counter_events.append((time.perf_counter(), name, total))
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.counters = {}
+            self._counter_events = []
+            self._origin = time.perf_counter()
+
+    def _record(self, name, start, end, args):
+        with self._lock:
+            self.spans.append({"name": name, "start": start - self._origin,
+                               "duration": end - start, "thread": threading.get_ident(),
+                               "args": args})
+
+    def summary(self):
+        """ dict span name -> number of calls, total and maximum seconds """
+        summary = {}
+        with self._lock:
+            for span in self.spans:
+                entry = summary.setdefault(span["name"], {"calls": 0, "total_s": 0.0,
+                                                          "max_s": 0.0})
+                entry["calls"] += 1
+                entry["total_s"] += span["duration"]
+                entry["max_s"] = max(entry["max_s"], span["duration"])
+        return summary
+
+    def to_json(self, path):
+        """ write spans, counters and the summary as JSON """
+        with self._lock:
+            report = {"spans": list(self.spans), "counters": dict(self.counters)}
+        report["summary"] = self.summary()
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=1, default=str)
+
+    def to_chrome(self, path):
+        """ write the Chrome trace event format (times in microseconds) """
+        pid = os.getpid()
+        with self._lock:
+            events = [{"name": span["name"], "ph": "X", "pid": pid, "tid": span["thread"],
+                       "ts": span["start"] * 1e6, "dur": span["duration"] * 1e6,
+                       "args": {key: str(value) for key, value in span["args"].items()}}
+                      for span in self.spans]
+            events += [{"name": name, "ph": "C", "pid": pid, "tid": 0,
+                        "ts": (moment - self._origin) * 1e6, "args": {name: total}}
+                       for moment, name, total in self._counter_events]
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def export(self, prefix):
+        """ write <prefix>.json and <prefix>.trace.json, return both paths """
+        paths = (prefix + ".json", prefix + ".trace.json")
+        self.to_json(paths[0])
+        self.to_chrome(paths[1])
+        return paths
+
+# tracer of this process, used by the module functions below
+tracer = Tracer()
+
+def span(name, **args):
+    """ span of the process tracer, usage: with span("fetch", ticker="AAPL"): ... """
+    return tracer.span(name, **args)
+
+def count(name, value=1):
+    """ add to a counter of the process tracer """
+    tracer.count(name, value)
+
+def traced(name):
+    """ decorator wrapping every call of a function in a span """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with tracer.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def enable(prefix=None):
+    """ switch tracing on, with a prefix the files are written at exit """
+    tracer.enabled = True
+    if prefix:
+        atexit.register(tracer.export, prefix)
+
+# switched on from the environment, a value of 1 writes stock_analyser.json
+_env = os.environ.get(ENV_VAR, "")
+if _env and _env.lower() not in ("0", "false", "no"):
+    enable("stock_analyser" if _env.lower() in ("1", "true", "yes") else _env)